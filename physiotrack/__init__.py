@@ -2,21 +2,32 @@
 PhysioTrack: Minimal library for pose detection and angle calculation
 """
 from .detector import PoseDetector
-from .angles import calculate_angles, calculate_joint_angle
+from .angles import (calculate_angles, calculate_angles_batch, calculate_joint_angle,
+                     AnglePlan, get_angle_plan, validate_angle_definitions)
 from .models import KeypointData, PoseData, DetectionConfig, ANGLE_DEFINITIONS
-from .utils import normalize_keypoints, filter_low_confidence_keypoints
+from .tracking import TrackManager, primary_track
+from .utils import (normalize_keypoints, filter_low_confidence_keypoints,
+                    sort_people_physiotrack, associate_people)
 
 __version__ = "0.1.0"
 
 # Make the key components available at the package level
 __all__ = [
     'PoseDetector',
+    'TrackManager',
+    'primary_track',
     'calculate_angles',
+    'calculate_angles_batch',
     'calculate_joint_angle',
+    'AnglePlan',
+    'get_angle_plan',
+    'validate_angle_definitions',
     'KeypointData', 
     'PoseData',
     'DetectionConfig',
     'ANGLE_DEFINITIONS',
     'normalize_keypoints',
-    'filter_low_confidence_keypoints'
+    'filter_low_confidence_keypoints',
+    'sort_people_physiotrack',
+    'associate_people'
 ]
\ No newline at end of file
@@ -1,10 +1,17 @@
 """
 Core angle calculation functionality
 """
+from functools import lru_cache
 from typing import Dict, List, Tuple, Any, Optional, Union
 import numpy as np
 from .models import ANGLE_DEFINITIONS
 
+# Keypoints computed as the midpoint of two others when the model lacks them
+SYNTHETIC_KEYPOINTS = {
+    'Neck': ('LShoulder', 'RShoulder'),
+    'Hip': ('LHip', 'RHip')
+}
+
 def points_to_angles(points_list):
     """
     Calculate angles between points
@@ -96,6 +103,263 @@ def calculate_joint_angle(points: List[np.ndarray], angle_type: str = "flexion")
     """
     return points_to_angles(points)
 
+def validate_angle_definitions(definitions: Dict[str, Any]) -> Dict[str, list]:
+    """
+    Validate custom angle definitions and normalize them to the ANGLE_DEFINITIONS format
+    
+    Args:
+        definitions: Dict of angle names to [keypoints, angle_type, offset, scale]
+        
+    Returns:
+        Dict[str, list]: Normalized definitions keyed by lowercase angle name
+    """
+    validated = {}
+    for ang_name, ang_params in (definitions or {}).items():
+        if not isinstance(ang_name, str) or not ang_name.strip():
+            raise ValueError(f"Invalid angle name: {ang_name!r}")
+        if not isinstance(ang_params, (list, tuple)) or len(ang_params) != 4:
+            raise ValueError(f"Angle {ang_name} must be defined as [keypoints, angle_type, offset, scale]")
+        
+        kpts, ang_type, offset, scale = ang_params
+        if (not isinstance(kpts, (list, tuple)) or not 2 <= len(kpts) <= 4
+                or not all(isinstance(kpt, str) for kpt in kpts)):
+            raise ValueError(f"Angle {ang_name} must reference 2 to 4 keypoint names")
+        if not isinstance(ang_type, str):
+            raise ValueError(f"Angle {ang_name} has an invalid angle type: {ang_type!r}")
+        try:
+            offset, scale = float(offset), float(scale)
+        except (TypeError, ValueError):
+            raise ValueError(f"Angle {ang_name} must have numeric offset and scale")
+        
+        validated[ang_name.lower()] = [list(kpts), ang_type, offset, scale]
+    
+    return validated
+
+class AnglePlan:
+    """Angle computation compiled to index arrays for one skeleton
+    
+    Keypoint names are resolved once, so computing angles only involves
+    gathering points and a few vectorized NumPy operations.
+    Synthetic Neck/Hip keypoints are referenced with negative indices so that
+    they address the midpoints appended after the model keypoints.
+    """
+    
+    def __init__(self, angle_names: List[str],
+                 keypoints_names: List[str],
+                 keypoints_ids: List[int],
+                 angle_definitions: Optional[Dict[str, list]] = None):
+        """
+        Compile a plan for the requested angles
+        
+        Args:
+            angle_names: List of angle names to calculate
+            keypoints_names: List of keypoint names corresponding to keypoints array
+            keypoints_ids: List of keypoint IDs corresponding to keypoints array
+            angle_definitions: Custom angle definitions, validated and merged
+                over ANGLE_DEFINITIONS
+        """
+        definitions = dict(ANGLE_DEFINITIONS)
+        definitions.update(validate_angle_definitions(angle_definitions))
+        
+        self.angle_names = list(angle_names)
+        names = list(keypoints_names)
+        ids = list(keypoints_ids)
+        
+        # Add Neck and Hip as midpoints if not provided by the model
+        synthetic = []
+        synthetic_names = []
+        for kpt, (left, right) in SYNTHETIC_KEYPOINTS.items():
+            if kpt not in names and left in names and right in names:
+                synthetic.append((ids[names.index(left)], ids[names.index(right)]))
+                synthetic_names.append(kpt)
+        synthetic_ids = {name: j - len(synthetic) for j, name in enumerate(synthetic_names)}
+        self.synthetic = np.array(synthetic, dtype=np.intp).reshape(-1, 2)
+        
+        n_angles = len(self.angle_names)
+        self.u_idx = np.zeros((n_angles, 2), dtype=np.intp)
+        self.v_idx = np.zeros((n_angles, 2), dtype=np.intp)
+        self.is_segment = np.zeros(n_angles, dtype=bool)
+        self.resolved = np.zeros(n_angles, dtype=bool)
+        self.offsets = np.zeros(n_angles)
+        self.scales = np.ones(n_angles)
+        self.wrap = np.full(n_angles, 180.0)
+        
+        for i, ang_name in enumerate(self.angle_names):
+            ang_params = definitions.get(ang_name.lower())
+            if not ang_params:
+                continue
+            
+            kpts = ang_params[0]
+            if any(item not in names and item not in synthetic_ids for item in kpts):
+                # Skip angles that require keypoints we don't have
+                continue
+            
+            pts = [synthetic_ids[pt] if pt in synthetic_ids else ids[names.index(pt)]
+                   for pt in kpts]
+            
+            # Same vector conventions as points_to_angles
+            if len(pts) == 2:
+                self.u_idx[i] = pts[0], pts[1]
+                self.is_segment[i] = True
+            elif len(pts) == 3:
+                self.u_idx[i] = pts[0], pts[1]
+                self.v_idx[i] = pts[2], pts[1]
+            else:
+                self.u_idx[i] = pts[1], pts[0]
+                self.v_idx[i] = pts[3], pts[2]
+            
+            self.resolved[i] = True
+            self.offsets[i] = ang_params[2]
+            self.scales[i] = ang_params[3]
+            if ang_name.lower() in ['pelvis', 'shoulders']:
+                self.wrap[i] = 90.0
+    
+    @property
+    def resolved_names(self) -> List[str]:
+        """Names of the angles this skeleton can compute"""
+        return [name for name, ok in zip(self.angle_names, self.resolved) if ok]
+    
+    def _resolved_for(self, n_keypoints: int, n_synthetic: int) -> np.ndarray:
+        """Mask of angles whose keypoints all fall inside the keypoints array"""
+        resolved = self.resolved.copy()
+        for idx in (self.u_idx, self.v_idx):
+            resolved &= ((idx >= -n_synthetic) & (idx < n_keypoints)).all(axis=1)
+        return resolved
+    
+    def compute(self, keypoints: np.ndarray,
+                scores: np.ndarray,
+                threshold: float = 0.3) -> np.ndarray:
+        """
+        Compute angles for keypoint arrays of any leading shape
+        
+        Args:
+            keypoints: Array of keypoint coordinates (shape [..., K, 2])
+            scores: Array of keypoint confidence scores (shape [..., K])
+            threshold: Confidence threshold for keypoints
+            
+        Returns:
+            np.ndarray: Angles in degrees (shape [..., A]). Angles that cannot
+                be computed for this skeleton are NaN.
+        """
+        keypoints = np.asarray(keypoints, dtype=float)
+        scores = np.asarray(scores, dtype=float)
+        n_keypoints = keypoints.shape[-2]
+        synthetic = self.synthetic
+        
+        # Filter keypoints by confidence
+        points = np.where((scores >= threshold)[..., np.newaxis], keypoints[..., :2], np.nan)
+        
+        # Append Neck and Hip midpoints, unless their source keypoints are missing
+        if len(synthetic) and synthetic.max() < n_keypoints:
+            midpoints = (points[..., synthetic[:, 0], :] + points[..., synthetic[:, 1], :]) / 2
+            points = np.concatenate((points, midpoints), axis=-2)
+        else:
+            synthetic = synthetic[:0]
+        
+        resolved = self._resolved_for(n_keypoints, len(synthetic))
+        angles = np.full(points.shape[:-2] + (len(resolved),), np.nan)
+        if not resolved.any():
+            return angles
+        
+        u_idx = self.u_idx[resolved]
+        v_idx = self.v_idx[resolved]
+        u = points[..., u_idx[:, 0], :] - points[..., u_idx[:, 1], :]
+        v = points[..., v_idx[:, 0], :] - points[..., v_idx[:, 1], :]
+        
+        # Segment angles are measured against the horizontal vector
+        ang_v = np.where(self.is_segment[resolved], 0.0, np.arctan2(v[..., 1], v[..., 0]))
+        ang = np.degrees(np.arctan2(u[..., 1], u[..., 0]) - ang_v)
+        
+        # Apply offset, scaling factor and wrapping as in fixed_angles
+        ang = (ang + self.offsets[resolved]) * self.scales[resolved]
+        wrap = self.wrap[resolved]
+        ang = np.where(ang > wrap, ang - 2 * wrap, ang)
+        ang = np.where(ang < -wrap, ang + 2 * wrap, ang)
+        
+        angles[..., resolved] = ang
+        return angles
+    
+    def to_dict(self, angles: np.ndarray, n_keypoints: Optional[int] = None) -> Dict[str, float]:
+        """
+        Convert one row of computed angles to a dictionary
+        
+        Args:
+            angles: Angles for a single person (shape [A])
+            n_keypoints: Number of keypoints the angles were computed from
+            
+        Returns:
+            Dict[str, float]: Dictionary of angle names and values
+        """
+        resolved = self.resolved
+        if n_keypoints is not None:
+            n_synthetic = len(self.synthetic) if len(self.synthetic) and self.synthetic.max() < n_keypoints else 0
+            resolved = self._resolved_for(n_keypoints, n_synthetic)
+        return {ang_name: float(angles[i]) for i, ang_name in enumerate(self.angle_names) if resolved[i]}
+
+def _freeze_definitions(angle_definitions: Optional[Dict[str, Any]]) -> tuple:
+    """Turn angle definitions into a hashable cache key"""
+    validated = validate_angle_definitions(angle_definitions)
+    return tuple(sorted((name, (tuple(p[0]), p[1], p[2], p[3])) for name, p in validated.items()))
+
+@lru_cache(maxsize=128)
+def _compile_angle_plan(model_type: str,
+                        angle_names: tuple,
+                        keypoints_names: tuple,
+                        keypoints_ids: tuple,
+                        angle_definitions: tuple) -> AnglePlan:
+    """Compile and cache an AnglePlan"""
+    definitions = {name: [list(p[0]), p[1], p[2], p[3]] for name, p in angle_definitions}
+    return AnglePlan(list(angle_names), list(keypoints_names), list(keypoints_ids), definitions)
+
+def get_angle_plan(model_type: str,
+                   angle_names: List[str],
+                   keypoints_names: List[str],
+                   keypoints_ids: List[int],
+                   angle_definitions: Optional[Dict[str, Any]] = None) -> AnglePlan:
+    """
+    Get a compiled AnglePlan, cached per model type and angle set
+    
+    Args:
+        model_type: Pose model type the skeleton belongs to
+        angle_names: List of angle names to calculate
+        keypoints_names: List of keypoint names corresponding to keypoints array
+        keypoints_ids: List of keypoint IDs corresponding to keypoints array
+        angle_definitions: Optional custom angle definitions
+        
+    Returns:
+        AnglePlan: Shared compiled plan (must not be modified)
+    """
+    return _compile_angle_plan(model_type.upper(),
+                               tuple(angle_names),
+                               tuple(keypoints_names),
+                               tuple(keypoints_ids),
+                               _freeze_definitions(angle_definitions))
+
+def calculate_angles_batch(keypoints: np.ndarray,
+                           scores: np.ndarray,
+                           angle_names: List[str],
+                           keypoints_names: List[str],
+                           keypoints_ids: List[int],
+                           threshold: float = 0.3) -> np.ndarray:
+    """
+    Calculate multiple angles for whole keypoint sequences at once
+    
+    Args:
+        keypoints: Array of keypoint coordinates (shape [T, P, K, 2] for T frames,
+            P persons and K keypoints; any leading shape is accepted)
+        scores: Array of keypoint confidence scores (shape [T, P, K])
+        angle_names: List of angle names to calculate
+        keypoints_names: List of keypoint names corresponding to keypoints array
+        keypoints_ids: List of keypoint IDs corresponding to keypoints array
+        threshold: Confidence threshold for keypoints
+        
+    Returns:
+        np.ndarray: Angles in degrees (shape [T, P, A] for A angle names).
+            Angles that cannot be computed for this skeleton are NaN.
+    """
+    plan = get_angle_plan('', angle_names, keypoints_names, keypoints_ids)
+    return plan.compute(keypoints, scores, threshold)
+
 def calculate_angles(keypoints: np.ndarray, 
                     scores: np.ndarray,
                     angle_names: List[str],
@@ -116,76 +380,8 @@ def calculate_angles(keypoints: np.ndarray,
     Returns:
         Dict[str, float]: Dictionary of angle names and values
     """
-    # Initialize result
-    result = {}
-    
-    # Filter keypoints by confidence
-    valid_mask = scores >= threshold
-    person_X = np.where(valid_mask[:, np.newaxis], keypoints, np.nan)[:, 0]
-    person_Y = np.where(valid_mask[:, np.newaxis], keypoints, np.nan)[:, 1]
-    
-    # Add Neck and Hip if not provided
-    new_keypoints_names, new_keypoints_ids = keypoints_names.copy(), keypoints_ids.copy()
-    person_X_with_additions = person_X.copy()
-    person_Y_with_additions = person_Y.copy()
-    
-    # Helper function to add missing keypoints
-    def add_neck_hip_coords(kpt_name, p_X, p_Y):
-        if kpt_name == 'Neck':
-            # Average of left and right shoulder
-            l_shoulder_idx = keypoints_ids[keypoints_names.index('LShoulder')]
-            r_shoulder_idx = keypoints_ids[keypoints_names.index('RShoulder')]
-            mid_X = (p_X[l_shoulder_idx] + p_X[r_shoulder_idx]) / 2
-            mid_Y = (p_Y[l_shoulder_idx] + p_Y[r_shoulder_idx]) / 2
-        elif kpt_name == 'Hip':
-            # Average of left and right hip
-            l_hip_idx = keypoints_ids[keypoints_names.index('LHip')]
-            r_hip_idx = keypoints_ids[keypoints_names.index('RHip')]
-            mid_X = (p_X[l_hip_idx] + p_X[r_hip_idx]) / 2
-            mid_Y = (p_Y[l_hip_idx] + p_Y[r_hip_idx]) / 2
-        else:
-            raise ValueError(f"Unknown keypoint: {kpt_name}")
-            
-        return mid_X, mid_Y
-    
-    for kpt in ['Neck', 'Hip']:
-        if kpt not in new_keypoints_names:
-            try:
-                mid_X, mid_Y = add_neck_hip_coords(kpt, person_X_with_additions, person_Y_with_additions)
-                new_keypoints_names.append(kpt)
-                new_id = len(person_X_with_additions)
-                new_keypoints_ids.append(new_id)
-                
-                # Extend arrays
-                person_X_with_additions = np.append(person_X_with_additions, mid_X)
-                person_Y_with_additions = np.append(person_Y_with_additions, mid_Y)
-            except (ValueError, IndexError) as e:
-                # Skip if required keypoints not found
-                continue
+    plan = get_angle_plan('', angle_names, keypoints_names, keypoints_ids)
+    angles = plan.compute(keypoints, scores, threshold)
     
-    # Calculate each requested angle
-    for ang_name in angle_names:
-        ang_params = ANGLE_DEFINITIONS.get(ang_name.lower())
-        if not ang_params:
-            continue
-            
-        kpts = ang_params[0]
-        if any(item not in new_keypoints_names for item in kpts):
-            # Skip angles that require keypoints we don't have
-            continue
-            
-        try:
-            # Get coordinates for each keypoint
-            pts_for_angles = []
-            for pt in kpts:
-                idx = new_keypoints_ids[new_keypoints_names.index(pt)]
-                pts_for_angles.append([person_X_with_additions[idx], person_Y_with_additions[idx]])
-                
-            # Calculate the angle
-            ang = fixed_angles(pts_for_angles, ang_name)
-            result[ang_name] = float(ang)
-        except Exception as e:
-            # Skip on error
-            continue
-    
-    return result
\ No newline at end of file
+    # Skip angles that require keypoints we don't have
+    return plan.to_dict(angles, n_keypoints=len(keypoints))
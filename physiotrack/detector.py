@@ -1,11 +1,16 @@
 """
 Core pose detection functionality using RTMLib
 """
+import copy
+import threading
+import contextlib
 from typing import Dict, List, Tuple, Any, Optional, Union
+import cv2
 import numpy as np
 from rtmlib import PoseTracker, BodyWithFeet, Wholebody, Body
 from anytree import Node, RenderTree
 from .models import DetectionConfig
+from .angles import AnglePlan, get_angle_plan
 
 class PoseDetector:
     """Minimal pose detection interface"""
@@ -14,19 +19,35 @@ class PoseDetector:
                  detection_frequency: int = 4,
                  tracking_mode: str = "physiotrack",
                  device: str = "auto",
-                 backend: str = "auto"):
-        """Initialize pose detector with minimal configuration"""
+                 backend: str = "auto",
+                 input_short_side: Optional[int] = None,
+                 roi_margin: Optional[float] = None):
+        """Initialize pose detector with minimal configuration
+        
+        Args:
+            input_short_side: Downscale frames whose short side is longer to this
+                size before inference (None: full resolution)
+            roi_margin: Crop frames to the persons of the previous frame, expanded
+                by this fraction of their size on each side (None: whole frame)
+        """
         self.config = DetectionConfig(
             model_type=model_type,
             detection_frequency=detection_frequency,
             tracking_mode=tracking_mode,
             device=device,
-            backend=backend
+            backend=backend,
+            input_short_side=input_short_side,
+            roi_margin=roi_margin
         )
         self.tracker = None
         self.model = None
         self.keypoints_names = []
         self.keypoints_ids = []
+        self.input_short_side = input_short_side
+        self.roi_margin = roi_margin
+        self.input_scale = 1.0
+        self.roi: Optional[Tuple[int, int, int, int]] = None
+        self._inference_lock: Any = contextlib.nullcontext()
         
         # Set up the detector
         self._setup_detector(model_type, detection_frequency, tracking_mode, device, backend)
@@ -66,6 +87,10 @@ class PoseDetector:
             device=device,
             tracking=False,  # We'll handle tracking ourselves
             to_openpose=False)
+        
+        # ONNX Runtime sessions can run concurrently; OpenVINO and OpenCV models cannot
+        if backend != 'onnxruntime':
+            self._inference_lock = threading.Lock()
     
     def _setup_backend_device(self, backend: str, device: str):
         """Set up the backend and device for the pose tracker"""
@@ -179,6 +204,10 @@ class PoseDetector:
     def detect_pose(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """Detect poses in a single frame
         
+        The frame is first cropped to the region of interest and downscaled as
+        set by set_input_options() and set_input_scale(); keypoints are returned in the coordinates
+        of the original frame either way.
+        
         Args:
             frame: numpy array image
             
@@ -188,14 +217,170 @@ class PoseDetector:
         if self.tracker is None:
             raise ValueError("Pose tracker not initialized. Call _setup_detector() first.")
         
+        image, offset, scale = self._prepare_input(frame)
+        transformed = scale is not None or offset is not None
+        if transformed:
+            self._transform_tracked_boxes(offset, scale, to_input=True)
+        
         # Process the frame with RTMLib
-        keypoints, scores = self.tracker(frame)
+        with self._inference_lock:
+            keypoints, scores = self.tracker(image)
+        
+        # Map the results back to frame coordinates
+        if transformed:
+            self._transform_tracked_boxes(offset, scale, to_input=False)
+            if len(keypoints):
+                keypoints = np.asarray(keypoints, dtype=float)
+                if scale is not None:
+                    keypoints[..., :2] /= scale
+                if offset is not None:
+                    keypoints[..., :2] += offset
+        if self.roi_margin is not None:
+            self.roi = self._persons_roi(keypoints, scores, frame.shape)
         return keypoints, scores
     
+    def set_input_options(self, input_short_side: Optional[int] = None, roi_margin: Optional[float] = None):
+        """Set how the frames of the current stream are prepared for inference
+        
+        Args:
+            input_short_side: Downscale frames whose short side is longer to this
+                size (None: full resolution)
+            roi_margin: Crop frames to the persons of the previous frame, expanded
+                by this fraction of their size on each side, and use the whole
+                frame when no person was found (None: always the whole frame)
+        """
+        self.input_short_side = int(input_short_side) if input_short_side else None
+        self.roi_margin = roi_margin
+        self.roi = None
+    
+    def set_input_scale(self, input_scale: float):
+        """Scale the frames of the current stream before inference from now on
+        
+        The scale applies on top of input_short_side. Boxes followed between
+        detections and the region of interest are kept in frame coordinates,
+        so the scale may change at any frame.
+        
+        Args:
+            input_scale: Scale factor (at most 1)
+        """
+        self.input_scale = min(float(input_scale), 1.0)
+    
+    def _prepare_input(self, frame: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+        """Crop and downscale a frame for inference
+        
+        Returns:
+            Tuple: (image, offset of the crop [x, y] or None, scale [sx, sy] or None)
+        """
+        image, offset, scale = frame, None, None
+        if self.roi_margin is not None and self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            image = frame[y0:y1, x0:x1]
+            offset = np.array([x0, y0], dtype=float)
+        
+        height, width = image.shape[:2]
+        factor = self.input_scale
+        if self.input_short_side and min(height, width) > self.input_short_side:
+            factor *= self.input_short_side / min(height, width)
+        if factor < 1:
+            size = (max(round(width * factor), 1), max(round(height * factor), 1))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+            scale = np.array([size[0] / width, size[1] / height])
+        return image, offset, scale
+    
+    def _transform_tracked_boxes(self, offset: Optional[np.ndarray], scale: Optional[np.ndarray], to_input: bool):
+        """Move RTMLib's boxes of the previous frame between frame and input coordinates"""
+        boxes = getattr(self.tracker, 'bboxes_last_frame', None)
+        if not boxes:
+            return
+        offset = np.tile(offset, 2) if offset is not None else np.zeros(4)
+        scale = np.tile(scale, 2) if scale is not None else np.ones(4)
+        if to_input:
+            self.tracker.bboxes_last_frame = [(np.asarray(box, dtype=float) - offset) * scale for box in boxes]
+        else:
+            self.tracker.bboxes_last_frame = [np.asarray(box, dtype=float) / scale + offset for box in boxes]
+    
+    def _persons_roi(self, keypoints: np.ndarray, scores: np.ndarray,
+                     shape: Tuple[int, ...]) -> Optional[Tuple[int, int, int, int]]:
+        """Region around the confident keypoints of all persons, or None if there are none"""
+        if not len(keypoints):
+            return None
+        points = np.asarray(keypoints, dtype=float)[..., :2][np.asarray(scores) >= self.config.keypoint_threshold]
+        if not len(points):
+            return None
+        (x_min, y_min), (x_max, y_max) = points.min(axis=0), points.max(axis=0)
+        margin_x = self.roi_margin * (x_max - x_min)
+        margin_y = self.roi_margin * (y_max - y_min)
+        height, width = shape[:2]
+        x0, y0 = max(int(x_min - margin_x), 0), max(int(y_min - margin_y), 0)
+        x1, y1 = min(int(np.ceil(x_max + margin_x)) + 1, width), min(int(np.ceil(y_max + margin_y)) + 1, height)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return (x0, y0, x1, y1)
+    
+    def new_session(self, detection_frequency: Optional[int] = None,
+                    input_short_side: Optional[int] = None,
+                    roi_margin: Optional[float] = None) -> "PoseDetector":
+        """Create a detector for another stream, sharing this one's loaded models
+        
+        The new detector has its own RTMLib tracking state and input options,
+        so several streams can run concurrently on one copy of the model
+        weights.
+        
+        Args:
+            detection_frequency: Detection frequency of the stream (defaults to this detector's)
+            input_short_side: Short side frames are downscaled to before inference
+            roi_margin: Margin of ROI cropping around the persons (None: no cropping)
+            
+        Returns:
+            PoseDetector: Detector with fresh tracking state
+        """
+        if self.tracker is None:
+            raise ValueError("Pose tracker not initialized. Call _setup_detector() first.")
+        session = copy.copy(self)
+        session.config = self.config.copy(update={
+            "detection_frequency": int(detection_frequency or self.config.detection_frequency),
+            "input_short_side": input_short_side,
+            "roi_margin": roi_margin
+        })
+        session.tracker = copy.copy(self.tracker)
+        session.reset_tracking()
+        return session
+    
+    def reset_tracking(self):
+        """Reset per-session tracking state while keeping the loaded models"""
+        if self.tracker is not None and hasattr(self.tracker, 'reset'):
+            self.tracker.reset()
+        self.set_detection_frequency(self.config.detection_frequency)
+        self.set_input_options(self.config.input_short_side, self.config.roi_margin)
+        self.set_input_scale(1.0)
+    
+    def set_detection_frequency(self, detection_frequency: int):
+        """Run person detection every `detection_frequency` frames from now on
+        
+        Between detections, persons are followed from their previous poses.
+        """
+        if self.tracker is not None:
+            self.tracker.det_frequency = max(int(detection_frequency), 1)
+    
     def get_keypoint_names(self) -> List[str]:
         """Get the list of keypoint names for the current model"""
         return self.keypoints_names
         
     def get_keypoint_ids(self) -> List[int]:
         """Get the list of keypoint IDs for the current model"""
-        return self.keypoints_ids
\ No newline at end of file
+        return self.keypoints_ids
+    
+    def get_angle_plan(self, angle_names: List[str],
+                       angle_definitions: Optional[Dict[str, Any]] = None) -> AnglePlan:
+        """Get the compiled angle plan for this skeleton
+        
+        Args:
+            angle_names: List of angle names to calculate
+            angle_definitions: Optional custom angle definitions
+            
+        Returns:
+            AnglePlan: Plan cached per model type and angle set
+        """
+        return get_angle_plan(self.config.model_type, angle_names,
+                              self.keypoints_names, self.keypoints_ids,
+                              angle_definitions)
\ No newline at end of file
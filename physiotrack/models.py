@@ -25,6 +25,8 @@ class DetectionConfig(BaseModel):
     keypoint_threshold: float = 0.3
     average_likelihood_threshold: float = 0.5
     keypoint_number_threshold: float = 0.3
+    input_short_side: Optional[int] = None
+    roi_margin: Optional[float] = None
 
 # Angle definitions - extracted from the original code's angle_dict
 ANGLE_DEFINITIONS = {
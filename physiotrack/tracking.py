@@ -0,0 +1,197 @@
+"""
+Multi-person tracking with stable track IDs
+"""
+from typing import Dict, List, Tuple, Optional
+import numpy as np
+from .utils import associate_people
+
+def primary_track(frame_counts: Dict[int, int]) -> Optional[int]:
+    """
+    Choose the person an assessment is about
+
+    The primary track is the one seen in the most frames, the lowest track ID
+    on ties.
+
+    Args:
+        frame_counts: Number of frames each track was seen in, by track ID
+
+    Returns:
+        Optional[int]: ID of the primary track, None without tracks
+    """
+    if not frame_counts:
+        return None
+    return min(frame_counts, key=lambda track_id: (-frame_counts[track_id], track_id))
+
+class Track:
+    """State of a single tracked person"""
+
+    def __init__(self, track_id: int, keypoints: np.ndarray, scores: np.ndarray):
+        """Create a track from its first detection"""
+        self.track_id = track_id
+        self.keypoints = keypoints
+        self.scores = scores
+        self.hits = 1
+        self.lost = 0
+        self.confirmed = False
+
+    def update(self, keypoints: np.ndarray, scores: np.ndarray):
+        """Update the track with a matched detection"""
+        # Keep the last known position of keypoints missing in this frame
+        self.keypoints = np.where(np.isnan(keypoints), self.keypoints, keypoints)
+        self.scores = scores
+        self.hits += 1
+        self.lost = 0
+
+class TrackManager:
+    """Assigns stable IDs to persons across frames
+
+    Detections are matched to active and recently lost tracks by optimal
+    assignment on mean keypoint distance, gated relative to the size of the
+    tracked person so that a new person is not given a lost person's ID.
+    Unmatched detections start new
+    tracks, which are confirmed after `min_hits` consecutive detections.
+    Tracks unseen for more than `max_lost` frames are dropped, and at most
+    `max_lost_tracks` lost tracks are kept for re-identification.
+    """
+
+    def __init__(self, keypoint_threshold: float = 0.3,
+                 average_likelihood_threshold: float = 0.5,
+                 keypoint_number_threshold: float = 0.3,
+                 max_distance: Optional[float] = None,
+                 max_relative_distance: Optional[float] = 0.5,
+                 min_hits: int = 1,
+                 max_lost: int = 30,
+                 max_lost_tracks: int = 16):
+        """
+        Initialize the track manager
+
+        Args:
+            keypoint_threshold: Confidence threshold for a keypoint to count as detected
+            average_likelihood_threshold: Persons whose detected keypoints have a lower
+                mean confidence are ignored
+            keypoint_number_threshold: Persons with a lower fraction of detected
+                keypoints are ignored
+            max_distance: Maximum mean keypoint distance (pixels) for a match
+            max_relative_distance: Maximum mean keypoint distance for a match, as a
+                fraction of the tracked person's size (bounding box diagonal)
+            min_hits: Consecutive detections needed to confirm a new track
+            max_lost: Frames a track may go unseen before it is dropped
+            max_lost_tracks: Maximum number of lost tracks kept for re-identification
+        """
+        self.keypoint_threshold = keypoint_threshold
+        self.average_likelihood_threshold = average_likelihood_threshold
+        self.keypoint_number_threshold = keypoint_number_threshold
+        self.max_distance = max_distance
+        self.max_relative_distance = max_relative_distance
+        self.min_hits = min_hits
+        self.max_lost = max_lost
+        self.max_lost_tracks = max_lost_tracks
+        self.reset()
+
+    def reset(self):
+        """Forget all tracks"""
+        self.tracks: List[Track] = []
+        self.next_id = 0
+
+    def filter_detections(self, keypoints: np.ndarray, scores: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Drop weak person detections
+
+        Args:
+            keypoints: Keypoints of detected persons [P, K, 2]
+            scores: Keypoint scores of detected persons [P, K]
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Keypoints and scores of the kept persons
+        """
+        if len(keypoints) == 0:
+            return keypoints, scores
+
+        good = scores >= self.keypoint_threshold
+        n_good = good.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_good = np.where(good, scores, 0.0).sum(axis=1) / n_good
+        keep = ((n_good > 0)
+                & (mean_good >= self.average_likelihood_threshold)
+                & (n_good / scores.shape[1] >= self.keypoint_number_threshold))
+
+        return keypoints[keep], scores[keep]
+
+    def update(self, keypoints: np.ndarray, scores: np.ndarray) -> Tuple[List[int], np.ndarray, np.ndarray]:
+        """
+        Update tracks with the detections of a new frame
+
+        Args:
+            keypoints: Keypoints of detected persons [P, K, 2]
+            scores: Keypoint scores of detected persons [P, K]
+
+        Returns:
+            Tuple: (track IDs, keypoints [N, K, 2], scores [N, K]) of the confirmed
+                tracks seen in this frame, sorted by track ID
+        """
+        keypoints = np.asarray(keypoints, dtype=float)
+        scores = np.asarray(scores, dtype=float)
+        if keypoints.ndim != 3:
+            keypoints = keypoints.reshape((0, 0, 2))
+            scores = scores.reshape((0, 0))
+        keypoints, scores = self.filter_detections(keypoints, scores)
+
+        # Low-confidence keypoints do not count towards distances
+        positions = np.where((scores >= self.keypoint_threshold)[..., np.newaxis], keypoints[..., :2], np.nan)
+
+        matched_tracks, matched_dets = [], []
+        if self.tracks and len(positions):
+            track_positions = np.stack([track.keypoints for track in self.tracks])
+            matched_tracks, matched_dets, _ = associate_people(track_positions, positions, self.max_distance,
+                                                                 self.max_relative_distance)
+
+        det_by_track = {}
+        for track_idx, det_idx in zip(matched_tracks, matched_dets):
+            track = self.tracks[track_idx]
+            track.update(positions[det_idx], scores[det_idx])
+            if track.hits >= self.min_hits:
+                track.confirmed = True
+            det_by_track[track.track_id] = det_idx
+
+        # Age unmatched tracks; tentative tracks die as soon as they are missed
+        for track in self.tracks:
+            if track.track_id not in det_by_track:
+                track.lost += 1
+        self.tracks = [track for track in self.tracks
+                       if track.lost == 0 or (track.confirmed and track.lost <= self.max_lost)]
+
+        # Bound the lost-track buffer, dropping the longest lost first
+        lost_tracks = sorted((track for track in self.tracks if track.lost > 0), key=lambda t: t.lost)
+        if len(lost_tracks) > self.max_lost_tracks:
+            dropped = {track.track_id for track in lost_tracks[self.max_lost_tracks:]}
+            self.tracks = [track for track in self.tracks if track.track_id not in dropped]
+
+        # Start new tracks for unmatched detections
+        for det_idx in np.setdiff1d(np.arange(len(positions)), matched_dets):
+            track = Track(self.next_id, positions[det_idx], scores[det_idx])
+            track.confirmed = self.min_hits <= 1
+            self.tracks.append(track)
+            det_by_track[track.track_id] = det_idx
+            self.next_id += 1
+
+        # Report confirmed tracks seen in this frame
+        current = sorted((track for track in self.tracks if track.confirmed and track.lost == 0),
+                         key=lambda t: t.track_id)
+        if not current:
+            n_keypoints = keypoints.shape[1]
+            return [], np.zeros((0, n_keypoints, 2)), np.zeros((0, n_keypoints))
+
+        track_ids = [track.track_id for track in current]
+        dets = [det_by_track[track_id] for track_id in track_ids]
+        return track_ids, keypoints[dets], scores[dets]
+
+    @property
+    def active_ids(self) -> List[int]:
+        """IDs of confirmed tracks that are not lost"""
+        return sorted(track.track_id for track in self.tracks if track.confirmed and track.lost == 0)
+
+    @property
+    def primary_id(self) -> Optional[int]:
+        """ID of the primary track among the confirmed tracks that are not lost"""
+        return primary_track({track.track_id: track.hits for track in self.tracks
+                              if track.confirmed and track.lost == 0})
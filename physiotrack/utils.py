@@ -42,9 +42,148 @@ def filter_low_confidence_keypoints(keypoints: np.ndarray,
     filtered_scores = np.where(mask, scores, np.nan)
     return filtered_keypoints, filtered_scores
 
+def _linear_sum_assignment(cost: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Solve the linear assignment problem (Hungarian algorithm)
+    
+    Uses scipy when available and falls back to a shortest augmenting path
+    implementation with vectorized inner loop otherwise.
+    
+    Args:
+        cost: Finite cost matrix [N, M]
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (row indices, column indices) of the optimal assignment
+    """
+    try:
+        from scipy.optimize import linear_sum_assignment
+        return linear_sum_assignment(cost)
+    except ImportError:
+        pass
+    
+    cost = np.asarray(cost, dtype=float)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n_rows, n_cols = cost.shape
+    
+    # Potentials and matching, 1-based with column 0 as a virtual start
+    u = np.zeros(n_rows + 1)
+    v = np.zeros(n_cols + 1)
+    match = np.zeros(n_cols + 1, dtype=np.intp)
+    way = np.zeros(n_cols + 1, dtype=np.intp)
+    
+    for row in range(1, n_rows + 1):
+        match[0] = row
+        col0 = 0
+        min_v = np.full(n_cols + 1, np.inf)
+        used = np.zeros(n_cols + 1, dtype=bool)
+        while True:
+            used[col0] = True
+            row0 = match[col0]
+            free = ~used[1:]
+            reduced = cost[row0 - 1] - u[row0] - v[1:]
+            better = free & (reduced < min_v[1:])
+            min_v[1:][better] = reduced[better]
+            way[1:][better] = col0
+            candidates = np.where(free, min_v[1:], np.inf)
+            col1 = int(np.argmin(candidates)) + 1
+            delta = candidates[col1 - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            min_v[1:][free] -= delta
+            col0 = col1
+            if match[col0] == 0:
+                break
+        # Augment along the alternating path
+        while col0:
+            col1 = way[col0]
+            match[col0] = match[col1]
+            col0 = col1
+    
+    cols = np.flatnonzero(match[1:])
+    rows = match[1:][cols] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+def person_distances(prev_keypoints: np.ndarray, current_keypoints: np.ndarray) -> np.ndarray:
+    """
+    Mean keypoint distance between every pair of persons, ignoring NaNs
+    
+    Args:
+        prev_keypoints: Keypoints from previous frame [P1, K, 2]
+        current_keypoints: Keypoints from current frame [P2, K, 2]
+        
+    Returns:
+        np.ndarray: Distance matrix [P1, P2], inf where persons share no valid keypoint
+    """
+    dist = np.linalg.norm(prev_keypoints[:, np.newaxis, :, :2] - current_keypoints[np.newaxis, :, :, :2], axis=-1)
+    valid = ~np.isnan(dist)
+    counts = valid.sum(axis=-1)
+    sums = np.where(valid, dist, 0.0).sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.inf)
+
+def person_sizes(keypoints: np.ndarray) -> np.ndarray:
+    """
+    Diagonal of the bounding box of every person's valid keypoints
+    
+    Args:
+        keypoints: Keypoints of the persons [P, K, 2]
+        
+    Returns:
+        np.ndarray: Person sizes [P], NaN for persons without valid keypoints
+    """
+    sizes = np.full(len(keypoints), np.nan)
+    valid = ~np.isnan(keypoints[..., :2]).any(axis=-1).all(axis=-1)
+    if valid.any():
+        points = keypoints[valid, :, :2]
+        sizes[valid] = np.linalg.norm(np.nanmax(points, axis=1) - np.nanmin(points, axis=1), axis=-1)
+    return sizes
+
+def associate_people(prev_keypoints: np.ndarray,
+                     current_keypoints: np.ndarray,
+                     max_distance: Optional[float] = None,
+                     max_relative_distance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Optimally match persons across frames
+    
+    Args:
+        prev_keypoints: Keypoints from previous frame [P1, K, 2]
+        current_keypoints: Keypoints from current frame [P2, K, 2]
+        max_distance: Maximum mean keypoint distance (pixels) for a valid match
+        max_relative_distance: Maximum mean keypoint distance for a valid match,
+            as a fraction of the previous person's size (bounding box diagonal)
+        
+    Returns:
+        Tuple: (matched previous indices, matched current indices, distance matrix [P1, P2])
+    """
+    distances = person_distances(prev_keypoints, current_keypoints)
+    if distances.size == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return empty, empty, distances
+    
+    # Pairs that cannot match get a cost larger than any valid assignment
+    allowed = np.isfinite(distances)
+    if max_distance is not None:
+        allowed &= distances <= max_distance
+    if max_relative_distance is not None:
+        sizes = person_sizes(prev_keypoints)
+        allowed &= distances <= max_relative_distance * sizes[:, np.newaxis]
+    finite = distances[allowed]
+    big = (finite.max() + 1.0) * (min(distances.shape) + 1) if finite.size else 1.0
+    cost = np.where(allowed, distances, big)
+    
+    rows, cols = _linear_sum_assignment(cost)
+    keep = allowed[rows, cols]
+    return rows[keep], cols[keep], distances
+
 def sort_people_physiotrack(prev_keypoints: np.ndarray, 
                           current_keypoints: np.ndarray, 
-                          scores: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+                          scores: Optional[np.ndarray] = None,
+                          max_distance: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
     """
     Associate persons across frames using simple distance metric
     
@@ -52,102 +191,52 @@ def sort_people_physiotrack(prev_keypoints: np.ndarray,
         prev_keypoints: Keypoints from previous frame [P, K, 2] (P persons, K keypoints)
         current_keypoints: Keypoints from current frame [P, K, 2]
         scores: Keypoint scores from current frame [P, K]
+        max_distance: Maximum mean keypoint distance (pixels) to keep a person's slot.
+            Persons beyond it are treated as new and placed in empty slots.
         
     Returns:
         Tuple: (sorted_prev_keypoints, sorted_current_keypoints, sorted_scores)
     """
-    import itertools as it
-    
     # Check if inputs are empty
     if len(prev_keypoints) == 0 or len(current_keypoints) == 0:
         return prev_keypoints, current_keypoints, scores
     
-    # Generate all possible person correspondences
-    max_len = max(len(prev_keypoints), len(current_keypoints))
-    
-    # Pad arrays to same length if necessary
-    def pad_array(arr, target_len):
-        if len(arr) < target_len:
-            pad_shape = (target_len - len(arr),) + arr.shape[1:]
-            padding = np.full(pad_shape, np.nan)
-            return np.concatenate((arr, padding))
-        return arr
-    
-    prev_keypoints_padded = pad_array(prev_keypoints, max_len)
-    current_keypoints_padded = pad_array(current_keypoints, max_len)
-    if scores is not None:
-        scores_padded = pad_array(scores, max_len)
-    
-    # Compute distance between persons from one frame to another
-    person_pairs = list(it.product(range(len(prev_keypoints)), range(len(current_keypoints))))
-    
-    # Calculate Euclidean distance between corresponding keypoints
-    distances = []
-    for prev_idx, curr_idx in person_pairs:
-        # Get keypoints for this pair
-        prev_kpts = prev_keypoints[prev_idx]
-        curr_kpts = current_keypoints[curr_idx]
-        
-        # Calculate distance, ignoring NaNs
-        valid_mask = ~np.isnan(prev_kpts).any(axis=1) & ~np.isnan(curr_kpts).any(axis=1)
-        if not np.any(valid_mask):
-            distances.append(float('inf'))
-            continue
-            
-        valid_prev_kpts = prev_kpts[valid_mask]
-        valid_curr_kpts = curr_kpts[valid_mask]
-        
-        dist = np.linalg.norm(valid_prev_kpts - valid_curr_kpts, axis=1).mean()
-        distances.append(dist)
-    
-    # Create correspondence tuples (previous_idx, current_idx, distance)
-    correspondences = []
-    for i, (prev_idx, curr_idx) in enumerate(person_pairs):
-        correspondences.append((prev_idx, curr_idx, distances[i]))
-    
-    # Sort by distance
-    correspondences.sort(key=lambda x: x[2])
-    
-    # Assign correspondences (each person can only be matched once)
-    matched_prev = set()
-    matched_curr = set()
-    final_matches = []
-    
-    for prev_idx, curr_idx, dist in correspondences:
-        if prev_idx not in matched_prev and curr_idx not in matched_curr:
-            final_matches.append((prev_idx, curr_idx))
-            matched_prev.add(prev_idx)
-            matched_curr.add(curr_idx)
+    prev_keypoints = np.asarray(prev_keypoints, dtype=float)
+    current_keypoints = np.asarray(current_keypoints, dtype=float)
+    matched_prev, matched_curr, _ = associate_people(prev_keypoints, current_keypoints, max_distance)
+    
+    # Slots available to unmatched current persons
+    n_prev = len(prev_keypoints)
+    n_slots = max(n_prev, len(current_keypoints))
+    unused_prev = np.setdiff1d(np.arange(n_slots), matched_prev)
+    unused_curr = np.setdiff1d(np.arange(len(current_keypoints)), matched_curr)
+    if max_distance is not None:
+        # Gated-out persons are new: never reuse a slot still holding someone
+        empty_slot = np.ones(n_slots, dtype=bool)
+        empty_slot[:n_prev] = np.isnan(prev_keypoints).all(axis=(1, 2))
+        unused_prev = unused_prev[empty_slot[unused_prev]]
+        n_extra = max(len(unused_curr) - len(unused_prev), 0)
+        unused_prev = np.concatenate((unused_prev, np.arange(n_slots, n_slots + n_extra)))
+        n_slots += n_extra
+    
+    slots = np.concatenate((matched_prev, unused_prev[:len(unused_curr)])).astype(np.intp)
+    sources = np.concatenate((matched_curr, unused_curr)).astype(np.intp)
     
     # Sort current keypoints according to matches
-    sorted_current = np.full_like(current_keypoints_padded, np.nan)
+    sorted_current = np.full((n_slots,) + current_keypoints.shape[1:], np.nan)
+    sorted_current[slots] = current_keypoints[sources]
     if scores is not None:
-        sorted_scores = np.full_like(scores_padded, np.nan)
-    
-    for prev_idx, curr_idx in final_matches:
-        # If index is within bounds
-        if prev_idx < len(sorted_current):
-            sorted_current[prev_idx] = current_keypoints[curr_idx]
-            if scores is not None:
-                sorted_scores[prev_idx] = scores[curr_idx]
-    
-    # Fill unmatched slots
-    curr_used = {curr for _, curr in final_matches}
-    curr_unused = set(range(len(current_keypoints))) - curr_used
-    prev_used = {prev for prev, _ in final_matches}
-    prev_unused = set(range(len(sorted_current))) - prev_used
-    
-    for prev_idx, curr_idx in zip(sorted(prev_unused), sorted(curr_unused)):
-        if curr_idx < len(current_keypoints) and prev_idx < len(sorted_current):
-            sorted_current[prev_idx] = current_keypoints[curr_idx]
-            if scores is not None:
-                sorted_scores[prev_idx] = scores[curr_idx]
+        scores = np.asarray(scores, dtype=float)
+        sorted_scores = np.full((n_slots,) + scores.shape[1:], np.nan)
+        sorted_scores[slots] = scores[sources]
     
     # Keep track of previous values when missing
+    prev_keypoints_padded = np.full_like(sorted_current, np.nan)
+    prev_keypoints_padded[:n_prev] = prev_keypoints
     sorted_prev_keypoints = np.where(np.isnan(sorted_current) & ~np.isnan(prev_keypoints_padded), 
                                     prev_keypoints_padded, sorted_current)
     
     if scores is not None:
         return sorted_prev_keypoints, sorted_current, sorted_scores
     else:
-        return sorted_prev_keypoints, sorted_current
\ No newline at end of file
+        return sorted_prev_keypoints, sorted_current
@@ -34,6 +34,31 @@ class Settings(BaseSettings):
     default_device: str = "auto"
     default_backend: str = "auto"
     
+    # Detector pool settings
+    detector_pool_max_size: int = 4
+    detector_pool_idle_timeout: float = 600.0
+    detector_pool_checkout_timeout: float = 30.0
+    
+    # Realtime frame processing settings
+    realtime_workers: int = 4
+    realtime_history_length: int = 300
+    
+    # Realtime session admission settings
+    realtime_max_sessions: int = 16
+    realtime_downgrade_sessions: int = 8
+    realtime_downgrade_detection_frequency: int = 8
+    
+    # Offline job settings
+    job_workers: int = 2
+    job_max_queued: int = 32
+    job_preload_model: bool = True
+    job_segment_workers: int = 1
+    
+    # Results cache settings
+    results_cache_max_entries: int = 64
+    results_cache_max_mb: int = 64
+    results_max_points_levels: List[int] = [100, 250, 500, 1000, 2000, 5000]
+    
     # Security settings
     enable_auth: bool = False
     api_key: str = ""
@@ -49,6 +74,12 @@ class Settings(BaseSettings):
             raise ValueError("Port must be between 1 and 65535")
         return v
     
+    @validator("realtime_downgrade_sessions")
+    def downgrade_sessions_within_capacity(cls, v, values):
+        if v > values.get("realtime_max_sessions", v):
+            raise ValueError("realtime_downgrade_sessions must not exceed realtime_max_sessions")
+        return v
+    
     def get_upload_path(self):
         """Get upload directory path and create if doesn't exist"""
         import os
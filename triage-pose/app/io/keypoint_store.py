@@ -0,0 +1,253 @@
+# Keypoint storage
+"""
+Columnar on-disk store of per-frame keypoints and scores
+
+A store is a directory holding one raw binary file per column and a
+manifest.json describing their dtypes and shapes. Rows are in long format,
+one per (frame, track) pair, sorted by frame:
+
+- frame_ids: int32 [N]
+- track_ids: int32 [N]
+- keypoints: float32 [N, K, 2]
+- scores: float32 [N, K]
+
+Columns are written in chunks while a video is processed and read back as
+memory maps.
+"""
+import os
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+MANIFEST_FILE = "manifest.json"
+STORE_VERSION = 1
+
+def _column_specs(n_keypoints: int) -> Dict[str, Tuple[str, Tuple[int, ...]]]:
+    """dtype and per-row shape of every column"""
+    return {
+        "frame_ids": ("int32", ()),
+        "track_ids": ("int32", ()),
+        "keypoints": ("float32", (n_keypoints, 2)),
+        "scores": ("float32", (n_keypoints,))
+    }
+
+class KeypointStoreWriter:
+    """Appends rows to a keypoint store in fixed-size chunks"""
+
+    def __init__(self, path: str, keypoint_names: List[str], fps: float,
+                 chunk_size: int = 256, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Create an empty store
+
+        Args:
+            path: Store directory (created if needed, existing columns are replaced)
+            keypoint_names: Names of the skeleton's keypoints
+            fps: Frame rate of the video
+            chunk_size: Number of rows buffered before they are written
+            metadata: Extra values saved in the manifest
+        """
+        self.path = Path(path)
+        self.keypoint_names = list(keypoint_names)
+        self.fps = fps
+        self.chunk_size = max(int(chunk_size), 1)
+        self.metadata = dict(metadata or {})
+        self.n_rows = 0
+        self.n_frames = 0
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        # The keypoint count is fixed by the first stored frame
+        self._specs = _column_specs(len(self.keypoint_names))
+        self._buffers = None
+        self._buffered = 0
+        self._files = {name: open(self.path / f"{name}.bin", "wb") for name in self._specs}
+        self._write_manifest(complete=False)
+
+    def __enter__(self) -> "KeypointStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(self, frame_id: int, track_ids: List[int], keypoints: np.ndarray, scores: np.ndarray):
+        """
+        Add the tracked persons of a frame
+
+        Args:
+            frame_id: Frame index (frames must be appended in increasing order)
+            track_ids: Track IDs of the persons
+            keypoints: Keypoint coordinates (shape [N, K, 2+])
+            scores: Keypoint confidence scores (shape [N, K])
+        """
+        self.n_frames = max(self.n_frames, frame_id + 1)
+        if len(track_ids) and self._buffers is None:
+            self._allocate(keypoints.shape[1])
+        for i, track_id in enumerate(track_ids):
+            row = self._buffered
+            self._buffers["frame_ids"][row] = frame_id
+            self._buffers["track_ids"][row] = track_id
+            self._buffers["keypoints"][row] = keypoints[i, :, :2]
+            self._buffers["scores"][row] = scores[i]
+            self._buffered += 1
+            if self._buffered == self.chunk_size:
+                self.flush()
+
+    def extend(self, frame_ids: np.ndarray, track_ids: np.ndarray, keypoints: np.ndarray, scores: np.ndarray):
+        """
+        Add rows in bulk (rows must continue in increasing frame order)
+
+        Args:
+            frame_ids: Frame index of each row [N]
+            track_ids: Track ID of each row [N]
+            keypoints: Keypoint coordinates [N, K, 2]
+            scores: Keypoint confidence scores [N, K]
+        """
+        self.flush()
+        if len(frame_ids) and self.n_rows == 0:
+            self._specs = _column_specs(keypoints.shape[1])
+        columns = {"frame_ids": frame_ids, "track_ids": track_ids, "keypoints": keypoints, "scores": scores}
+        for name, (dtype, _) in self._specs.items():
+            np.ascontiguousarray(columns[name], dtype=dtype).tofile(self._files[name])
+        self.n_rows += len(frame_ids)
+        if len(frame_ids):
+            self.n_frames = max(self.n_frames, int(frame_ids[-1]) + 1)
+
+    def _allocate(self, n_keypoints: int):
+        """Allocate the chunk buffers"""
+        if self.n_rows == 0:
+            self._specs = _column_specs(n_keypoints)
+        self._buffers = {name: np.zeros((self.chunk_size,) + shape, dtype=dtype)
+                         for name, (dtype, shape) in self._specs.items()}
+
+    def flush(self):
+        """Write the buffered rows"""
+        if not self._buffered:
+            return
+        for name, buffer in self._buffers.items():
+            buffer[:self._buffered].tofile(self._files[name])
+        self.n_rows += self._buffered
+        self._buffered = 0
+
+    def close(self, n_frames: Optional[int] = None):
+        """
+        Write the remaining rows and the final manifest
+
+        Args:
+            n_frames: Number of frames in the video, when later frames had no person
+        """
+        if self._files is None:
+            return
+        self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files = None
+        if n_frames is not None:
+            self.n_frames = max(self.n_frames, n_frames)
+        self._write_manifest(complete=True)
+
+    def _write_manifest(self, complete: bool):
+        """Write the manifest describing the columns"""
+        manifest = {
+            "version": STORE_VERSION,
+            "complete": complete,
+            "n_rows": self.n_rows,
+            "n_frames": self.n_frames,
+            "fps": self.fps,
+            "n_keypoints": self._specs["scores"][1][0],
+            "keypoint_names": self.keypoint_names,
+            "columns": {
+                name: {"file": f"{name}.bin", "dtype": dtype, "shape": [self.n_rows] + list(shape)}
+                for name, (dtype, shape) in self._specs.items()
+            },
+            "metadata": self.metadata
+        }
+        tmp_file = self.path / f"{MANIFEST_FILE}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_file, self.path / MANIFEST_FILE)
+
+class KeypointStore:
+    """Read-only, memory-mapped view of a keypoint store"""
+
+    def __init__(self, path: str):
+        """
+        Open a store
+
+        Args:
+            path: Store directory
+        """
+        self.path = Path(path)
+        with open(self.path / MANIFEST_FILE, "r") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported keypoint store version: {self.manifest.get('version')}")
+        if not self.manifest.get("complete"):
+            raise ValueError(f"Keypoint store is incomplete: {path}")
+
+        self.keypoint_names: List[str] = self.manifest["keypoint_names"]
+        self.fps: float = self.manifest["fps"]
+        self.n_frames: int = self.manifest["n_frames"]
+        self.n_rows: int = self.manifest["n_rows"]
+        self.metadata: Dict[str, Any] = self.manifest.get("metadata", {})
+
+        columns = {}
+        for name, spec in self.manifest["columns"].items():
+            shape = tuple(spec["shape"])
+            if self.n_rows == 0:
+                columns[name] = np.zeros(shape, dtype=spec["dtype"])
+            else:
+                columns[name] = np.memmap(self.path / spec["file"], dtype=spec["dtype"], mode="r", shape=shape)
+        self.frame_ids: np.ndarray = columns["frame_ids"]
+        self.track_ids: np.ndarray = columns["track_ids"]
+        self.keypoints: np.ndarray = columns["keypoints"]
+        self.scores: np.ndarray = columns["scores"]
+
+    def __len__(self) -> int:
+        """Number of rows"""
+        return self.n_rows
+
+    @property
+    def times(self) -> np.ndarray:
+        """Timestamp of every frame"""
+        return np.arange(self.n_frames) / self.fps
+
+    def get_track_ids(self) -> List[int]:
+        """IDs of all stored tracks"""
+        return [int(track_id) for track_id in np.unique(self.track_ids)]
+
+    def get_frame_counts(self) -> Dict[int, int]:
+        """Number of frames each track was seen in, by track ID"""
+        track_ids, counts = np.unique(self.track_ids, return_counts=True)
+        return {int(track_id): int(count) for track_id, count in zip(track_ids, counts)}
+
+    def frame(self, frame_id: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Get the persons of one frame
+
+        Args:
+            frame_id: Frame index
+
+        Returns:
+            Tuple: (track IDs [N], keypoints [N, K, 2], scores [N, K])
+        """
+        start, end = np.searchsorted(self.frame_ids, [frame_id, frame_id + 1])
+        return self.track_ids[start:end], self.keypoints[start:end], self.scores[start:end]
+
+    def track(self, track_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get one track as dense per-frame arrays
+
+        Args:
+            track_id: Track ID
+
+        Returns:
+            Tuple: (keypoints [n_frames, K, 2], scores [n_frames, K]), NaN and 0
+                on frames where the track was not seen
+        """
+        rows = np.flatnonzero(self.track_ids == track_id)
+        n_keypoints = self.manifest["n_keypoints"]
+        keypoints = np.full((self.n_frames, n_keypoints, 2), np.nan, dtype=np.float32)
+        scores = np.zeros((self.n_frames, n_keypoints), dtype=np.float32)
+        keypoints[self.frame_ids[rows]] = self.keypoints[rows]
+        scores[self.frame_ids[rows]] = self.scores[rows]
+        return keypoints, scores
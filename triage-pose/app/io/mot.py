@@ -1 +1,295 @@
 # MOT file handling
+"""
+Reading and writing of OpenSim MOT angle files
+"""
+import warnings
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+
+# Width of the zero-padded nRows field, patched once all rows are written
+NROWS_WIDTH = 10
+
+def _header_lines(n_rows: str, n_columns: int) -> List[str]:
+    """Lines of the MOT header, up to and including 'endheader'"""
+    return [
+        'Coordinates',
+        'version=1',
+        f'nRows={n_rows}',
+        f'nColumns={n_columns}',
+        'inDegrees=yes',
+        '',
+        'Units are S.I. units (second, meters, Newtons, ...)',
+        "If the header above contains a line with 'inDegrees', this indicates whether rotational values are in degrees (yes) or radians (no).",
+        '',
+        'endheader',
+    ]
+
+class MotWriter:
+    """Streams rows of angles to a MOT file
+
+    Rows are buffered and written in blocks. The header's row count is
+    written as a fixed-width field and patched when the writer is closed.
+    """
+
+    def __init__(self, path: str, angle_names: List[str], block_size: int = 1024, precision: int = 6):
+        """
+        Create the file and write its header
+
+        Args:
+            path: Output MOT file
+            angle_names: Names of the angle columns
+            block_size: Number of rows buffered before they are written
+            precision: Decimals written for every value
+        """
+        self.path = Path(path)
+        self.angle_names = list(angle_names)
+        self.block_size = max(int(block_size), 1)
+        self.n_rows = 0
+
+        n_columns = len(self.angle_names) + 1
+        self._row_format = '\t'.join([f'%.{precision}f'] * n_columns) + '\n'
+        self._block = np.empty((self.block_size, n_columns))
+        self._buffered = 0
+
+        self._file = open(self.path, 'w', newline='\n')
+        header = _header_lines('0' * NROWS_WIDTH, n_columns)
+        prefix = '\n'.join(header[:2]) + '\n'
+        self._nrows_offset = len(prefix.encode('utf-8')) + len('nRows=')
+        self._file.write('\n'.join(header) + '\n')
+        self._file.write('\t'.join(['time'] + self.angle_names) + '\n')
+
+    def __enter__(self) -> "MotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write_row(self, time: float, angles: np.ndarray):
+        """
+        Add one row
+
+        Args:
+            time: Timestamp in seconds
+            angles: Angle values (shape [A], NaN where missing)
+        """
+        self._block[self._buffered, 0] = time
+        self._block[self._buffered, 1:] = angles
+        self._buffered += 1
+        if self._buffered == self.block_size:
+            self.flush()
+
+    def write_rows(self, times: np.ndarray, angles: np.ndarray):
+        """
+        Add several rows
+
+        Args:
+            times: Timestamps in seconds (shape [T])
+            angles: Angle values (shape [T, A], NaN where missing)
+        """
+        self.flush()
+        times = np.asarray(times, dtype=float)
+        angles = np.asarray(angles, dtype=float).reshape(len(times), len(self.angle_names))
+        for start in range(0, len(times), self.block_size):
+            end = min(start + self.block_size, len(times))
+            self._write_block(np.column_stack((times[start:end], angles[start:end])))
+
+    def flush(self):
+        """Write the buffered rows"""
+        if self._buffered:
+            self._write_block(self._block[:self._buffered])
+            self._buffered = 0
+
+    def _write_block(self, block: np.ndarray):
+        """Format and write a block of rows"""
+        self._file.write((self._row_format * len(block)) % tuple(block.ravel()))
+        self.n_rows += len(block)
+
+    def close(self):
+        """Write the remaining rows and the final row count"""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+        with open(self.path, 'r+b') as f:
+            f.seek(self._nrows_offset)
+            f.write(f'{self.n_rows:0{NROWS_WIDTH}d}'.encode('ascii'))
+
+def write_mot(path: str, angle_names: List[str], times: np.ndarray, angles: np.ndarray):
+    """
+    Write a whole MOT file
+
+    Args:
+        path: Output MOT file
+        angle_names: Names of the angle columns
+        times: Timestamps in seconds (shape [T])
+        angles: Angle values (shape [T, A], NaN where missing)
+    """
+    with MotWriter(path, angle_names) as writer:
+        writer.write_rows(times, angles)
+
+class MotData:
+    """Contents of a MOT file"""
+
+    def __init__(self, header: Dict[str, str], columns: List[str], data: np.ndarray):
+        """
+        Args:
+            header: Key/value lines of the header
+            columns: Column names, starting with 'time'
+            data: Values (shape [T, C])
+        """
+        self.header = header
+        self.columns = columns
+        self.data = data
+
+    def __len__(self) -> int:
+        """Number of rows"""
+        return len(self.data)
+
+    @property
+    def times(self) -> np.ndarray:
+        """Timestamps in seconds"""
+        return self.data[:, 0]
+
+    @property
+    def angle_names(self) -> List[str]:
+        """Names of the angle columns"""
+        return self.columns[1:]
+
+    @property
+    def angles(self) -> np.ndarray:
+        """Angle values (shape [T, A])"""
+        return self.data[:, 1:]
+
+    def column(self, name: str) -> np.ndarray:
+        """Values of one column"""
+        return self.data[:, self.columns.index(name)]
+
+def _fill_empty_fields(text: str) -> str:
+    """Mark empty fields (as written by pandas for NaN) as 'nan'"""
+    if text.startswith('\t'):
+        text = 'nan' + text
+    # Two passes, since consecutive empty fields share a tab
+    text = text.replace('\t\t', '\tnan\t').replace('\t\t', '\tnan\t')
+    return text.replace('\t\n', '\tnan\n').replace('\n\t', '\nnan\t')
+
+def read_mot(path: str) -> MotData:
+    """
+    Read a MOT file
+
+    The header is parsed once and the data is loaded straight into a
+    NumPy array. Empty fields are read as NaN.
+
+    Args:
+        path: MOT file
+
+    Returns:
+        MotData: Column names and values
+    """
+    with open(path, 'r') as f:
+        header = {}
+        line = f.readline()
+        while not line.startswith('time'):
+            if not line:
+                raise ValueError(f"No column header found in MOT file: {path}")
+            if '=' in line:
+                key, value = line.rstrip('\r\n').split('=', 1)
+                header[key] = value
+            line = f.readline()
+        columns = line.rstrip('\r\n').split('\t')
+        data_offset = f.tell()
+        try:
+            with warnings.catch_warnings():
+                # An assessment without frames has no rows
+                warnings.simplefilter("ignore", category=UserWarning)
+                values = np.loadtxt(f, delimiter='\t', ndmin=2)
+        except ValueError:
+            # Empty fields, as written by pandas for NaN
+            f.seek(data_offset)
+            text = f.read().replace('\r', '')
+            if not text.endswith('\n'):
+                text += '\n'
+            values = np.fromstring(_fill_empty_fields(text), sep=' ') if text.strip() else np.zeros(0)
+
+    if values.size == 0:
+        values = np.zeros((0, len(columns)))
+    if values.size % len(columns) or (values.ndim == 2 and values.shape[1] != len(columns)):
+        raise ValueError(f"Malformed MOT file {path}: {values.size} values for {len(columns)} columns")
+    return MotData(header, columns, values.reshape(-1, len(columns)))
+
+class TrackMotWriter:
+    """Streams the angles of every tracked person to its own MOT file
+
+    Files are named '<prefix>_angles_personNN.mot'. Frames where a person is
+    not tracked are written as NaN rows, and person 0 always gets a file.
+    `frame_counts` counts the frames each person was tracked in.
+    """
+
+    def __init__(self, output_dir: str, prefix: str, angle_names: List[str], fps: float,
+                 columns: Optional[np.ndarray] = None):
+        """
+        Args:
+            output_dir: Directory of the MOT files
+            prefix: File name prefix (the assessment ID)
+            angle_names: Names of the angle columns
+            fps: Frame rate, for the time column
+            columns: Indices or mask selecting angle_names from each row of angles
+        """
+        self.output_dir = Path(output_dir)
+        self.prefix = prefix
+        self.angle_names = list(angle_names)
+        self.fps = fps
+        self.columns = columns
+        self.n_frames = 0
+        self.frame_counts: Dict[int, int] = {}
+        self._writers: Dict[int, MotWriter] = {}
+        self._written: Dict[int, int] = {}
+
+    def path_for(self, track_id: int) -> Path:
+        """MOT file of a track"""
+        return self.output_dir / f"{self.prefix}_angles_person{track_id:02d}.mot"
+
+    def write_frame(self, track_ids: List[int], track_angles: np.ndarray):
+        """
+        Add the next frame
+
+        Args:
+            track_ids: IDs of the persons tracked in the frame
+            track_angles: Angles of each person (shape [N, A'])
+        """
+        frame_idx = self.n_frames
+        for track_id, angles in zip(track_ids, track_angles):
+            if track_id not in self._writers:
+                self._writers[track_id] = MotWriter(str(self.path_for(track_id)), self.angle_names)
+                self._written[track_id] = 0
+                self.frame_counts[track_id] = 0
+            self._pad(track_id, frame_idx)
+            self._writers[track_id].write_row(frame_idx / self.fps,
+                                              angles if self.columns is None else angles[self.columns])
+            self._written[track_id] = frame_idx + 1
+            self.frame_counts[track_id] += 1
+        self.n_frames += 1
+
+    def _pad(self, track_id: int, n_frames: int):
+        """Write NaN rows for the frames a track was not seen"""
+        start = self._written[track_id]
+        if start < n_frames:
+            times = np.arange(start, n_frames) / self.fps
+            self._writers[track_id].write_rows(times, np.full((len(times), len(self.angle_names)), np.nan))
+            self._written[track_id] = n_frames
+
+    def close(self) -> List[Path]:
+        """
+        Pad and close every file
+
+        Returns:
+            List[Path]: MOT files sorted by track ID, person 0 first
+        """
+        if 0 not in self._writers:
+            self._writers[0] = MotWriter(str(self.path_for(0)), self.angle_names)
+            self._written[0] = 0
+        for track_id, writer in self._writers.items():
+            self._pad(track_id, self.n_frames)
+            writer.close()
+        return [self.path_for(track_id) for track_id in sorted(self._writers)]
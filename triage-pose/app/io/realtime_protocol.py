@@ -0,0 +1,173 @@
+# Realtime protocol
+"""
+Binary message format of the realtime WebSocket
+
+A client selects it with {"protocol": "binary"} in its configuration
+message. The server then sends one JSON schema message and, for every
+frame received as raw JPEG bytes, one binary result packet (little-endian):
+
+    header     24 bytes: version u8, flags u8, n_keypoints u16, n_angles u16,
+               keypoint dtype u8 (0: float32, 1: int16), reserved u8,
+               frame_id u32, jpeg_size u32, dropped_frames u32,
+               latency_ms f32
+    keypoints  n_keypoints x 2 coordinates (pixels)
+    scores     n_keypoints confidences
+    angles     n_angles float32, in schema order
+    rom        4 x n_angles float32: ROM min and max (as in ROM reports),
+               rolling mean, std
+    jpeg       jpeg_size bytes of the annotated frame
+
+Missing values are NaN in float arrays and -32768 in int16 arrays, where
+scores are stored in 1/10000 units.
+"""
+import struct
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+PROTOCOL_VERSION = 1
+HEADER = struct.Struct("<BBHHBBIIIf")
+FLAG_PERSON = 1
+FLAG_FRAME = 2
+KEYPOINT_DTYPES = {"float32": 0, "int16": 1}
+INT16_MISSING = -32768
+SCORE_SCALE = 10000
+
+class ResultPacker:
+    """Packs per-frame results of one realtime session into binary packets"""
+
+    def __init__(self, keypoint_names: List[str], angle_names: List[str], keypoint_dtype: str = "float32"):
+        """
+        Initialize the packer for a session's skeleton and angles
+
+        Args:
+            keypoint_names: Keypoints, in packet order
+            angle_names: Angles, in packet order
+            keypoint_dtype: Encoding of keypoints and scores (float32 or int16)
+        """
+        if keypoint_dtype not in KEYPOINT_DTYPES:
+            raise ValueError(f"Unknown keypoint dtype '{keypoint_dtype}', expected float32 or int16")
+        self.keypoint_names = list(keypoint_names)
+        self.angle_names = list(angle_names)
+        self.keypoint_dtype = keypoint_dtype
+        self._angle_index = {name: i for i, name in enumerate(self.angle_names)}
+
+    def schema(self) -> Dict[str, Any]:
+        """Schema message describing the packets"""
+        return {
+            "type": "schema",
+            "version": PROTOCOL_VERSION,
+            "keypoint_names": self.keypoint_names,
+            "angle_names": self.angle_names,
+            "keypoint_dtype": self.keypoint_dtype,
+            "rom_fields": ["min", "max", "mean", "std"],
+            "int16_missing": INT16_MISSING,
+            "score_scale": SCORE_SCALE
+        }
+
+    def _encode(self, values: np.ndarray, scale: float = 1.0) -> bytes:
+        """Encode keypoint coordinates or scores in the keypoint dtype"""
+        if self.keypoint_dtype == "float32":
+            return values.astype("<f4").tobytes()
+        scaled = np.round(values * scale)
+        scaled = np.where(np.isnan(scaled), INT16_MISSING, np.clip(scaled, INT16_MISSING + 1, 32767))
+        return scaled.astype("<i2").tobytes()
+
+    def pack(self,
+             frame_id: int,
+             keypoints: Optional[np.ndarray],
+             scores: Optional[np.ndarray],
+             angles: Dict[str, float],
+             rom: Optional[np.ndarray] = None,
+             jpeg: bytes = b"",
+             dropped_frames: int = 0,
+             latency_ms: float = float("nan")) -> bytes:
+        """
+        Pack the results of one frame
+
+        Args:
+            frame_id: Frame counter of the session
+            keypoints: Keypoints of the reported person [K', 2+], or None if no person
+            scores: Keypoint scores of the reported person [K']
+            angles: Angle values by name
+            rom: Running ROM statistics [4, n_angles] (smoothed min and max,
+                mean, std), in angle order
+            jpeg: Encoded annotated frame
+            dropped_frames: Frames of the session dropped so far without processing
+            latency_ms: Time from receiving the frame to sending its result
+
+        Returns:
+            bytes: Result packet
+        """
+        n_keypoints, n_angles = len(self.keypoint_names), len(self.angle_names)
+        person = keypoints is not None and len(keypoints) > 0
+
+        coordinates = np.full((n_keypoints, 2), np.nan)
+        confidences = np.full(n_keypoints, np.nan)
+        if person:
+            n = min(n_keypoints, len(keypoints))
+            coordinates[:n] = keypoints[:n, :2]
+            confidences[:n] = scores[:n]
+
+        angle_values = np.full(n_angles, np.nan, dtype="<f4")
+        for name, value in angles.items():
+            i = self._angle_index.get(name)
+            if i is not None:
+                angle_values[i] = value
+        rom_values = np.full((4, n_angles), np.nan, dtype="<f4") if rom is None else np.asarray(rom, dtype="<f4")
+
+        flags = (FLAG_PERSON if person else 0) | (FLAG_FRAME if jpeg else 0)
+        header = HEADER.pack(PROTOCOL_VERSION, flags, n_keypoints, n_angles,
+                             KEYPOINT_DTYPES[self.keypoint_dtype], 0, frame_id & 0xFFFFFFFF, len(jpeg),
+                             dropped_frames & 0xFFFFFFFF, latency_ms)
+        return b"".join((
+            header,
+            self._encode(coordinates),
+            self._encode(confidences, SCORE_SCALE),
+            angle_values.tobytes(),
+            rom_values.tobytes(),
+            jpeg
+        ))
+
+def unpack_result(packet: bytes) -> Dict[str, Any]:
+    """
+    Decode a result packet, as a client would
+
+    Args:
+        packet: Result packet
+
+    Returns:
+        Dict: frame_id, person, dropped_frames, latency_ms, keypoints [K, 2],
+            scores [K], angles [A], rom [4, A] and jpeg
+    """
+    (version, flags, n_keypoints, n_angles, dtype, _, frame_id, jpeg_size,
+     dropped_frames, latency_ms) = HEADER.unpack_from(packet)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported protocol version: {version}")
+    offset = HEADER.size
+    item = np.dtype("<f4") if dtype == KEYPOINT_DTYPES["float32"] else np.dtype("<i2")
+
+    def take(dtype: np.dtype, count: int) -> np.ndarray:
+        nonlocal offset
+        values = np.frombuffer(packet, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+        return values
+
+    keypoints = take(item, 2 * n_keypoints).reshape(n_keypoints, 2).astype(float)
+    scores = take(item, n_keypoints).astype(float)
+    if item.kind == "i":
+        keypoints[keypoints == INT16_MISSING] = np.nan
+        scores[scores == INT16_MISSING] = np.nan
+        scores /= SCORE_SCALE
+    angles = take(np.dtype("<f4"), n_angles)
+    rom = take(np.dtype("<f4"), 4 * n_angles).reshape(4, n_angles)
+    return {
+        "frame_id": frame_id,
+        "person": bool(flags & FLAG_PERSON),
+        "dropped_frames": dropped_frames,
+        "latency_ms": latency_ms,
+        "keypoints": keypoints,
+        "scores": scores,
+        "angles": angles,
+        "rom": rom,
+        "jpeg": packet[offset:offset + jpeg_size]
+    }
@@ -1 +1,185 @@
 # Video handling functions
+"""
+Video reading and writing helpers
+"""
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import subprocess
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+import cv2
+import numpy as np
+
+# Marks the end of a frame queue
+_END = object()
+
+def read_frames(cap: cv2.VideoCapture, max_frames: Optional[int] = None) -> Iterator[np.ndarray]:
+    """
+    Yield the frames of an opened video capture
+
+    Args:
+        cap: Opened video capture
+        max_frames: Maximum number of frames to read (default: until the end)
+
+    Returns:
+        Iterator[np.ndarray]: Decoded frames
+    """
+    n_read = 0
+    while cap.isOpened() and (max_frames is None or n_read < max_frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        n_read += 1
+        yield frame
+
+def concat_videos(paths: List[str], output_path: str, fps: float, size: Tuple[int, int]):
+    """
+    Concatenate videos encoded with the same settings
+
+    Streams are copied with ffmpeg when it is available, otherwise the
+    frames are re-encoded with OpenCV.
+
+    Args:
+        paths: Videos to concatenate, in order
+        output_path: Output video
+        fps: Frame rate of the videos
+        size: Frame size (width, height) of the videos
+    """
+    if paths and shutil.which("ffmpeg"):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            for path in paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+            list_file = f.name
+        try:
+            subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                            "-i", list_file, "-c", "copy", output_path], check=True)
+            return
+        except (OSError, subprocess.CalledProcessError):
+            pass
+        finally:
+            os.remove(list_file)
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+    try:
+        for path in paths:
+            cap = cv2.VideoCapture(path)
+            try:
+                for frame in read_frames(cap):
+                    writer.write(frame)
+            finally:
+                cap.release()
+    finally:
+        writer.release()
+
+class ThreadedFrameReader:
+    """Decodes frames on a background thread into a bounded queue"""
+
+    def __init__(self, cap: cv2.VideoCapture, queue_size: int = 8, max_frames: Optional[int] = None):
+        """
+        Start decoding
+
+        Args:
+            cap: Opened video capture (released by the caller after close())
+            queue_size: Maximum number of decoded frames waiting to be consumed
+            max_frames: Maximum number of frames to read (default: until the end)
+        """
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._max_frames = max_frames
+        self._thread = threading.Thread(target=self._run, args=(cap,), name="video-decoder", daemon=True)
+        self._thread.start()
+
+    def _put(self, item: Any) -> bool:
+        """Put an item, giving up if the reader is closed"""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self, cap: cv2.VideoCapture):
+        """Decoder thread"""
+        try:
+            for frame in read_frames(cap, self._max_frames):
+                if not self._put(frame):
+                    return
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(_END)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """Yield decoded frames in order"""
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def close(self):
+        """Stop decoding and wait for the decoder thread"""
+        self._stop.set()
+        self._thread.join()
+
+class ThreadedFrameWriter:
+    """Renders and encodes frames on a background thread, in submission order"""
+
+    def __init__(self, writer: cv2.VideoWriter,
+                 render: Optional[Callable[[np.ndarray, Any], np.ndarray]] = None,
+                 queue_size: int = 8):
+        """
+        Start the writer thread
+
+        Args:
+            writer: Opened video writer (released by the caller after close())
+            render: Function turning (frame, data) into the frame to write
+            queue_size: Maximum number of frames waiting to be written
+        """
+        self._writer = writer
+        self._render = render
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.error: Optional[Exception] = None
+        self._thread = threading.Thread(target=self._run, name="video-encoder", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Encoder thread"""
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if self.error is not None:
+                # Keep draining so the producer never blocks
+                continue
+            try:
+                frame, data = item
+                if self._render is not None:
+                    frame = self._render(frame, data)
+                self._writer.write(frame)
+            except Exception as e:
+                self.error = e
+
+    def write(self, frame: np.ndarray, data: Any = None):
+        """
+        Queue a frame to be rendered and written
+
+        Args:
+            frame: Original frame
+            data: Data passed to the render function
+        """
+        if self.error is not None:
+            raise self.error
+        self._queue.put((frame, data))
+
+    def close(self):
+        """Flush pending frames and wait for the writer thread"""
+        self._queue.put(_END)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
@@ -11,6 +11,8 @@ import os
 
 from app.routers import assessment, exercise, utils, realtime
 from app.config import Settings
+from app.services.frame_executor import frame_executor
+from app.services.job_service import job_executor
 
 # Load settings
 settings = Settings()
@@ -40,6 +42,17 @@ app.include_router(exercise.router, prefix="/api/v1/exercise", tags=["Exercise"]
 app.include_router(utils.router, prefix="/api/v1/utils", tags=["Utilities"])
 app.include_router(realtime.router, prefix="/api/v1/realtime", tags=["Real-time"])
 
+@app.on_event("startup")
+async def startup_event():
+    """Start background workers"""
+    job_executor.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    frame_executor.shutdown(wait=False)
+    job_executor.shutdown(wait=False)
+
 # Root endpoint
 @app.get("/")
 async def root():
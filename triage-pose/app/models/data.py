@@ -13,17 +13,50 @@ class ProcessingOptions(BaseModel):
     tracking_mode: str = "physiotrack" 
     device: str = "auto"
     backend: str = "auto"
+    input_short_side: Optional[int] = None
+    roi_cropping: bool = False
+    roi_margin: float = 0.25
     keypoint_threshold: float = 0.3
     average_likelihood_threshold: float = 0.5
     keypoint_number_threshold: float = 0.3
+    tracking_max_distance: Optional[float] = None
+    tracking_max_relative_distance: Optional[float] = 0.5
+    tracking_max_lost_frames: int = 30
+    tracking_max_lost_tracks: int = 16
     joint_angles: List[str] = []
     segment_angles: List[str] = []
+    custom_angles: Dict[str, List[Any]] = {}
     height: float = 1.7
     visible_side: str = "auto"
     save_processed_video: bool = True
+    save_keypoints: bool = True
+    pipelined: bool = True
+    pipeline_queue_size: int = 8
+    history_length: int = 300
+    segment_workers: int = 1
+    segment_min_frames: int = 150
+    rom_time_window: float = 0.4
+    filter_type: str = "none"
+    filter_order: int = 4
+    filter_cutoff: float = 6
+    filter_fps: float = 30
+    motion_gating: bool = False
+    motion_threshold: float = 0.005
+    motion_max_skipped: int = 15
     
     class Config:
         arbitrary_types_allowed = True
+    
+    def detector_options(self) -> Dict[str, Any]:
+        """Pose detector settings, as passed to DetectorPool.checkout()"""
+        return {
+            "model_type": self.model_type,
+            "backend": self.backend,
+            "device": self.device,
+            "detection_frequency": self.detection_frequency,
+            "input_short_side": self.input_short_side,
+            "roi_margin": self.roi_margin if self.roi_cropping else None
+        }
 
 class ROMAnalysisOptions(BaseModel):
     """Options for ROM analysis"""
@@ -33,18 +66,157 @@ class ROMAnalysisOptions(BaseModel):
     filter_type: str = "butterworth"
     filter_order: int = 4
     filter_cutoff: float = 6
+    filter_sigma: float = 1
+    filter_kernel_size: int = 3
+    filter_loess_window: int = 5
+    interpolate_max_gap: int = 10
     height: float = 1.7
+    max_points: Optional[int] = None
     
     class Config:
         arbitrary_types_allowed = True
 
 class FrameContext:
-    """Context object for frame-to-frame processing"""
-    def __init__(self):
+    """Context object for frame-to-frame processing
+    
+    The keypoints, scores and angles of the last `history_length` frames with
+    a detected person are kept in preallocated ring buffers, so memory stays
+    constant for long-lived sessions. The buffers are allocated on the first
+    pushed frame, which fixes the keypoint count and the angle columns.
+    
+    Running ROM statistics are kept by an optional incremental ROM engine
+    (see analysis_service.IncrementalROM) fed with every pushed frame, and the
+    reported angles may be smoothed by an optional causal filter
+    (see processors.filtering.CausalFilter). Pose inference may be skipped on
+    frames without motion by an optional motion gate
+    (see processors.motion_gate.MotionGate).
+    """
+    __slots__ = ("frame_count", "time", "track_manager", "history_length", "angle_names", "rom", "angle_filter",
+                 "motion_gate", "_keypoints", "_scores", "_angles", "_frame_ids", "_head", "_size")
+    
+    def __init__(self, history_length: int = 300, angle_names: Optional[List[str]] = None,
+                 rom: Any = None, angle_filter: Any = None, motion_gate: Any = None):
+        """
+        Initialize an empty context
+        
+        Args:
+            history_length: Number of frames kept in the history
+            angle_names: Angle columns (default: keys of the first pushed angles dict)
+            rom: Incremental ROM engine over the same angle columns
+            angle_filter: Causal filter applied to the angles of each frame
+            motion_gate: Motion gate deciding which frames need pose inference
+        """
         self.frame_count = 0
-        self.keypoints_history = []
-        self.angles_history = []
-        self.running_min = {}
-        self.running_max = {}
         self.time = 0.0
-        self.prev_keypoints = None
\ No newline at end of file
+        self.track_manager = None
+        self.history_length = max(int(history_length), 1)
+        self.angle_names = list(angle_names) if angle_names is not None else None
+        self.rom = rom
+        self.angle_filter = angle_filter
+        self.motion_gate = motion_gate
+        self._keypoints = None
+        self._scores = None
+        self._angles = None
+        self._frame_ids = None
+        self._head = 0
+        self._size = 0
+    
+    def __len__(self) -> int:
+        """Number of frames in the history"""
+        return self._size
+    
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the history buffers"""
+        if self._keypoints is None:
+            return 0
+        return self._keypoints.nbytes + self._scores.nbytes + self._angles.nbytes + self._frame_ids.nbytes
+    
+    def push(self, keypoints: np.ndarray, scores: np.ndarray, angles: Any):
+        """
+        Add the current frame's person to the history
+        
+        Args:
+            keypoints: Keypoint coordinates (shape [K, 2])
+            scores: Keypoint confidence scores (shape [K])
+            angles: Angles (shape [A], ordered as angle_names) or dict of angle values
+        """
+        if isinstance(angles, dict):
+            if self.angle_names is None:
+                self.angle_names = list(angles)
+            angles = [angles.get(name, np.nan) for name in self.angle_names]
+        angles = np.asarray(angles, dtype=float)
+        keypoints = np.asarray(keypoints, dtype=float)
+        
+        if self._keypoints is None:
+            n_keypoints, n_angles = len(keypoints), len(angles)
+            if self.angle_names is None:
+                self.angle_names = [f"angle_{i}" for i in range(n_angles)]
+            self._keypoints = np.full((self.history_length, n_keypoints, 2), np.nan, dtype=np.float32)
+            self._scores = np.zeros((self.history_length, n_keypoints), dtype=np.float32)
+            self._angles = np.full((self.history_length, n_angles), np.nan)
+            self._frame_ids = np.full(self.history_length, -1, dtype=np.int64)
+        
+        i = self._head
+        self._keypoints[i] = keypoints[:, :2]
+        self._scores[i] = scores
+        self._angles[i] = angles
+        self._frame_ids[i] = self.frame_count
+        self._head = (i + 1) % self.history_length
+        self._size = min(self._size + 1, self.history_length)
+        
+        # Update running statistics for ROM calculation
+        if self.rom is not None:
+            self.rom.update(angles)
+    
+    def last(self, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Get the last frames of the history, oldest first
+        
+        Args:
+            n: Number of frames (default: the whole history)
+            
+        Returns:
+            Dict[str, np.ndarray]: 'frame_ids' [N], 'keypoints' [N, K, 2],
+                'scores' [N, K] and 'angles' [N, A]
+        """
+        n = self._size if n is None else min(n, self._size)
+        if self._keypoints is None:
+            return {
+                'frame_ids': np.zeros(0, dtype=np.int64),
+                'keypoints': np.zeros((0, 0, 2), dtype=np.float32),
+                'scores': np.zeros((0, 0), dtype=np.float32),
+                'angles': np.zeros((0, 0))
+            }
+        idx = (self._head - n + np.arange(n)) % self.history_length
+        return {
+            'frame_ids': self._frame_ids[idx],
+            'keypoints': self._keypoints[idx],
+            'scores': self._scores[idx],
+            'angles': self._angles[idx]
+        }
+    
+    def angle_history(self, angle_name: str, n: Optional[int] = None) -> np.ndarray:
+        """
+        Get the last values of one angle, oldest first
+        
+        Args:
+            angle_name: Angle column
+            n: Number of frames (default: the whole history)
+            
+        Returns:
+            np.ndarray: Angle values [N]
+        """
+        if self.angle_names is None or angle_name not in self.angle_names:
+            return np.zeros(0)
+        return self.last(n)['angles'][:, self.angle_names.index(angle_name)]
+    
+    @property
+    def running_min(self) -> Dict[str, float]:
+        """Smallest value seen for each angle"""
+        return self.rom.to_dict(self.rom.min) if self.rom is not None else {}
+    
+    @property
+    def running_max(self) -> Dict[str, float]:
+        """Largest value seen for each angle"""
+        return self.rom.to_dict(self.rom.max) if self.rom is not None else {}
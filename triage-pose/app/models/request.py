@@ -2,8 +2,12 @@
 """
 Request models for the Triage-Pose API
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any
+import physiotrack
+
+from ..processors.filtering import validate_filter_type
+from ..io.realtime_protocol import KEYPOINT_DTYPES
 
 class ROMAssessmentParams(BaseModel):
     """Parameters for ROM assessment"""
@@ -12,11 +16,48 @@ class ROMAssessmentParams(BaseModel):
     time_range: Optional[List[float]] = Field(None, description="Time range for analysis [start, end]")
     joint_angles: Optional[List[str]] = Field(None, description="List of joint angles to analyze")
     segment_angles: Optional[List[str]] = Field(None, description="List of segment angles to analyze")
+    custom_angles: Optional[Dict[str, List[Any]]] = Field(None, description="Custom angle definitions {name: [keypoints, angle_type, offset, scale]}")
     model_type: str = Field("body_with_feet", description="Pose model type")
     detection_frequency: int = Field(4, description="Detection frequency (frames)")
     tracking_mode: str = Field("physiotrack", description="Tracking mode")
     device: str = Field("auto", description="Device for inference")
     backend: str = Field("auto", description="Backend for inference")
+    input_short_side: Optional[int] = Field(None, ge=32, description="Downscale frames to this short side (pixels) before inference")
+    roi_cropping: bool = Field(False, description="Run inference on the region around the persons of the previous frame")
+    roi_margin: float = Field(0.25, ge=0.0, description="Margin around the persons in ROI cropping (fraction of their size)")
+    motion_gating: bool = Field(False, description="Skip pose inference on frames without motion, reusing the last poses")
+    motion_threshold: float = Field(0.005, ge=0.0, le=1.0, description="Fraction of changed pixels below which a frame has no motion")
+    motion_max_skipped: int = Field(15, ge=1, description="Maximum number of consecutive frames without inference")
+
+    @validator("custom_angles")
+    def custom_angles_must_be_valid(cls, v):
+        if v:
+            physiotrack.validate_angle_definitions(v)
+        return v
+
+class ROMReanalysisParams(BaseModel):
+    """Parameters for re-analyzing an assessment from its stored keypoints"""
+    joint_angles: Optional[List[str]] = Field(None, description="List of joint angles to analyze")
+    segment_angles: Optional[List[str]] = Field(None, description="List of segment angles to analyze")
+    custom_angles: Optional[Dict[str, List[Any]]] = Field(None, description="Custom angle definitions {name: [keypoints, angle_type, offset, scale]}")
+    keypoint_threshold: float = Field(0.3, ge=0.0, le=1.0, description="Confidence threshold for keypoints")
+    person_id: Optional[int] = Field(None, ge=0, description="Track ID of the person to analyze (defaults to the primary track)")
+    test_name: str = Field("lb-flexion", description="Name of the ROM test")
+    time_window: float = Field(0.4, gt=0.0, description="Smoothing window for ROM data (seconds)")
+    include_rom_data: bool = Field(False, description="Also return the per-frame ROM data")
+    filter_type: str = Field("butterworth", description="Angle filter (none, butterworth, gaussian, median, loess)")
+    filter_cutoff: float = Field(6.0, gt=0.0, description="Butterworth cutoff frequency (Hz)")
+    max_points: Optional[int] = Field(None, ge=3, description="Downsample each time series to at most this many points")
+
+    @validator("custom_angles")
+    def custom_angles_must_be_valid(cls, v):
+        if v:
+            physiotrack.validate_angle_definitions(v)
+        return v
+
+    @validator("filter_type")
+    def filter_type_must_be_valid(cls, v):
+        return validate_filter_type(v)
 
 class ExerciseGuidanceParams(BaseModel):
     """Parameters for exercise guidance"""
@@ -33,6 +74,46 @@ class RealtimeParams(BaseModel):
     tracking_mode: str = Field("physiotrack", description="Tracking mode")
     device: str = Field("auto", description="Device for inference")
     backend: str = Field("auto", description="Backend for inference")
+    input_short_side: Optional[int] = Field(None, ge=32, description="Downscale frames to this short side (pixels) before inference")
+    roi_cropping: bool = Field(False, description="Run inference on the region around the persons of the previous frame")
+    roi_margin: float = Field(0.25, ge=0.0, description="Margin around the persons in ROI cropping (fraction of their size)")
+    motion_gating: bool = Field(False, description="Skip pose inference on frames without motion, reusing the last poses")
+    motion_threshold: float = Field(0.005, ge=0.0, le=1.0, description="Fraction of changed pixels below which a frame has no motion")
+    motion_max_skipped: int = Field(15, ge=1, description="Maximum number of consecutive frames without inference")
     joint_angles: Optional[List[str]] = Field(None, description="List of joint angles to analyze")
     segment_angles: Optional[List[str]] = Field(None, description="List of segment angles to analyze")
-    height: float = Field(1.7, description="Subject height in meters")
\ No newline at end of file
+    custom_angles: Optional[Dict[str, List[Any]]] = Field(None, description="Custom angle definitions {name: [keypoints, angle_type, offset, scale]}")
+    height: float = Field(1.7, description="Subject height in meters")
+    filter_type: str = Field("none", description="Causal angle filter (none, butterworth, gaussian, median, loess)")
+    filter_cutoff: float = Field(6.0, gt=0.0, description="Butterworth cutoff frequency (Hz)")
+    fps: float = Field(30.0, gt=0.0, description="Frame rate of the stream, for filtering")
+    protocol: str = Field("json", description="Message protocol (json: base64 frames and JSON results, binary: JPEG frames and binary result packets)")
+    keypoint_format: str = Field("float32", description="Keypoint encoding in binary result packets (float32, int16)")
+    render: bool = Field(True, description="Send the annotated frame with each result (disable when the client draws the overlay)")
+    keypoint_deltas: bool = Field(False, description="Only send the keypoints that changed since the last result (JSON protocol)")
+    delta_threshold: float = Field(1.0, ge=0.0, description="Movement in pixels from which a keypoint is resent in delta mode")
+    adaptive_quality: bool = Field(False, description="Adapt inference size, detection frequency and rendering to hold the target frame rate and latency")
+    target_fps: Optional[float] = Field(None, gt=0.0, description="Frame rate to sustain with adaptive quality (default: fps)")
+    latency_budget_ms: float = Field(200.0, gt=0.0, description="Latency to stay under with adaptive quality (ms)")
+
+    @validator("custom_angles")
+    def custom_angles_must_be_valid(cls, v):
+        if v:
+            physiotrack.validate_angle_definitions(v)
+        return v
+
+    @validator("filter_type")
+    def filter_type_must_be_valid(cls, v):
+        return validate_filter_type(v)
+
+    @validator("protocol")
+    def protocol_must_be_valid(cls, v):
+        if v not in ("json", "binary"):
+            raise ValueError(f"Unknown protocol '{v}', expected json or binary")
+        return v
+
+    @validator("keypoint_format")
+    def keypoint_format_must_be_valid(cls, v):
+        if v not in KEYPOINT_DTYPES:
+            raise ValueError(f"Unknown keypoint format '{v}', expected one of {', '.join(KEYPOINT_DTYPES)}")
+        return v
@@ -1 +1,350 @@
 # Data filtering (from physiotrack/filter.py)
+"""
+Gap filling and smoothing of angle and keypoint time series
+
+Batch filters are zero-phase and run along the time axis (axis 0) of every
+column at once; data may have any trailing shape, e.g. angles [T, A] or
+keypoints [T, K, 2]. CausalFilter applies matching filters one frame at a
+time, keeping its state between frames, for realtime sessions.
+"""
+from typing import Optional, Tuple
+import numpy as np
+from scipy import ndimage, signal
+
+FILTER_TYPES = ("none", "butterworth", "gaussian", "median", "loess")
+
+def validate_filter_type(filter_type: str) -> str:
+    """Check that a filter type is supported"""
+    if filter_type not in FILTER_TYPES:
+        raise ValueError(f"Unknown filter type '{filter_type}', expected one of {', '.join(FILTER_TYPES)}")
+    return filter_type
+
+def _fill(columns: np.ndarray, max_gap: Optional[int] = None) -> np.ndarray:
+    """
+    Linearly interpolate the missing values of time series laid out as [C, T]
+
+    Only missing values are visited: the neighbouring valid values of each are
+    found by binary search over the flattened valid positions.
+
+    Args:
+        columns: Time series, one per row (shape [C, T])
+        max_gap: Longest gap to fill; if None, every gap is filled and the
+            first and last values are held at the ends
+
+    Returns:
+        np.ndarray: Filled time series (shape [C, T])
+    """
+    n_rows = columns.shape[1]
+    flat = columns.reshape(-1)
+    missing = np.isnan(flat)
+    valid_positions = np.flatnonzero(~missing)
+    missing_positions = np.flatnonzero(missing)
+    filled = flat.copy()
+    if len(valid_positions) == 0 or len(missing_positions) == 0:
+        return filled.reshape(columns.shape)
+
+    # Previous and next valid value in the same series
+    series = missing_positions // n_rows
+    after = np.searchsorted(valid_positions, missing_positions)
+    following = valid_positions[np.minimum(after, len(valid_positions) - 1)]
+    previous = valid_positions[np.maximum(after - 1, 0)]
+    has_following = (after < len(valid_positions)) & (following // n_rows == series)
+    has_previous = (after > 0) & (previous // n_rows == series)
+
+    start = np.where(has_previous, flat[previous], flat[following])
+    end = np.where(has_following, flat[following], start)
+    fraction = np.where(has_previous & has_following,
+                        (missing_positions - previous) / np.maximum(following - previous, 1), 0.0)
+    values = start + (end - start) * fraction
+
+    fillable = has_previous | has_following
+    if max_gap is not None:
+        # Leave the ends and gaps longer than max_gap missing
+        fillable = has_previous & has_following & (following - previous - 1 <= max_gap)
+    filled[missing_positions] = np.where(fillable, values, np.nan)
+    return filled.reshape(columns.shape)
+
+def _to_columns(data: np.ndarray) -> np.ndarray:
+    """Lay out time series [T, ...] as contiguous rows [C, T]"""
+    return np.ascontiguousarray(data.reshape(len(data), -1).T)
+
+def _from_columns(columns: np.ndarray, shape: Tuple[int, ...]) -> np.ndarray:
+    """Inverse of _to_columns"""
+    return np.ascontiguousarray(columns.T).reshape(shape)
+
+def interpolate_gaps(data: np.ndarray, max_gap: int = 10) -> np.ndarray:
+    """
+    Fill gaps of missing values (NaN) by linear interpolation along the time axis
+
+    Args:
+        data: Time series (shape [T, ...])
+        max_gap: Longest gap to fill, in frames; longer gaps and the
+            missing values at both ends are kept
+
+    Returns:
+        np.ndarray: Data with the short gaps filled
+    """
+    data = np.asarray(data, dtype=float)
+    if len(data) == 0:
+        return data.copy()
+    return _from_columns(_fill(_to_columns(data), max_gap), data.shape)
+
+def butterworth_sos(order: int, cutoff: float, fps: float) -> Optional[np.ndarray]:
+    """
+    Design the low-pass Butterworth filter of the given total order
+
+    The filter is applied forward and backward by filtfilt, which doubles its
+    order, so it is designed with half the requested order.
+
+    Args:
+        order: Total filter order
+        cutoff: Cutoff frequency (Hz)
+        fps: Sampling rate (frames per second)
+
+    Returns:
+        Optional[np.ndarray]: Second-order sections, or None if the cutoff is
+            not below the Nyquist frequency
+    """
+    nyquist = fps / 2
+    if cutoff <= 0 or cutoff >= nyquist:
+        return None
+    return signal.butter(max(order // 2, 1), cutoff / nyquist, btype="low", output="sos")
+
+def butterworth_filter(data: np.ndarray, order: int = 4, cutoff: float = 6.0, fps: float = 30.0,
+                       axis: int = 0) -> np.ndarray:
+    """Zero-phase low-pass Butterworth filter of complete data (no NaN) along the time axis"""
+    sos = butterworth_sos(order, cutoff, fps)
+    if sos is None:
+        return data.copy()
+    padlen = min(3 * (2 * len(sos) + 1), data.shape[axis] - 1)
+    return signal.sosfiltfilt(sos, data, axis=axis, padlen=padlen)
+
+def gaussian_filter(data: np.ndarray, sigma: float = 1.0, axis: int = 0) -> np.ndarray:
+    """Gaussian filter of complete data (no NaN) along the time axis"""
+    return ndimage.gaussian_filter1d(data, sigma, axis=axis, mode="nearest")
+
+def median_filter(data: np.ndarray, kernel_size: int = 3, axis: int = 0) -> np.ndarray:
+    """Median filter of complete data (no NaN) along the time axis"""
+    size = [1] * data.ndim
+    size[axis] = max(int(kernel_size), 1)
+    return ndimage.median_filter(data, size=tuple(size), mode="nearest")
+
+def _local_linear_weights(x: np.ndarray, x0: float) -> np.ndarray:
+    """Weights of the tricube-weighted local linear fit at x0 over the points x (one frame apart)"""
+    distance = np.abs(x - x0)
+    tricube = (1 - (distance / (distance.max() + 1)) ** 3) ** 3
+    design = np.column_stack((np.ones_like(x), x - x0))
+    weighted = design * tricube[:, None]
+    return np.linalg.solve(design.T @ weighted, weighted.T)[0]
+
+def loess_weights(window: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Linear smoother weights of LOESS (local linear regression with tricube weights)
+
+    Args:
+        window: Number of frames in each local fit (made odd, at least 3)
+
+    Returns:
+        Tuple: (interior kernel [window], weights of the first window // 2 frames
+            over the first window frames [window // 2, window], weights of the last
+            window // 2 frames over the last window frames [window // 2, window])
+    """
+    window = max(int(window), 3) | 1
+    half = window // 2
+    x = np.arange(window, dtype=float)
+    kernel = _local_linear_weights(x, half)
+    head = np.array([_local_linear_weights(x, i) for i in range(half)])
+    tail = np.array([_local_linear_weights(x, i) for i in range(window - half, window)])
+    return kernel, head, tail
+
+def loess_filter(data: np.ndarray, window: int = 5, axis: int = 0) -> np.ndarray:
+    """LOESS filter of complete data (no NaN) along the time axis, fitting `window` frames around each frame"""
+    n_frames = data.shape[axis]
+    window = min(max(int(window), 3) | 1, n_frames if n_frames % 2 else n_frames - 1)
+    if window < 3:
+        return data.copy()
+    kernel, head, tail = loess_weights(window)
+    half = window // 2
+    smoothed = ndimage.correlate1d(data, kernel, axis=axis, mode="nearest")
+    
+    # Frames near the ends are fitted on the first and last window frames
+    series = np.moveaxis(data, axis, -1)
+    edges = np.moveaxis(smoothed, axis, -1)
+    edges[..., :half] = series[..., :window] @ head.T
+    edges[..., n_frames - half:] = series[..., -window:] @ tail.T
+    return smoothed
+
+def filter_data(data: np.ndarray,
+                filter_type: str = "butterworth",
+                fps: float = 30.0,
+                order: int = 4,
+                cutoff: float = 6.0,
+                sigma: float = 1.0,
+                kernel_size: int = 3,
+                loess_window: int = 5,
+                interpolate: bool = True,
+                max_gap: int = 10) -> np.ndarray:
+    """
+    Fill gaps and smooth time series along the time axis
+
+    Missing values are temporarily filled by linear interpolation so every
+    column can be filtered in one pass; afterwards they are missing again,
+    except in the gaps filled by interpolation.
+
+    Args:
+        data: Time series (shape [T, ...], NaN where missing)
+        filter_type: One of FILTER_TYPES
+        fps: Sampling rate (frames per second), for the Butterworth filter
+        order: Butterworth filter order
+        cutoff: Butterworth cutoff frequency (Hz)
+        sigma: Gaussian kernel standard deviation (frames)
+        kernel_size: Median filter kernel size (frames)
+        loess_window: Number of frames in each LOESS fit
+        interpolate: Whether to fill gaps of at most max_gap frames
+        max_gap: Longest gap to fill (frames)
+
+    Returns:
+        np.ndarray: Filtered data, with the same shape
+    """
+    validate_filter_type(filter_type)
+    data = np.asarray(data, dtype=float)
+    if len(data) < 2:
+        return data.copy()
+
+    # Filter every series at once, laid out as contiguous rows
+    columns = _to_columns(data)
+    kept = _fill(columns, max_gap) if interpolate else columns
+    if filter_type == "none":
+        return _from_columns(kept, data.shape)
+
+    # Missing values are filled for filtering, series without any value as zeros
+    filled = _fill(columns)
+    filled[np.isnan(filled)] = 0.0
+
+    if filter_type == "butterworth":
+        smoothed = butterworth_filter(filled, order, cutoff, fps, axis=-1)
+    elif filter_type == "gaussian":
+        smoothed = gaussian_filter(filled, sigma, axis=-1)
+    elif filter_type == "median":
+        smoothed = median_filter(filled, kernel_size, axis=-1)
+    else:
+        smoothed = loess_filter(filled, loess_window, axis=-1)
+    smoothed[np.isnan(kept)] = np.nan
+    return _from_columns(smoothed, data.shape)
+
+class CausalFilter:
+    """Filters time series one frame at a time, for realtime sessions
+
+    Applies the causal counterpart of a batch filter to every column:
+    a single forward pass of the Butterworth filter, or a Gaussian, median or
+    LOESS fit over the trailing frames, with the fit evaluated at the newest
+    frame. Missing values are output as missing while the last value is held
+    in the filter state; a column restarts from its next value after a gap
+    longer than max_gap.
+    """
+
+    def __init__(self,
+                 filter_type: str = "butterworth",
+                 fps: float = 30.0,
+                 order: int = 4,
+                 cutoff: float = 6.0,
+                 sigma: float = 1.0,
+                 kernel_size: int = 3,
+                 loess_window: int = 5,
+                 max_gap: int = 10):
+        """
+        Initialize the filter
+
+        Args:
+            filter_type: One of FILTER_TYPES
+            fps: Sampling rate (frames per second), for the Butterworth filter
+            order: Butterworth filter order
+            cutoff: Butterworth cutoff frequency (Hz)
+            sigma: Gaussian kernel standard deviation (frames)
+            kernel_size: Median filter kernel size (frames)
+            loess_window: Number of frames in each LOESS fit
+            max_gap: Longest gap (frames) the filter state is held over
+        """
+        self.filter_type = validate_filter_type(filter_type)
+        self.max_gap = max_gap
+        self._sos = None
+        self._weights = None
+        self._window = 1
+
+        if filter_type == "butterworth":
+            self._sos = butterworth_sos(order, cutoff, fps)
+            if self._sos is not None:
+                self._zi0 = signal.sosfilt_zi(self._sos)
+        elif filter_type == "gaussian":
+            self._window = int(4 * sigma + 0.5) + 1
+            weights = np.exp(-0.5 * (np.arange(self._window)[::-1] / sigma) ** 2)
+            self._weights = weights / weights.sum()
+        elif filter_type == "median":
+            self._window = max(int(kernel_size), 1)
+        elif filter_type == "loess":
+            self._window = max(int(loess_window), 3) | 1
+            x = np.arange(self._window, dtype=float)
+            self._weights = _local_linear_weights(x, self._window - 1)
+
+        self._zi = None
+        self._buffer = None
+        self._head = 0
+        self._last = None
+        self._gap = None
+
+    def reset(self):
+        """Forget the filter state"""
+        self._zi = None
+        self._buffer = None
+        self._last = None
+        self._gap = None
+
+    def update(self, values: np.ndarray) -> np.ndarray:
+        """
+        Filter the next frame
+
+        Args:
+            values: Values of the frame (shape [...], NaN where missing)
+
+        Returns:
+            np.ndarray: Filtered values, with the same shape
+        """
+        values = np.asarray(values, dtype=float)
+        if self.filter_type == "none":
+            return values.copy()
+
+        shape = values.shape
+        values = values.reshape(-1)
+        valid = ~np.isnan(values)
+        if self._last is None:
+            self._last = np.full(len(values), np.nan)
+            self._gap = np.full(len(values), self.max_gap + 1)
+            if self._sos is not None:
+                self._zi = np.zeros(self._zi0.shape[:2] + (len(values),))
+            self._buffer = np.full((self._window, len(values)), np.nan)
+
+        # Columns seen for the first time, or after a long gap, restart from their value
+        restart = valid & (self._gap > self.max_gap)
+        if restart.any():
+            if self._zi is not None:
+                self._zi[:, :, restart] = self._zi0[:, :, None] * values[restart]
+            self._buffer[:, restart] = values[restart]
+        self._gap = np.where(valid, 0, self._gap + 1)
+        self._last = np.where(valid, values, self._last)
+
+        # Filter the last known values
+        if self._sos is not None:
+            filtered, self._zi = signal.sosfilt(self._sos, self._last[None], axis=0, zi=self._zi)
+            filtered = filtered[0]
+        elif self.filter_type == "butterworth":
+            filtered = self._last.copy()
+        else:
+            self._buffer[self._head] = self._last
+            self._head = (self._head + 1) % self._window
+            window = self._buffer[(self._head + np.arange(self._window)) % self._window]
+            if self.filter_type == "median":
+                filtered = np.median(window, axis=0)
+            else:
+                filtered = self._weights @ window
+
+        return np.where(valid, filtered, np.nan).reshape(shape)
@@ -0,0 +1,140 @@
+"""
+Motion gating of pose inference
+
+Patients often hold still for seconds during ROM tests and held-pose
+exercises. MotionGate compares each frame with the last frame pose inference
+ran on, on a small grayscale copy, and lets the caller reuse that frame's
+poses while the scene has not changed.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+import physiotrack
+
+class MotionGate:
+    """Decides which frames of a stream need pose inference
+
+    A frame is static when less than `threshold` of the pixels of its
+    downscaled grayscale copy differ by more than `pixel_threshold` gray
+    levels from the last inferred frame. Comparing with the last inferred
+    frame rather than the previous one means slow drifts still add up to a
+    new inference, and at most `max_skipped` frames in a row are skipped.
+    """
+
+    def __init__(self, threshold: float = 0.005, pixel_threshold: int = 8,
+                 size: int = 64, max_skipped: int = 15):
+        """
+        Initialize the gate
+
+        Args:
+            threshold: Fraction of changed pixels below which a frame is static
+            pixel_threshold: Gray level difference from which a pixel has changed
+            size: Short side of the grayscale copy the frames are compared on
+            max_skipped: Maximum number of consecutive frames skipped
+        """
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.size = size
+        self.max_skipped = max_skipped
+        self.keypoints: np.ndarray = np.zeros((0, 0, 2))
+        self.scores: np.ndarray = np.zeros((0, 0))
+        self._reference: Optional[np.ndarray] = None
+        self._thumbnail: Optional[np.ndarray] = None
+        self._skipped = 0
+        self.frames = 0
+        self.inferred = 0
+
+    def _make_thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        """Downscaled grayscale copy of a frame (area averaging also evens out sensor noise)"""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        height, width = gray.shape[:2]
+        factor = min(self.size / min(height, width), 1.0)
+        size = (max(round(width * factor), 1), max(round(height * factor), 1))
+        return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+    def is_static(self, frame: np.ndarray) -> bool:
+        """
+        Check whether a frame can reuse the poses of the last inferred frame
+
+        Must be followed by update() with the frame's poses when it returns False.
+
+        Args:
+            frame: Video frame
+
+        Returns:
+            bool: True if inference can be skipped
+        """
+        self.frames += 1
+        self._thumbnail = self._make_thumbnail(frame)
+        if (self._reference is not None and self._skipped < self.max_skipped
+                and self._reference.shape == self._thumbnail.shape):
+            changed = np.count_nonzero(cv2.absdiff(self._thumbnail, self._reference) > self.pixel_threshold)
+            if changed < self.threshold * self._thumbnail.size:
+                self._skipped += 1
+                return True
+        return False
+
+    def update(self, keypoints: np.ndarray, scores: np.ndarray):
+        """
+        Record the poses inferred on the last frame passed to is_static()
+
+        Args:
+            keypoints: Detected keypoints [P, K, 2]
+            scores: Keypoint confidence scores [P, K]
+        """
+        self.inferred += 1
+        self._reference = self._thumbnail
+        self._skipped = 0
+        self.keypoints = np.asarray(keypoints, dtype=float)
+        self.scores = np.asarray(scores, dtype=float)
+
+    @property
+    def detections(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Poses of the last inferred frame, to carry forward"""
+        return self.keypoints, self.scores
+
+    def interpolate(self, keypoints: np.ndarray, scores: np.ndarray,
+                    n_frames: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Poses of the frames skipped between the last inferred frame and the next one
+
+        Persons are matched between the two inferred frames by minimum total
+        mean keypoint distance, as the track manager does, and interpolated
+        linearly. Persons of the last inferred frame without a match are
+        carried forward; new persons only appear from the next inferred frame on.
+
+        Args:
+            keypoints: Keypoints detected on the next inferred frame [P, K, 2]
+            scores: Keypoint confidence scores of the next inferred frame [P, K]
+            n_frames: Number of skipped frames in between
+
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray]]: (keypoints, scores) of each skipped frame
+        """
+        previous_keypoints, previous_scores = self.detections
+        keypoints = np.asarray(keypoints, dtype=float)
+        scores = np.asarray(scores, dtype=float)
+        if not len(previous_keypoints) or not len(keypoints) or keypoints.shape[1:] != previous_keypoints.shape[1:]:
+            return [(previous_keypoints, previous_scores)] * n_frames
+
+        # Optimal assignment (see physiotrack.associate_people)
+        rows, cols, _ = physiotrack.associate_people(previous_keypoints[..., :2], keypoints[..., :2])
+
+        frames = []
+        for i in range(1, n_frames + 1):
+            weight = i / (n_frames + 1)
+            frame_keypoints = previous_keypoints.copy()
+            frame_scores = previous_scores.copy()
+            frame_keypoints[rows] += weight * (keypoints[cols] - previous_keypoints[rows])
+            frame_scores[rows] += weight * (scores[cols] - previous_scores[rows])
+            frames.append((frame_keypoints, frame_scores))
+        return frames
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the number of frames seen and inferred"""
+        return {
+            "frames": self.frames,
+            "inferred": self.inferred,
+            "skipped": self.frames - self.inferred,
+            "saved": (self.frames - self.inferred) / self.frames if self.frames else 0.0
+        }
@@ -49,8 +49,8 @@ class FrameProcessor:
         # Update context
         updated_context = context or FrameContext()
         updated_context.frame_count += 1
-        updated_context.keypoints_history.append(keypoints)
-        updated_context.angles_history.append(angles)
+        if len(keypoints) > 0:
+            updated_context.push(keypoints[0], scores[0], angles)
         
         return processed_frame, {
             'keypoints': keypoints,
@@ -1,19 +1,25 @@
 """
 Assessment API endpoints
 """
-from fastapi import APIRouter, File, UploadFile, BackgroundTasks, Form, Depends, HTTPException
-from fastapi.responses import JSONResponse
-from typing import List, Optional
+from fastapi import APIRouter, File, UploadFile, Form, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, Response
+from typing import Any, Dict, List, Optional
 import uuid
 import os
 import json
-import pandas as pd
+import asyncio
+import hashlib
 import tempfile
 from pathlib import Path
 
-from ..services.video_service import VideoProcessor
-from ..services.analysis_service import ROMAnalyzer
-from ..models.request import ROMAssessmentParams
+import physiotrack
+
+from ..services.analysis_service import ROMAnalyzer, compute_angles_from_store
+from ..services.job_service import job_executor, JobQueueFull
+from ..services.storage_service import (downsampling_level, results_cache, results_file, save_results,
+                                        load_analysis_options, write_json)
+from ..io.keypoint_store import KeypointStore
+from ..models.request import ROMAssessmentParams, ROMReanalysisParams
 from ..models.response import AssessmentResponse
 from ..models.data import ProcessingOptions, ROMAnalysisOptions
 from ..config import settings
@@ -22,7 +28,6 @@ router = APIRouter()
 
 @router.post("/rom", response_model=AssessmentResponse)
 async def assess_rom(
-    background_tasks: BackgroundTasks,
     video: UploadFile = File(...),
     params: Optional[str] = Form("{}")
 ):
@@ -63,6 +68,12 @@ async def assess_rom(
         tracking_mode=assessment_params.tracking_mode,
         device=assessment_params.device,
         backend=assessment_params.backend,
+        input_short_side=assessment_params.input_short_side,
+        roi_cropping=assessment_params.roi_cropping,
+        roi_margin=assessment_params.roi_margin,
+        motion_gating=assessment_params.motion_gating,
+        motion_threshold=assessment_params.motion_threshold,
+        motion_max_skipped=assessment_params.motion_max_skipped,
         joint_angles=assessment_params.joint_angles or [
             'right knee', 'left knee', 'right hip', 'left hip', 
             'right shoulder', 'left shoulder', 'right elbow', 'left elbow'
@@ -70,8 +81,10 @@ async def assess_rom(
         segment_angles=assessment_params.segment_angles or [
             'right thigh', 'left thigh', 'trunk'
         ],
+        custom_angles=assessment_params.custom_angles or {},
         height=assessment_params.height,
-        visible_side=assessment_params.visible_side
+        visible_side=assessment_params.visible_side,
+        segment_workers=settings.job_segment_workers
     )
     
     # Set up analysis options
@@ -80,33 +93,33 @@ async def assess_rom(
         height=assessment_params.height
     )
     
-    # Initialize processors
-    video_processor = VideoProcessor(options)
-    rom_analyzer = ROMAnalyzer(analysis_options)
-    
-    # Process the video using PhysioTrack (in background)
-    background_tasks.add_task(
-        process_assessment,
-        video_processor,
-        rom_analyzer,
-        str(video_path),
-        str(assessment_dir),
-        assessment_id
-    )
+    # Queue the video for processing by the job workers
+    try:
+        job_executor.submit(
+            options,
+            analysis_options,
+            str(video_path),
+            str(assessment_dir),
+            assessment_id
+        )
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     
     # Return response with assessment ID
     return {
         "assessment_id": assessment_id,
-        "status": "processing",
-        "message": "Video uploaded and being processed. Check status endpoint for results."
+        "status": "queued",
+        "message": "Video uploaded and queued for processing. Check status endpoint for results."
     }
 
 @router.get("/rom/{assessment_id}", response_model=AssessmentResponse)
-async def get_rom_assessment(assessment_id: str):
+async def get_rom_assessment(assessment_id: str, max_points: Optional[int] = Query(None, ge=3)):
     """
     Get the results of a range of motion assessment
     
     - **assessment_id**: ID of the assessment to retrieve
+    - **max_points**: Downsample each angle time series to at most this many points,
+      rounded down to a fixed downsampling level
     """
     assessment_dir = Path(settings.get_temp_path()) / assessment_id
     if not assessment_dir.exists():
@@ -125,23 +138,23 @@ async def get_rom_assessment(assessment_id: str):
     with open(status_file, "r") as f:
         status = json.load(f)
     
-    # If processing complete, analyze ROM from angles file
+    # If processing complete, serve the ROM analysis stored by the job
     if status["status"] == "complete":
-        angles_file = assessment_dir / f"{assessment_id}_angles_person00.mot"
+        primary = status.get("primary_track", 0)
+        angles_file = assessment_dir / f"{assessment_id}_angles_person{primary:02d}.mot"
         if angles_file.exists():
-            # Initialize ROM analyzer
-            rom_analyzer = ROMAnalyzer()
-            rom_analysis = rom_analyzer.analyze_rom(str(angles_file))
+            max_points = downsampling_level(max_points)
+            rom_file = results_file(str(assessment_dir), assessment_id, max_points)
+            rom_analysis = await asyncio.to_thread(results_cache.get, str(rom_file))
+            if rom_analysis is None:
+                # Not stored yet (or stored before results were precomputed)
+                rom_analysis = await asyncio.to_thread(analyze_stored_angles, str(assessment_dir),
+                                                       assessment_id, str(angles_file), max_points)
             
             # Get the video URL
             video_url = f"/static/temp/{assessment_id}/{assessment_id}.mp4"
             
-            return {
-                "assessment_id": assessment_id,
-                "status": "complete",
-                "results": rom_analysis,
-                "video_url": video_url
-            }
+            return _complete_response(assessment_id, rom_analysis, video_url)
     
     # Return current status
     return {
@@ -150,47 +163,129 @@ async def get_rom_assessment(assessment_id: str):
         "message": status.get("message", "")
     }
 
-async def process_assessment(
-    video_processor: VideoProcessor,
-    rom_analyzer: ROMAnalyzer,
-    video_path: str,
-    output_dir: str,
-    assessment_id: str
-):
+def analyze_stored_angles(assessment_dir: str, assessment_id: str, angles_file: str,
+                          max_points: Optional[int] = None) -> bytes:
     """
-    Process a video for ROM assessment
+    Analyze an assessment's angles with the options its job was submitted with
     
     Args:
-        video_processor: VideoProcessor instance
-        rom_analyzer: ROMAnalyzer instance
-        video_path: Path to video file
-        output_dir: Directory to save results
+        assessment_dir: Assessment directory
         assessment_id: Unique assessment ID
+        angles_file: MOT file of the analyzed person
+        max_points: Number of time series points to downsample the results to
+        
+    Returns:
+        bytes: Serialized ROM analysis results, as stored
     """
-    # Process the video
-    result = await video_processor.process_video(video_path, output_dir)
+    options = load_analysis_options(assessment_dir, assessment_id)
+    rom_analyzer = ROMAnalyzer(ROMAnalysisOptions(**{**options, "max_points": max_points}))
+    rom_file = save_results(assessment_dir, assessment_id, rom_analyzer.analyze_rom(angles_file), max_points)
+    return results_cache.get(str(rom_file))
+
+def _complete_response(assessment_id: str, results: bytes, video_url: str) -> Response:
+    """
+    Build a complete assessment response around serialized results
     
-    # If successful, analyze ROM and generate ROM data
-    if result["status"] == "complete" and "angles_file" in result:
-        # Load angle data
-        angles_file = result["angles_file"]
-        
-        # Analyze ROM
-        rom_analysis = rom_analyzer.analyze_rom(angles_file)
-        
-        # Read the angle data for ROM data generation
-        with open(angles_file, 'r') as f:
-            for i, line in enumerate(f):
-                if line.startswith('time'):
-                    header_rows = i
-                    break
+    The stored JSON is embedded as is, so cached results are not decoded and
+    re-encoded on every request.
+    
+    Args:
+        assessment_id: Unique assessment ID
+        results: Serialized ROM analysis results
+        video_url: URL of the processed video
         
-        angle_data = pd.read_csv(angles_file, sep='\t', skiprows=header_rows)
+    Returns:
+        Response: AssessmentResponse as JSON
+    """
+    fields = json.dumps({"assessment_id": assessment_id, "status": "complete", "video_url": video_url})
+    content = fields[:-1].encode("utf-8") + b', "results": ' + results + b"}"
+    return Response(content=content, media_type="application/json")
+
+@router.post("/rom/{assessment_id}", response_model=AssessmentResponse)
+async def reanalyze_rom_assessment(assessment_id: str, params: ROMReanalysisParams):
+    """
+    Re-analyze a processed assessment with new angle and analysis parameters
+    
+    Angles and ROM are recomputed from the keypoints stored during processing,
+    without running pose estimation again. Results are cached per parameter set.
+    
+    - **assessment_id**: ID of the assessment to re-analyze
+    - **params**: Angle and analysis parameters
+    """
+    assessment_dir = Path(settings.get_temp_path()) / assessment_id
+    if not assessment_dir.exists():
+        raise HTTPException(status_code=404, detail="Assessment not found")
+    
+    store_path = assessment_dir / f"{assessment_id}_keypoints"
+    if not (store_path / "manifest.json").exists():
+        raise HTTPException(status_code=404, detail="No stored keypoints for this assessment")
+    
+    # Return cached results for this parameter set
+    cache_key = hashlib.sha256(params.json(sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    cache_file = assessment_dir / "reanalysis" / f"{cache_key}.json"
+    if cache_file.exists():
+        with open(cache_file, "r") as f:
+            results = json.load(f)
+    else:
+        try:
+            results = await asyncio.to_thread(reanalyze_assessment, str(store_path), params)
+        except ValueError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e))
         
-        # Generate ROM data
-        rom_data = rom_analyzer.generate_rom_data(angle_data, "lb-flexion")
+        # Save results
+        cache_file.parent.mkdir(exist_ok=True)
+        write_json(str(cache_file), results, compact=True)
+    
+    return {
+        "assessment_id": assessment_id,
+        "status": "complete",
+        "results": results,
+        "video_url": f"/static/temp/{assessment_id}/{assessment_id}.mp4"
+    }
+
+def reanalyze_assessment(store_path: str, params: ROMReanalysisParams) -> Dict[str, Any]:
+    """
+    Recompute angles and ROM from a keypoint store
+    
+    Args:
+        store_path: Keypoint store of the assessment
+        params: Angle and analysis parameters
         
-        # Save ROM data
-        rom_data_file = Path(output_dir) / f"{assessment_id}_rom_data.json"
-        with open(rom_data_file, "w") as f:
-            json.dump(rom_data, f, indent=4)
\ No newline at end of file
+    Returns:
+        Dict: ROM analysis results, with the per-frame ROM data if requested
+    """
+    store = KeypointStore(store_path)
+    person_id = params.person_id
+    if person_id is None:
+        person_id = physiotrack.primary_track(store.get_frame_counts()) or 0
+    elif person_id != 0 and person_id not in store.get_track_ids():
+        raise KeyError(f"Person {person_id} not found in assessment")
+    
+    angle_names = (params.joint_angles or [
+        'right knee', 'left knee', 'right hip', 'left hip', 
+        'right shoulder', 'left shoulder', 'right elbow', 'left elbow'
+    ]) + (params.segment_angles or [
+        'right thigh', 'left thigh', 'trunk'
+    ])
+    custom_angles = params.custom_angles or {}
+    angle_names += [name for name in custom_angles if name not in angle_names]
+    
+    angles, angle_names, times = compute_angles_from_store(
+        store, person_id, angle_names, custom_angles, params.keypoint_threshold
+    )
+    
+    rom_analyzer = ROMAnalyzer(ROMAnalysisOptions(
+        test_name=params.test_name,
+        time_window=params.time_window,
+        filter_type=params.filter_type,
+        filter_cutoff=params.filter_cutoff,
+        max_points=params.max_points
+    ))
+    results = rom_analyzer.analyze_angles(angles, angle_names, times)
+    if params.include_rom_data:
+        results["rom_data"] = rom_analyzer.generate_rom_data(
+            rom_analyzer.angles_to_frame(angles, angle_names, times), params.test_name
+        )
+    return results
@@ -1,19 +1,52 @@
 """
 Real-time assessment API endpoints
 """
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends, Request
+import hmac
 import json
 from typing import Dict, Any
 
 from ..services.streaming_service import StreamingService
+from ..services.frame_executor import frame_executor
+from ..services.session_manager import session_manager
 from ..models.data import ProcessingOptions
 from ..models.request import RealtimeParams
+from ..config import settings
 
 router = APIRouter()
 
 # Create a global streaming service
 streaming_service = StreamingService()
 
+# Hosts allowed to read the internal metrics without an API key
+INTERNAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+async def require_internal(request: Request):
+    """
+    Restrict an endpoint to local callers or callers presenting the API key
+    
+    Raises:
+        HTTPException: 403 if the caller is neither local nor authenticated
+    """
+    api_key = request.headers.get("X-API-Key", "")
+    if settings.api_key and hmac.compare_digest(api_key.encode(), settings.api_key.encode()):
+        return
+    if request.client is not None and request.client.host in INTERNAL_HOSTS:
+        return
+    raise HTTPException(status_code=403, detail="Internal endpoint")
+
+@router.get("/stats", dependencies=[Depends(require_internal)])
+async def get_realtime_stats():
+    """Get realtime frame processing metrics"""
+    return {
+        "executor": frame_executor.stats()
+    }
+
+@router.get("/sessions", dependencies=[Depends(require_internal)])
+async def get_realtime_sessions():
+    """Get realtime session capacity and live per-session statistics"""
+    return session_manager.stats()
+
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time processing"""
@@ -39,6 +72,12 @@ async def websocket_endpoint(websocket: WebSocket):
             tracking_mode=params.tracking_mode,
             device=params.device,
             backend=params.backend,
+            input_short_side=params.input_short_side,
+            roi_cropping=params.roi_cropping,
+            roi_margin=params.roi_margin,
+            motion_gating=params.motion_gating,
+            motion_threshold=params.motion_threshold,
+            motion_max_skipped=params.motion_max_skipped,
             joint_angles=params.joint_angles or [
                 'right knee', 'left knee', 'right hip', 'left hip', 
                 'right shoulder', 'left shoulder', 'right elbow', 'left elbow'
@@ -46,11 +85,24 @@ async def websocket_endpoint(websocket: WebSocket):
             segment_angles=params.segment_angles or [
                 'right thigh', 'left thigh', 'trunk'
             ],
-            height=params.height
+            custom_angles=params.custom_angles or {},
+            height=params.height,
+            history_length=settings.realtime_history_length,
+            filter_type=params.filter_type,
+            filter_cutoff=params.filter_cutoff,
+            filter_fps=params.fps
         )
         
         # Process the stream
-        await streaming_service.process_stream(websocket, options)
+        await streaming_service.process_stream(
+            websocket, options, params.protocol, params.keypoint_format,
+            render=params.render,
+            keypoint_deltas=params.keypoint_deltas,
+            delta_threshold=params.delta_threshold,
+            adaptive_quality=params.adaptive_quality,
+            target_fps=params.target_fps or params.fps,
+            latency_budget_ms=params.latency_budget_ms
+        )
         
     except WebSocketDisconnect:
         print("Client disconnected")
@@ -4,10 +4,140 @@ ROM analysis service
 import pandas as pd
 import numpy as np
 import json
+import warnings
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
+import physiotrack
 
 from ..models.data import ROMAnalysisOptions
+from ..io.keypoint_store import KeypointStore
+from ..io.mot import read_mot
+from ..processors.filtering import filter_data
+
+def json_float(value: float) -> Optional[float]:
+    """Convert a statistic to a JSON-safe float (None when undefined)"""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+# Angles whose ROM is measured on a transformed value, as (offset, scale)
+ROM_TRANSFORMS = {
+    'trunk': (180.0, -1.0)
+}
+
+class IncrementalROM:
+    """Running ROM statistics of a set of angles, updated one frame at a time
+    
+    Every update costs O(A) for A angles. Tracks the extrema of the raw values,
+    the rolling mean (the smoothed value) and standard deviation over the last
+    `window_size` frames, and the extrema of the smoothed values. Missing
+    values (NaN) are skipped, like pandas' rolling(min_periods=1).
+    
+    The smoothed extrema, and so the ROM, are measured on the angles mapped
+    by `transforms` (e.g. 180 - angle for the trunk, see ROM_TRANSFORMS);
+    the other statistics are in angle units.
+    """
+    
+    def __init__(self, angle_names: List[str], window_size: int = 1,
+                 transforms: Optional[Dict[str, Tuple[float, float]]] = None):
+        """
+        Initialize empty statistics
+        
+        Args:
+            angle_names: Angle columns
+            window_size: Number of frames in the rolling window
+            transforms: (offset, scale) of the ROM value of some angles, by name
+        """
+        self.angle_names = list(angle_names)
+        self.window_size = max(int(window_size), 1)
+        self.count = 0
+        
+        n_angles = len(self.angle_names)
+        self._rom_offset = np.zeros(n_angles)
+        self._rom_scale = np.ones(n_angles)
+        for i, name in enumerate(self.angle_names):
+            if transforms and name in transforms:
+                self._rom_offset[i], self._rom_scale[i] = transforms[name]
+        self._window = np.full((self.window_size, n_angles), np.nan)
+        self._head = 0
+        self._sum = np.zeros(n_angles)
+        self._sum_sq = np.zeros(n_angles)
+        self._n = np.zeros(n_angles, dtype=np.int64)
+        
+        # 1/n and 1/(n-1) by count, NaN where the statistic is undefined
+        counts = np.arange(self.window_size + 1, dtype=float)
+        with np.errstate(divide="ignore"):
+            self._inv_n = np.where(counts > 0, 1.0 / counts, np.nan)
+            self._inv_n1 = np.where(counts > 1, 1.0 / (counts - 1), np.nan)
+        
+        self.min = np.full(n_angles, np.nan)
+        self.max = np.full(n_angles, np.nan)
+        self.mean = np.full(n_angles, np.nan)
+        self.std = np.full(n_angles, np.nan)
+        self.smoothed_min = np.full(n_angles, np.nan)
+        self.smoothed_max = np.full(n_angles, np.nan)
+    
+    @classmethod
+    def for_time_window(cls, angle_names: List[str], time_window: float, frame_interval: float) -> "IncrementalROM":
+        """
+        Create the statistics ROM reports are built from, offline and in realtime
+        
+        Args:
+            angle_names: Angle columns
+            time_window: Duration of the rolling window in seconds
+            frame_interval: Time between frames in seconds
+            
+        Returns:
+            IncrementalROM: Statistics smoothed over `time_window`, with ROM_TRANSFORMS
+        """
+        window_size = int(time_window / frame_interval) if frame_interval > 0 else 1
+        return cls(angle_names, window_size, ROM_TRANSFORMS)
+    
+    def update(self, angles: np.ndarray):
+        """
+        Add the angles of the next frame
+        
+        Args:
+            angles: Angle values (shape [A], ordered as angle_names, NaN where missing)
+        """
+        angles = np.asarray(angles, dtype=float)
+        new_valid = angles == angles
+        old = self._window[self._head]
+        old_valid = old == old
+        
+        # Slide the window, adding the new values and removing the oldest ones
+        new = np.where(new_valid, angles, 0.0)
+        old = np.where(old_valid, old, 0.0)
+        self._sum += new - old
+        self._sum_sq += new * new - old * old
+        self._n += new_valid.astype(np.int64) - old_valid
+        self._window[self._head] = angles
+        self._head = (self._head + 1) % self.window_size
+        if self._head == 0:
+            # Resynchronize the sums once per window so rounding errors do not accumulate
+            self._sum = np.nansum(self._window, axis=0)
+            self._sum_sq = np.nansum(self._window * self._window, axis=0)
+        self.count += 1
+        
+        # Rolling mean and sample standard deviation
+        self.mean = self._sum * self._inv_n[self._n]
+        variance = (self._sum_sq - self._sum * self.mean) * self._inv_n1[self._n]
+        self.std = np.sqrt(np.maximum(variance, 0.0))
+        
+        # Running extrema of the raw and smoothed values
+        self.min = np.fmin(self.min, angles)
+        self.max = np.fmax(self.max, angles)
+        rom_mean = self._rom_offset + self._rom_scale * self.mean
+        self.smoothed_min = np.fmin(self.smoothed_min, rom_mean)
+        self.smoothed_max = np.fmax(self.smoothed_max, rom_mean)
+    
+    @property
+    def rom(self) -> np.ndarray:
+        """Range of the smoothed (transformed) values of each angle"""
+        return self.smoothed_max - self.smoothed_min
+    
+    def to_dict(self, values: np.ndarray) -> Dict[str, float]:
+        """Map values to angle names, skipping undefined ones"""
+        return {name: float(value) for name, value in zip(self.angle_names, values) if value == value}
 
 class ROMAnalyzer:
     """Analyzes Range of Motion from angle data"""
@@ -26,53 +156,99 @@ class ROMAnalyzer:
         Returns:
             Dict: ROM analysis results
         """
-        # Skip the header lines
-        with open(angles_file, 'r') as f:
-            for i, line in enumerate(f):
-                if line.startswith('time'):
-                    header_rows = i
-                    break
+        mot = read_mot(angles_file)
+        return self.analyze_angles(mot.angles, mot.angle_names, mot.times)
+    
+    def analyze_angles(self, angles: np.ndarray, angle_names: List[str], times: np.ndarray) -> Dict[str, Any]:
+        """
+        Analyze ROM from an array of angles
         
-        # Read the data
-        angles_data = pd.read_csv(angles_file, sep='\t', skiprows=header_rows)
+        Args:
+            angles: Angles in degrees (shape [T, A], NaN where missing)
+            angle_names: Names of the angle columns
+            times: Timestamp of each row (shape [T])
+            
+        Returns:
+            Dict: ROM analysis results
+        """
+        times = np.asarray(times, dtype=float)
+        angles = self.filter_angles(np.asarray(angles, dtype=float).reshape(len(times), len(angle_names)), times)
+        
+        # Calculate min, max, mean and std of each angle, ignoring missing values
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            min_vals = np.nanmin(angles, axis=0) if len(times) else np.full(len(angle_names), np.nan)
+            max_vals = np.nanmax(angles, axis=0) if len(times) else np.full(len(angle_names), np.nan)
+            means = np.nanmean(angles, axis=0)
+            stds = np.nanstd(angles, axis=0, ddof=1)
+        
+        # Downsample the time series for charts, keeping their shape
+        max_points = self.options.max_points
+        if max_points and len(times) > max_points:
+            indices = lttb_indices(times, angles, max_points)
+        else:
+            indices = np.broadcast_to(np.arange(len(times))[:, None], angles.shape)
+        series_times = times[indices]
+        series_values = np.take_along_axis(angles, indices, axis=0)
         
-        # Calculate ROM for each joint
         rom_results = {}
-        for col in angles_data.columns:
-            if col == 'time':
-                continue
-            
-            # Calculate min, max, and ROM
-            min_val = float(angles_data[col].min())
-            max_val = float(angles_data[col].max())
-            rom = float(max_val - min_val)
-            mean = float(angles_data[col].mean())
-            std = float(angles_data[col].std())
-            
-            # Extract time series data for this angle
+        for i, col in enumerate(angle_names):
+            # Missing values are reported as null, since NaN is not valid JSON
+            values = series_values[:, i]
             time_series = [{
-                "time": float(row["time"]),
-                "value": float(row[col])
-            } for _, row in angles_data.iterrows()]
+                "time": t,
+                "value": v
+            } for t, v in zip(series_times[:, i].tolist(), np.where(np.isnan(values), None, values).tolist())]
             
             rom_results[col] = {
-                "min": min_val,
-                "max": max_val,
-                "rom": rom,
-                "mean": mean,
-                "std": std,
+                "min": json_float(min_vals[i]),
+                "max": json_float(max_vals[i]),
+                "rom": json_float(max_vals[i] - min_vals[i]),
+                "mean": json_float(means[i]),
+                "std": json_float(stds[i]),
                 "time_series": time_series
             }
         
         return {
             "rom_analysis": rom_results,
             "summary": {
-                "total_frames": len(angles_data),
-                "duration": float(angles_data["time"].max()),
+                "total_frames": len(times),
+                "duration": float(times.max()) if len(times) else 0.0,
                 "angles_measured": list(rom_results.keys())
             }
         }
     
+    def filter_angles(self, angles: np.ndarray, times: np.ndarray) -> np.ndarray:
+        """
+        Fill gaps and smooth angles as set in the analysis options
+        
+        Args:
+            angles: Angles in degrees (shape [T, A], NaN where missing)
+            times: Timestamp of each row (shape [T])
+            
+        Returns:
+            np.ndarray: Filtered angles (shape [T, A])
+        """
+        fps = 1 / (times[1] - times[0]) if len(times) > 1 and times[1] > times[0] else 30.0
+        return filter_data(
+            angles,
+            self.options.filter_type,
+            fps=fps,
+            order=self.options.filter_order,
+            cutoff=self.options.filter_cutoff,
+            sigma=self.options.filter_sigma,
+            kernel_size=self.options.filter_kernel_size,
+            loess_window=self.options.filter_loess_window,
+            interpolate=self.options.interpolate,
+            max_gap=self.options.interpolate_max_gap
+        )
+    
+    def angles_to_frame(self, angles: np.ndarray, angle_names: List[str], times: np.ndarray) -> pd.DataFrame:
+        """Build the angle table used by generate_rom_data from arrays"""
+        angle_data = pd.DataFrame(angles, columns=angle_names)
+        angle_data.insert(0, "time", times)
+        return angle_data
+    
     def generate_rom_data(self, angle_data: pd.DataFrame, test_name: str) -> Dict[str, Any]:
         """
         Generate ROM data in the standardized format
@@ -87,70 +263,52 @@ class ROMAnalyzer:
         # Initialize the ROM data structure
         rom_data = {}
         
-        # Calculate window size in seconds and convert to indices
-        window_size = self.options.time_window
-        if 'trunk' in angle_data.columns:
-            time_step = angle_data['time'].iloc[1] - angle_data['time'].iloc[0]
-            window_size_idx = int(window_size / time_step)
-            
-            # Apply transformation (180 - angle) as in test_rom_analysis.py
-            transformed_angles = 180 - angle_data['trunk']
-            
-            # Compute rolling mean over the window
-            smoothed_angles = transformed_angles.rolling(window=window_size_idx, min_periods=1).mean()
-            
-            # Calculate the running min/max values and ROM at each time point
-            running_min = np.zeros(len(smoothed_angles))
-            running_max = np.zeros(len(smoothed_angles))
-            running_rom = np.zeros(len(smoothed_angles))
-            
-            for i in range(len(smoothed_angles)):
-                # Consider all angles from start up to current point
-                current_segment = smoothed_angles.iloc[0:i+1]
-                
-                if not current_segment.empty:
-                    # Calculate min, max and rom from start to current point
-                    current_min = current_segment.min()
-                    current_max = current_segment.max()
-                    current_rom = current_max - current_min
-                    
-                    running_min[i] = current_min
-                    running_max[i] = current_max
-                    running_rom[i] = current_rom
+        times = angle_data['time'].to_numpy(dtype=float)
+        angle_names = [col for col in angle_data.columns if col != 'time']
+        angles = self.filter_angles(angle_data[angle_names].to_numpy(dtype=float), times)
+        
+        # Running min/max of the smoothed angles at each time point, updated frame by
+        # frame, with transformations (e.g. 180 - angle for trunk) as in test_rom_analysis.py
+        frame_interval = times[1] - times[0] if len(times) > 1 else 0.0
+        rom = IncrementalROM.for_time_window(angle_names, self.options.time_window, frame_interval)
+        running_min = np.empty_like(angles)
+        running_max = np.empty_like(angles)
+        for i, frame_angles in enumerate(angles):
+            rom.update(frame_angles)
+            running_min[i] = rom.smoothed_min
+            running_max[i] = rom.smoothed_max
+        
+        # Missing values are reported as null
+        time_keys = [str(t) for t in np.round(times, 3).tolist()]
+        rounded = np.round(angles, 1)
+        angle_values = np.where(np.isnan(rounded), None, rounded).tolist()
+        min_values = np.where(np.isnan(running_min), None, running_min).tolist()
+        max_values = np.where(np.isnan(running_max), None, running_max).tolist()
+        trunk = angle_names.index('trunk') if 'trunk' in angle_names else None
         
         # Process each time point/frame
-        for idx, row in angle_data.iterrows():
-            time_val = str(round(row['time'], 3))  # Use time as key, rounded to 3 decimal places
-            
-            # Initialize angles dict for this time point
-            angles_dict = {}
-            
-            # Collect all angles for this time point
-            for col in angle_data.columns:
-                if col == 'time':
-                    continue
-                
-                # Add angle to the angles dictionary
-                angles_dict[col] = float(round(row[col], 1))
+        for idx, time_val in enumerate(time_keys):
+            row_min, row_max = min_values[idx], max_values[idx]
             
             # Default ROM values
             rom_min = 0.0
             rom_max = 0.0
             rom_range = 0.0
             
-            # Set ROM values if trunk angle is available and we've calculated them
-            if 'trunk' in angle_data.columns and idx < len(running_rom):
-                rom_min = float(running_min[idx])
-                rom_max = float(running_max[idx])
-                rom_range = float(running_rom[idx])
-                
+            # Set ROM values if trunk angle is available
+            if trunk is not None:
+                rom_min = row_min[trunk]
+                rom_max = row_max[trunk]
+                rom_range = json_float(running_max[idx, trunk] - running_min[idx, trunk])
+            
             # Create entry for this time point with all angles together
             rom_data[time_val] = {
                 "test": test_name,
                 "is_ready": True,
-                "angles": angles_dict,
+                "angles": dict(zip(angle_names, angle_values[idx])),
                 "ROM": [rom_min, rom_max],  # Update with calculated values for trunk
                 "rom_range": rom_range,  # Update with calculated ROM for trunk
+                "angles_rom": dict(zip(angle_names, map(list, zip(row_min, row_max)))),
                 "position_valid": True,
                 "guidance": "Good posture",
                 "posture_message": "Good posture",
@@ -158,4 +316,108 @@ class ROMAnalyzer:
                 "status": "success"
             }
         
-        return rom_data
\ No newline at end of file
+        return rom_data
+
+def lttb_indices(times: np.ndarray, values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Select the points of each series to keep with Largest-Triangle-Three-Buckets
+    
+    The first and last points are kept, and the points in between are split
+    into n_out - 2 buckets. From each bucket, the point forming the largest
+    triangle with the previously kept point and the mean of the next bucket
+    is kept. All series are downsampled together, each choosing its own points.
+    A bucket where a series has no values yields a missing point, so gaps
+    stay visible.
+    
+    Args:
+        times: Timestamp of each point (shape [T])
+        values: Series values (shape [T, A], NaN where missing)
+        n_out: Number of points to keep (at least 3)
+        
+    Returns:
+        np.ndarray: Indices of the kept points of each series (shape [n_out, A])
+    """
+    times = np.asarray(times, dtype=float)
+    values = np.asarray(values, dtype=float)
+    n_points, n_series = values.shape
+    n_out = max(int(n_out), 3)
+    if n_points <= n_out:
+        return np.broadcast_to(np.arange(n_points)[:, None], values.shape).copy()
+    
+    # Bucket boundaries and the mean of every bucket, the last point being its own bucket
+    edges = np.linspace(1, n_points - 1, n_out - 1).astype(int)
+    valid = ~np.isnan(values)
+    starts = np.append(edges[:-1], n_points - 1)
+    counts = np.add.reduceat(valid, starts, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_values = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=0) / counts
+    mean_times = np.add.reduceat(times, starts) / np.diff(np.append(starts, n_points))
+    
+    # Points of every bucket, padded with NaN to the largest bucket
+    n_buckets = n_out - 2
+    sizes = np.diff(edges)
+    offsets = np.arange(sizes.max())
+    rows = edges[:-1, None] + offsets
+    padded = offsets < sizes[:, None]
+    rows = np.where(padded, rows, edges[:-1, None])
+    bucket_times = times[rows][:, :, None]
+    bucket_values = np.where(padded[:, :, None], values[rows], np.nan)
+    
+    indices = np.empty((n_out, n_series), dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = n_points - 1
+    
+    # The previously kept point of each series, starting from its first value
+    series = np.arange(n_series)
+    first = np.where(valid.any(axis=0), valid.argmax(axis=0), 0)
+    prev_time = times[first]
+    prev_value = values[first, series]
+    
+    for i in range(n_buckets):
+        next_time = mean_times[i + 1]
+        next_value = mean_values[i + 1]
+        next_value = np.where(next_value == next_value, next_value, prev_value)
+        
+        # Twice the triangle areas, written as |a * value + b * time + c|, -1 for missing values
+        a = prev_time - next_time
+        b = next_value - prev_value
+        c = -a * prev_value - b * prev_time
+        areas = np.fmax(np.abs(bucket_values[i] * a + bucket_times[i] * b + c), -1.0)
+        selected = areas.argmax(axis=0)
+        indices[i + 1] = rows[i, selected]
+        
+        kept = areas[selected, series] >= 0
+        prev_time = np.where(kept, bucket_times[i, selected, 0], prev_time)
+        prev_value = np.where(kept, bucket_values[i, selected, series], prev_value)
+    
+    return indices
+
+def compute_angles_from_store(store: KeypointStore,
+                              track_id: int,
+                              angle_names: List[str],
+                              angle_definitions: Optional[Dict[str, List[Any]]] = None,
+                              keypoint_threshold: float = 0.3) -> Tuple[np.ndarray, List[str], np.ndarray]:
+    """
+    Recompute the angles of a tracked person from stored keypoints
+    
+    Args:
+        store: Keypoint store of the assessment
+        track_id: Track ID of the person
+        angle_names: Angles to compute
+        angle_definitions: Custom angle definitions
+        keypoint_threshold: Confidence threshold for keypoints
+        
+    Returns:
+        Tuple: (angles [T, A], names of the A angles this skeleton can compute,
+            frame timestamps [T])
+    """
+    plan = physiotrack.get_angle_plan(
+        store.metadata.get("model_type", "body_with_feet"),
+        angle_names,
+        store.keypoint_names,
+        store.metadata.get("keypoint_ids", list(range(len(store.keypoint_names)))),
+        angle_definitions
+    )
+    keypoints, scores = store.track(track_id)
+    angles = plan.compute(keypoints, scores, keypoint_threshold)
+    return angles[:, plan.resolved], plan.resolved_names, store.times
@@ -0,0 +1,218 @@
+"""
+Process-wide pool of warm pose detectors
+"""
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Set, Tuple, Any, Optional
+import physiotrack
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+class DetectorPoolExhausted(RuntimeError):
+    """Raised when no model slot becomes available before the checkout timeout"""
+
+class DetectorPool:
+    """Shares loaded pose models between requests
+
+    Models are loaded once per (model_type, backend, device), the settings
+    that select them. Every checkout gets its own PoseDetector sharing the
+    loaded models (see PoseDetector.new_session), with its own RTMLib
+    tracking state, detection frequency and input options, so any number of
+    sessions can use one configuration concurrently. Person tracks and
+    angle history stay in the session's FrameContext.
+    """
+
+    def __init__(self, max_size: int = 4, idle_timeout: float = 600.0, checkout_timeout: float = 30.0):
+        """
+        Initialize the pool
+
+        Args:
+            max_size: Maximum number of model configurations loaded at once
+            idle_timeout: Seconds after which models no session uses are released
+            checkout_timeout: Seconds to wait for a model slot when the pool is full
+        """
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self._condition = threading.Condition()
+        self._models: Dict[Tuple, physiotrack.PoseDetector] = {}
+        self._users: Dict[Tuple, int] = {}
+        self._last_used: Dict[Tuple, float] = {}
+        self._loading: Set[Tuple] = set()
+        self._in_use: Dict[int, Tuple] = {}
+
+    @staticmethod
+    def make_key(model_type: str, backend: str, device: str) -> Tuple:
+        """Build the pool key for a detector configuration"""
+        return (model_type.lower(), backend.lower(), device.lower())
+
+    def checkout(self, model_type: str = "body_with_feet",
+                 backend: str = "auto",
+                 device: str = "auto",
+                 detection_frequency: int = 4,
+                 input_short_side: Optional[int] = None,
+                 roi_margin: Optional[float] = None,
+                 timeout: Optional[float] = None) -> physiotrack.PoseDetector:
+        """
+        Get a detector for one session, loading its models if needed
+
+        Args:
+            model_type: Pose model type
+            backend: Backend for inference
+            device: Device for inference
+            detection_frequency: Detection frequency (frames)
+            input_short_side: Short side frames are downscaled to before inference
+            roi_margin: Margin of ROI cropping around the persons (None: no cropping)
+            timeout: Seconds to wait when the pool is full (defaults to checkout_timeout)
+
+        Returns:
+            physiotrack.PoseDetector: Detector with fresh tracking state
+
+        Raises:
+            DetectorPoolExhausted: If `max_size` other configurations stay in use
+        """
+        key = self.make_key(model_type, backend, device)
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            while True:
+                self._evict_idle_locked()
+
+                model = self._models.get(key)
+                if model is not None:
+                    self._users[key] += 1
+                    break
+
+                if key not in self._loading:
+                    if len(self._models) + len(self._loading) < self.max_size or self._evict_oldest_locked():
+                        # Reserve a slot and load the models outside the lock
+                        self._loading.add(key)
+                        break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DetectorPoolExhausted(
+                        f"No pose model slot available after {timeout:.1f}s (pool size {self.max_size})")
+                self._condition.wait(remaining)
+
+        if model is None:
+            try:
+                logger.info(f"Loading pose models {key}")
+                model = physiotrack.PoseDetector(
+                    model_type=model_type,
+                    detection_frequency=detection_frequency,
+                    device=device,
+                    backend=backend
+                )
+            finally:
+                with self._condition:
+                    self._loading.discard(key)
+                    if model is not None:
+                        self._models[key] = model
+                        self._users[key] = 1
+                    self._condition.notify_all()
+
+        detector = model.new_session(detection_frequency, input_short_side, roi_margin)
+        with self._condition:
+            self._in_use[id(detector)] = key
+        return detector
+
+    def checkin(self, detector: physiotrack.PoseDetector):
+        """
+        Return a detector to the pool
+
+        Args:
+            detector: Detector obtained from checkout()
+        """
+        with self._condition:
+            key = self._in_use.pop(id(detector), None)
+            if key is None:
+                logger.warning("Detector returned to a pool it does not belong to")
+                return
+            self._users[key] -= 1
+            if self._users[key] == 0:
+                self._last_used[key] = time.monotonic()
+                self._condition.notify_all()
+
+    def can_checkout(self, model_type: str = "body_with_feet", backend: str = "auto", device: str = "auto") -> bool:
+        """
+        Check whether a detector of a configuration can be checked out without waiting
+
+        Args:
+            model_type: Pose model type
+            backend: Backend for inference
+            device: Device for inference
+
+        Returns:
+            bool: True if its models are loaded or a slot is free or reclaimable
+        """
+        key = self.make_key(model_type, backend, device)
+        with self._condition:
+            return (key in self._models or key in self._loading
+                    or len(self._models) + len(self._loading) < self.max_size
+                    or any(users == 0 for users in self._users.values()))
+
+    @contextmanager
+    def detector(self, **kwargs):
+        """Context manager wrapping checkout() and checkin()"""
+        detector = self.checkout(**kwargs)
+        try:
+            yield detector
+        finally:
+            self.checkin(detector)
+
+    def evict_idle(self):
+        """Release models unused for longer than idle_timeout"""
+        with self._condition:
+            self._evict_idle_locked()
+
+    def clear(self):
+        """Release all unused models"""
+        with self._condition:
+            while self._evict_oldest_locked():
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool usage statistics"""
+        with self._condition:
+            return {
+                "size": len(self._models) + len(self._loading),
+                "max_size": self.max_size,
+                "in_use": len(self._in_use),
+                "sessions": {"/".join(map(str, key)): users for key, users in self._users.items()}
+            }
+
+    def _release_locked(self, key: Tuple):
+        """Drop the loaded models of a configuration (lock must be held)"""
+        logger.info(f"Releasing pose models {key}")
+        del self._models[key]
+        del self._users[key]
+        self._last_used.pop(key, None)
+        self._condition.notify_all()
+
+    def _evict_idle_locked(self):
+        """Drop unused models past their timeout (lock must be held)"""
+        cutoff = time.monotonic() - self.idle_timeout
+        for key in [key for key, users in self._users.items()
+                    if users == 0 and self._last_used.get(key, 0.0) < cutoff]:
+            self._release_locked(key)
+
+    def _evict_oldest_locked(self) -> bool:
+        """Drop the least recently used unused models (lock must be held)"""
+        unused = [key for key, users in self._users.items() if users == 0]
+        if not unused:
+            return False
+        self._release_locked(min(unused, key=lambda key: self._last_used.get(key, 0.0)))
+        return True
+
+# Create a global detector pool
+detector_pool = DetectorPool(
+    max_size=settings.detector_pool_max_size,
+    idle_timeout=settings.detector_pool_idle_timeout,
+    checkout_timeout=settings.detector_pool_checkout_timeout
+)
@@ -0,0 +1,109 @@
+"""
+Bounded executor for blocking realtime frame processing
+"""
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from ..config import settings
+
+class FrameExecutor:
+    """Runs the blocking per-frame work of realtime sessions off the event loop
+
+    Frame decoding, pose inference, tracking, angle computation, rendering
+    and encoding run on a dedicated pool of
+    `max_workers` threads, so busy sessions never stall the event loop that
+    serves every other WebSocket and HTTP request.
+
+    Work is started in submission order. As each session has at most one
+    frame in flight (see streaming_service.LatestFrame), first-come
+    first-served ordering gives every busy session a turn before any session
+    gets a second one.
+    """
+
+    def __init__(self, max_workers: int = 4):
+        """
+        Initialize the executor
+
+        Args:
+            max_workers: Maximum number of frames processed concurrently
+        """
+        self.max_workers = max(int(max_workers), 1)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._queue_wait_total = 0.0
+        self._queue_wait_max = 0.0
+        self._run_time_total = 0.0
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run a blocking function on the executor
+
+        Args:
+            func: Function to run
+            *args: Arguments of the function
+
+        Returns:
+            Any: Result of the function
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="frame-executor")
+            self._queued += 1
+            future = self._executor.submit(self._call, time.perf_counter(), func, args)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # A frame dropped before it started never reaches _call
+            if future.cancel():
+                with self._lock:
+                    self._queued -= 1
+            raise
+
+    def _call(self, submitted: float, func: Callable, args: tuple) -> Any:
+        """Run a function on a worker thread, recording its wait and run times"""
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            wait = started - submitted
+            self._queue_wait_total += wait
+            self._queue_wait_max = max(self._queue_wait_max, wait)
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._run_time_total += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        """Get executor metrics"""
+        with self._lock:
+            completed = self._completed
+            return {
+                "max_workers": self.max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": completed,
+                "mean_queue_wait_ms": 1000 * self._queue_wait_total / completed if completed else 0.0,
+                "max_queue_wait_ms": 1000 * self._queue_wait_max,
+                "mean_run_ms": 1000 * self._run_time_total / completed if completed else 0.0
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+# Create a global frame executor
+frame_executor = FrameExecutor(max_workers=settings.realtime_workers)
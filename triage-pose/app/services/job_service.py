@@ -0,0 +1,210 @@
+"""
+Process-pool executor for video assessment jobs
+"""
+import json
+import logging
+import threading
+import traceback
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+from ..config import settings
+from ..models.data import ProcessingOptions, ROMAnalysisOptions
+from ..io.mot import read_mot
+from .storage_service import write_json, save_results, save_analysis_options
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFull(RuntimeError):
+    """Raised when too many jobs are waiting to be processed"""
+
+def write_status(output_dir: str, status: str, message: str, **extra):
+    """
+    Write the status file polled by the assessment endpoints
+
+    Args:
+        output_dir: Assessment directory
+        status: Job status (queued, processing, complete, error)
+        message: Human-readable status message
+        **extra: Additional fields to store
+    """
+    write_json(str(Path(output_dir) / "status.json"), {"status": status, "message": message, **extra})
+
+def _init_worker(warm_options: Optional[Dict[str, Any]]):
+    """Load a detector into the worker's pool so the first job starts warm"""
+    if not warm_options:
+        return
+    from .detector_pool import detector_pool
+
+    options = ProcessingOptions(**warm_options)
+    try:
+        detector = detector_pool.checkout(**options.detector_options())
+        detector_pool.checkin(detector)
+    except Exception as e:
+        logger.warning(f"Could not preload pose detector: {str(e)}")
+
+def run_assessment(options: Dict[str, Any],
+                   analysis_options: Dict[str, Any],
+                   video_path: str,
+                   output_dir: str,
+                   assessment_id: str) -> str:
+    """
+    Process a video for ROM assessment (runs in a worker process)
+
+    Args:
+        options: Video processing options
+        analysis_options: ROM analysis options
+        video_path: Path to video file
+        output_dir: Directory to save results
+        assessment_id: Unique assessment ID
+
+    Returns:
+        str: Final job status
+    """
+    from .video_service import VideoProcessor
+    from .analysis_service import ROMAnalyzer
+
+    rom_analyzer = ROMAnalyzer(ROMAnalysisOptions(**analysis_options))
+
+    # Process the video with a detector from the worker's pool
+    try:
+        video_processor = VideoProcessor(ProcessingOptions(**options))
+    except Exception as e:
+        write_status(output_dir, "error", f"Error loading pose detector: {str(e)}")
+        return "error"
+    try:
+        result = video_processor.process_video(video_path, output_dir)
+    finally:
+        video_processor.close()
+
+    # If successful, analyze ROM and generate ROM data
+    if result["status"] == "complete" and "angles_file" in result:
+        # Load angle data
+        mot = read_mot(result["angles_file"])
+        
+        # Store the ROM analysis served by the results endpoint
+        save_results(output_dir, assessment_id, rom_analyzer.analyze_angles(mot.angles, mot.angle_names, mot.times))
+        
+        angle_data = rom_analyzer.angles_to_frame(mot.angles, mot.angle_names, mot.times)
+
+        # Generate ROM data
+        rom_data = rom_analyzer.generate_rom_data(angle_data, analysis_options.get("test_name", "lb-flexion"))
+
+        # Save ROM data
+        rom_data_file = Path(output_dir) / f"{assessment_id}_rom_data.json"
+        with open(rom_data_file, "w") as f:
+            json.dump(rom_data, f, indent=4)
+
+    return result["status"]
+
+class JobExecutor:
+    """Runs video assessments in a pool of worker processes
+
+    Jobs are queued in the executor and processed by `max_workers` processes,
+    each keeping warm pose detectors between jobs, so that the API event
+    loop never runs OpenCV or inference work.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queued: int = 32,
+                 warm_options: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the executor
+
+        Args:
+            max_workers: Number of worker processes
+            max_queued: Maximum number of submitted jobs not yet finished
+            warm_options: Processing options of the detector to preload in each worker
+        """
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.warm_options = warm_options
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+
+    def start(self):
+        """Start the worker processes"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.warm_options,)
+            )
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, options: ProcessingOptions,
+               analysis_options: ROMAnalysisOptions,
+               video_path: str,
+               output_dir: str,
+               assessment_id: str) -> Future:
+        """
+        Queue an assessment job
+
+        Args:
+            options: Video processing options
+            analysis_options: ROM analysis options
+            video_path: Path to video file
+            output_dir: Directory to save results
+            assessment_id: Unique assessment ID
+
+        Returns:
+            Future: Resolves to the final job status
+        """
+        self.start()
+        with self._lock:
+            if len(self._pending) >= self.max_queued:
+                raise JobQueueFull(f"Too many assessments in progress ({len(self._pending)})")
+            write_status(output_dir, "queued", "Assessment queued for processing")
+            save_analysis_options(output_dir, assessment_id, analysis_options.dict())
+            future = self._executor.submit(run_assessment, options.dict(), analysis_options.dict(),
+                                           video_path, output_dir, assessment_id)
+            self._pending[assessment_id] = future
+
+        def _done(future: Future):
+            with self._lock:
+                self._pending.pop(assessment_id, None)
+            if future.cancelled():
+                write_status(output_dir, "error", "Assessment was cancelled")
+                return
+            error = future.exception()
+            if error is not None:
+                logger.error(f"Assessment {assessment_id} failed: {str(error)}")
+                logger.error("".join(traceback.format_exception(type(error), error, error.__traceback__)))
+                write_status(output_dir, "error", f"Error processing video: {str(error)}")
+
+        future.add_done_callback(_done)
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """Get executor statistics"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "in_progress": len(self._pending),
+                "running": sum(1 for future in self._pending.values() if future.running())
+            }
+
+# Create a global job executor
+job_executor = JobExecutor(
+    max_workers=settings.job_workers,
+    max_queued=settings.job_max_queued,
+    warm_options=ProcessingOptions(
+        model_type=settings.default_model,
+        detection_frequency=settings.default_detection_frequency,
+        tracking_mode=settings.default_tracking_mode,
+        device=settings.default_device,
+        backend=settings.default_backend
+    ).dict() if settings.job_preload_model else None
+)
@@ -0,0 +1,134 @@
+"""
+Adaptive quality control for realtime sessions
+"""
+from typing import Dict, Any, List, Optional, Tuple
+
+class QualityController:
+    """Adapts a realtime session's processing cost to a frame rate and latency budget
+
+    The controller walks a ladder of quality levels, from the session's
+    requested settings down to a smaller inference input, rarer person
+    detection and, last, no overlay rendering. It steps down one level when
+    the smoothed processing time exceeds the frame budget (1 / target_fps)
+    or the smoothed latency exceeds the latency budget, and back up when both
+    have enough headroom. Every level is held for at least `patience` frames,
+    and a step up that has to be undone soon after doubles the wait before
+    the next one, so the controller settles instead of oscillating between
+    two levels.
+    """
+
+    INPUT_SCALES = (1.0, 0.75, 0.5)
+    DETECTION_FREQUENCY_FACTORS = (2, 4)
+
+    def __init__(self, target_fps: float = 30.0, latency_budget_ms: float = 200.0,
+                 detection_frequency: int = 4, render: bool = True,
+                 smoothing: float = 0.2, patience: int = 15, headroom: float = 0.6):
+        """
+        Initialize the controller at the highest quality
+
+        Args:
+            target_fps: Frame rate to sustain
+            latency_budget_ms: Maximum latency from receiving a frame to its result
+            detection_frequency: Requested detection frequency (frames)
+            render: Whether the client asked for annotated frames
+            smoothing: Weight of the newest measurement in the moving averages
+            patience: Minimum number of frames between two changes
+            headroom: Fraction of the budgets below which quality is raised
+        """
+        self.target_fps = target_fps
+        self.latency_budget_ms = latency_budget_ms
+        self.smoothing = smoothing
+        self.patience = patience
+        self.headroom = headroom
+        self.levels = self._build_levels(detection_frequency, render)
+        self.level = 0
+        self.processing_ms: Optional[float] = None
+        self.latency_ms: Optional[float] = None
+        self._frames = 0
+        self._upgrade_patience = patience
+        self._raised = False
+
+    @classmethod
+    def _build_levels(cls, detection_frequency: int, render: bool) -> List[Tuple[float, int, bool]]:
+        """Quality ladder of (input scale, detection frequency, render), best first"""
+        levels = [(scale, detection_frequency, render) for scale in cls.INPUT_SCALES]
+        levels += [(cls.INPUT_SCALES[-1], detection_frequency * factor, render)
+                   for factor in cls.DETECTION_FREQUENCY_FACTORS]
+        if render:
+            levels.append(levels[-1][:2] + (False,))
+        return levels
+
+    @property
+    def input_scale(self) -> float:
+        """Scale of the frames passed to pose inference"""
+        return self.levels[self.level][0]
+
+    @property
+    def detection_frequency(self) -> int:
+        """Frames between two person detections"""
+        return self.levels[self.level][1]
+
+    @property
+    def render(self) -> bool:
+        """Whether annotated frames are sent"""
+        return self.levels[self.level][2]
+
+    def update(self, processing_ms: float, latency_ms: float) -> Optional[Dict[str, Any]]:
+        """
+        Account for a processed frame and adjust the quality level
+
+        Args:
+            processing_ms: Time spent processing the frame
+            latency_ms: Time from receiving the frame to its result
+
+        Returns:
+            Optional[Dict[str, Any]]: New quality state if the level changed
+        """
+        if self.processing_ms is None:
+            self.processing_ms, self.latency_ms = processing_ms, latency_ms
+        else:
+            self.processing_ms += self.smoothing * (processing_ms - self.processing_ms)
+            self.latency_ms += self.smoothing * (latency_ms - self.latency_ms)
+        self._frames += 1
+        if self._frames < self.patience:
+            return None
+
+        frame_budget_ms = 1000 / self.target_fps
+        if self.processing_ms > frame_budget_ms or self.latency_ms > self.latency_budget_ms:
+            if self.level == len(self.levels) - 1:
+                return None
+            if self._raised and self._frames < 4 * self.patience:
+                # The last step up did not hold: wait longer before the next one
+                self._upgrade_patience = min(2 * self._upgrade_patience, 64 * self.patience)
+            elif self._raised:
+                self._upgrade_patience = self.patience
+            return self._step(1, "over budget")
+
+        if (self.level > 0 and self._frames >= self._upgrade_patience
+                and self.processing_ms < self.headroom * frame_budget_ms
+                and self.latency_ms < self.headroom * self.latency_budget_ms):
+            return self._step(-1, "headroom")
+        return None
+
+    def _step(self, step: int, reason: str) -> Dict[str, Any]:
+        """Move down (step 1) or up (step -1) the ladder"""
+        self.level += step
+        self._raised = step < 0
+        self._frames = 0
+        return self.state(reason)
+
+    def state(self, reason: Optional[str] = None) -> Dict[str, Any]:
+        """Get the current quality settings, as reported to the client"""
+        return {
+            "type": "quality",
+            "level": self.level,
+            "levels": len(self.levels),
+            "input_scale": self.input_scale,
+            "detection_frequency": self.detection_frequency,
+            "render": self.render,
+            "target_fps": self.target_fps,
+            "latency_budget_ms": self.latency_budget_ms,
+            "processing_ms": self.processing_ms,
+            "latency_ms": self.latency_ms,
+            "reason": reason
+        }
@@ -0,0 +1,198 @@
+"""
+Registry and admission control for realtime sessions
+"""
+import time
+import uuid
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+from ..config import settings
+from ..models.data import ProcessingOptions
+from .detector_pool import DetectorPool, detector_pool
+
+class SessionRejected(RuntimeError):
+    """Raised when the server has no capacity for another realtime session"""
+
+class RealtimeSession:
+    """Resource accounting of one realtime session"""
+
+    def __init__(self, options: ProcessingOptions, protocol: str = "json", render: bool = True,
+                 downgraded: bool = False):
+        """
+        Register the session's configuration
+
+        Args:
+            options: Processing options the session runs with
+            protocol: Message protocol (json or binary)
+            render: Whether annotated frames are sent
+            downgraded: Whether the options were degraded to admit the session
+        """
+        self.session_id = uuid.uuid4().hex
+        self.options = options
+        self.protocol = protocol
+        self.render = render
+        self.downgraded = downgraded
+        self.started = time.time()
+        self.received = 0
+        self.dropped = 0
+        self.processed = 0
+        self.cpu_time = 0.0
+        self.memory_bytes = 0
+        self.latency_ms = float("nan")
+        self.quality: Optional[Dict[str, Any]] = None
+        self.motion_gate: Optional[Any] = None
+        self._result_times: deque = deque(maxlen=30)
+
+    def record_frame(self, cpu_time: float, latency_ms: float, memory_bytes: int, received: int, dropped: int):
+        """
+        Account for a processed frame
+
+        Args:
+            cpu_time: CPU seconds spent on the frame by the frame executor
+            latency_ms: Time from receiving the frame to its result
+            memory_bytes: Size of the session's history buffers
+            received: Frames received so far
+            dropped: Frames dropped so far
+        """
+        self.processed += 1
+        self.cpu_time += cpu_time
+        self.latency_ms = latency_ms
+        self.memory_bytes = memory_bytes
+        self.received = received
+        self.dropped = dropped
+        self._result_times.append(time.perf_counter())
+
+    @property
+    def fps(self) -> float:
+        """Processed frames per second over the last results"""
+        if len(self._result_times) < 2:
+            return 0.0
+        elapsed = self._result_times[-1] - self._result_times[0]
+        return (len(self._result_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def info(self) -> Dict[str, Any]:
+        """Get the session's configuration and statistics"""
+        uptime = time.time() - self.started
+        return {
+            "session_id": self.session_id,
+            "model_type": self.options.model_type,
+            "detection_frequency": self.options.detection_frequency,
+            "protocol": self.protocol,
+            "render": self.render,
+            "downgraded": self.downgraded,
+            "uptime": uptime,
+            "frames_received": self.received,
+            "frames_processed": self.processed,
+            "frames_dropped": self.dropped,
+            "fps": self.fps,
+            "cpu_time": self.cpu_time,
+            "cpu_load": self.cpu_time / uptime if uptime > 0 else 0.0,
+            "memory_bytes": self.memory_bytes,
+            "latency_ms": self.latency_ms if self.latency_ms == self.latency_ms else None,
+            "quality": self.quality,
+            "motion_gate": self.motion_gate.stats() if self.motion_gate is not None else None
+        }
+
+class SessionManager:
+    """Tracks realtime sessions and admits new ones within a capacity
+
+    Up to `downgrade_sessions` sessions run with the options they asked for.
+    Beyond that, new sessions are admitted with pose detection run at most
+    every `downgrade_detection_frequency` frames, and once `max_sessions`
+    sessions are active, new sessions are rejected. Sessions whose pose
+    model the detector pool cannot load without waiting are rejected too.
+    """
+
+    def __init__(self, max_sessions: int = 16, downgrade_sessions: int = 8,
+                 downgrade_detection_frequency: int = 8, pool: DetectorPool = detector_pool):
+        """
+        Initialize the registry
+
+        Args:
+            max_sessions: Maximum number of concurrent sessions
+            downgrade_sessions: Number of sessions from which new ones are downgraded
+            downgrade_detection_frequency: Detection frequency of downgraded sessions
+            pool: Detector pool the sessions check their detectors out of
+        """
+        self.max_sessions = max_sessions
+        self.downgrade_sessions = downgrade_sessions
+        self.downgrade_detection_frequency = downgrade_detection_frequency
+        self.pool = pool
+        self._sessions: Dict[str, RealtimeSession] = {}
+        self._lock = threading.Lock()
+        self._rejected = 0
+        self._downgraded = 0
+
+    def open(self, options: ProcessingOptions, protocol: str = "json", render: bool = True) -> RealtimeSession:
+        """
+        Admit a new session, downgrading its options when the server is busy
+
+        Args:
+            options: Processing options requested by the client
+            protocol: Message protocol (json or binary)
+            render: Whether annotated frames are sent
+
+        Returns:
+            RealtimeSession: Registered session, whose options to run with
+
+        Raises:
+            SessionRejected: If the maximum number of sessions is active or
+                no pose model slot is available for the session
+        """
+        with self._lock:
+            active = len(self._sessions)
+            if active >= self.max_sessions:
+                self._rejected += 1
+                raise SessionRejected(f"Too many realtime sessions ({active})")
+            if not self.pool.can_checkout(options.model_type, options.backend, options.device):
+                self._rejected += 1
+                raise SessionRejected(f"No pose model slot available for {options.model_type}")
+
+            downgraded = (active >= self.downgrade_sessions
+                          and options.detection_frequency < self.downgrade_detection_frequency)
+            if downgraded:
+                options = options.copy(update={"detection_frequency": self.downgrade_detection_frequency})
+                self._downgraded += 1
+
+            session = RealtimeSession(options, protocol, render, downgraded)
+            self._sessions[session.session_id] = session
+            return session
+
+    def close(self, session: RealtimeSession):
+        """Unregister a session"""
+        with self._lock:
+            self._sessions.pop(session.session_id, None)
+
+    def reject(self, session: RealtimeSession):
+        """Unregister an admitted session that could not start for lack of capacity"""
+        with self._lock:
+            self._sessions.pop(session.session_id, None)
+            self._rejected += 1
+
+    def sessions(self) -> List[RealtimeSession]:
+        """Get the active sessions"""
+        with self._lock:
+            return list(self._sessions.values())
+
+    def stats(self) -> Dict[str, Any]:
+        """Get capacity and per-session statistics"""
+        sessions = [session.info() for session in self.sessions()]
+        return {
+            "active_sessions": len(sessions),
+            "max_sessions": self.max_sessions,
+            "downgrade_sessions": self.downgrade_sessions,
+            "rejected": self._rejected,
+            "downgraded": self._downgraded,
+            "fps": sum(session["fps"] for session in sessions),
+            "cpu_load": sum(session["cpu_load"] for session in sessions),
+            "memory_bytes": sum(session["memory_bytes"] for session in sessions),
+            "sessions": sessions
+        }
+
+# Create a global session manager
+session_manager = SessionManager(
+    max_sessions=settings.realtime_max_sessions,
+    downgrade_sessions=settings.realtime_downgrade_sessions,
+    downgrade_detection_frequency=settings.realtime_downgrade_detection_frequency
+)
@@ -1 +1,209 @@
 # Results storage
+"""
+Storage and caching of assessment results
+"""
+import os
+import json
+import tempfile
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from ..config import settings
+
+def write_json(path: str, data: Any, compact: bool = False):
+    """
+    Write a JSON file atomically, so readers never see a partial file
+
+    Args:
+        path: Output file
+        data: JSON-serializable data
+        compact: Whether to omit whitespace
+    """
+    path = Path(path)
+    fd, tmp_file = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            if compact:
+                json.dump(data, f, separators=(",", ":"), allow_nan=False)
+            else:
+                json.dump(data, f)
+        os.replace(tmp_file, path)
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
+
+def downsampling_level(max_points: Optional[int]) -> Optional[int]:
+    """
+    Round a requested number of time series points down to a downsampling level
+
+    Results are stored and cached once per level of
+    settings.results_max_points_levels rather than once per requested number,
+    so requests cannot add results files and cache entries without bound.
+
+    Args:
+        max_points: Requested number of points, or None for all points
+
+    Returns:
+        Optional[int]: Largest level not above max_points (at least the smallest
+            level), or None for all points
+    """
+    levels = sorted(settings.results_max_points_levels)
+    if not max_points or not levels:
+        return None
+    return max((level for level in levels if level <= max_points), default=levels[0])
+
+def results_file(assessment_dir: str, assessment_id: str, max_points: Optional[int] = None) -> Path:
+    """Path of the stored ROM analysis results of an assessment"""
+    suffix = f"_{max_points}pts" if max_points else ""
+    return Path(assessment_dir) / f"{assessment_id}_rom_analysis{suffix}.json"
+
+def save_results(assessment_dir: str, assessment_id: str, results: Dict[str, Any],
+                 max_points: Optional[int] = None) -> Path:
+    """
+    Store the ROM analysis results of an assessment
+
+    Args:
+        assessment_dir: Assessment directory
+        assessment_id: Unique assessment ID
+        results: ROM analysis results
+        max_points: Number of time series points the results were downsampled to
+
+    Returns:
+        Path: Results file
+    """
+    path = results_file(assessment_dir, assessment_id, max_points)
+    write_json(str(path), results, compact=True)
+    return path
+
+def analysis_options_file(assessment_dir: str, assessment_id: str) -> Path:
+    """Path of the ROM analysis options an assessment was submitted with"""
+    return Path(assessment_dir) / f"{assessment_id}_analysis_options.json"
+
+def save_analysis_options(assessment_dir: str, assessment_id: str, options: Dict[str, Any]) -> Path:
+    """
+    Store the ROM analysis options of an assessment
+
+    Args:
+        assessment_dir: Assessment directory
+        assessment_id: Unique assessment ID
+        options: ROM analysis options
+
+    Returns:
+        Path: Options file
+    """
+    path = analysis_options_file(assessment_dir, assessment_id)
+    write_json(str(path), options)
+    return path
+
+def load_analysis_options(assessment_dir: str, assessment_id: str) -> Dict[str, Any]:
+    """
+    Load the ROM analysis options of an assessment
+
+    Args:
+        assessment_dir: Assessment directory
+        assessment_id: Unique assessment ID
+
+    Returns:
+        Dict: ROM analysis options, empty if none were stored
+    """
+    path = analysis_options_file(assessment_dir, assessment_id)
+    if not path.exists():
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+class ResultsCache:
+    """LRU cache of serialized results files
+
+    Entries hold the raw bytes of a file and are keyed by its path. A file's
+    modification time and size are checked on every lookup, so a rewritten
+    file is reloaded instead of served stale.
+    """
+
+    def __init__(self, max_entries: int = 64, max_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of cached files
+            max_bytes: Maximum total size of the cached files
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int], bytes]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, loader: Optional[Callable[[str], bytes]] = None) -> Optional[bytes]:
+        """
+        Get the contents of a file, reading it only if it changed
+
+        Args:
+            path: File to read
+            loader: Function reading the file (defaults to reading its bytes)
+
+        Returns:
+            Optional[bytes]: File contents, or None if the file does not exist
+        """
+        key = str(path)
+        try:
+            stat = os.stat(key)
+        except FileNotFoundError:
+            self.invalidate(key)
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        data = loader(key) if loader is not None else Path(key).read_bytes()
+        self._put(key, version, data)
+        return data
+
+    def _put(self, key: str, version: Tuple[int, int], data: bytes):
+        """Add an entry and evict the least recently used ones over the limits"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            if len(data) > self.max_bytes:
+                return
+            self._entries[key] = (version, data)
+            self._size += len(data)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self, path: str):
+        """Drop the entry of a file"""
+        with self._lock:
+            old = self._entries.pop(str(path), None)
+            if old is not None:
+                self._size -= len(old[1])
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+# Create a global results cache
+results_cache = ResultsCache(
+    max_entries=settings.results_cache_max_entries,
+    max_bytes=settings.results_cache_max_mb * 1024 * 1024
+)
@@ -3,98 +3,396 @@ Real-time streaming service
 """
 from fastapi import WebSocket
 import json
+import time
 import asyncio
 import base64
 import cv2
 import numpy as np
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 from ..models.data import ProcessingOptions, FrameContext
+from ..io.realtime_protocol import ResultPacker
+from ..processors.motion_gate import MotionGate
 from .video_service import VideoProcessor
+from .detector_pool import DetectorPoolExhausted
+from .frame_executor import frame_executor
+from .session_manager import SessionManager, SessionRejected, session_manager
+from .quality_controller import QualityController
+from .analysis_service import json_float
+
+class LatestFrame:
+    """Single-slot mailbox holding the newest received frame of a session
+    
+    A frame that is replaced before the processor took it is counted as
+    dropped, so a slow processor always works on the newest frame and
+    latency stays bounded instead of growing with the socket backlog.
+    """
+    
+    def __init__(self):
+        """Initialize an empty slot"""
+        self.received = 0
+        self.dropped = 0
+        self.closed = False
+        self.error: Optional[Exception] = None
+        self._frame: Optional[Tuple[Dict[str, Any], float]] = None
+        self._event = asyncio.Event()
+    
+    def put(self, message: Dict[str, Any]):
+        """Store a received frame message, replacing an unprocessed one"""
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = (message, time.perf_counter())
+        self.received += 1
+        self._event.set()
+    
+    def close(self, error: Optional[Exception] = None):
+        """Stop the session, optionally because receiving failed"""
+        self.closed = True
+        self.error = error
+        self._event.set()
+    
+    async def get(self) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Wait for the newest frame
+        
+        Returns:
+            Optional[Tuple[Dict[str, Any], float]]: (message, receive time), or
+                None once the session is stopped
+        """
+        while not self.closed:
+            if self._frame is not None:
+                frame, self._frame = self._frame, None
+                return frame
+            self._event.clear()
+            await self._event.wait()
+        if self.error is not None:
+            raise self.error
+        return None
 
 class StreamingService:
     """Real-time streaming service for pose detection and analysis"""
     
-    def __init__(self):
-        """Initialize the streaming service"""
-        self.active_sessions = {}
+    def __init__(self, sessions: SessionManager = session_manager):
+        """
+        Initialize the streaming service
+        
+        Args:
+            sessions: Registry admitting and accounting for the sessions
+        """
+        self.sessions = sessions
     
-    async def process_stream(self, websocket: WebSocket, options: ProcessingOptions):
+    async def process_stream(self, websocket: WebSocket, options: ProcessingOptions,
+                             protocol: str = "json", keypoint_format: str = "float32",
+                             render: bool = True, keypoint_deltas: bool = False,
+                             delta_threshold: float = 1.0, adaptive_quality: bool = False,
+                             target_fps: float = 30.0, latency_budget_ms: float = 200.0):
         """
         Process a real-time video stream
         
+        With the JSON protocol, frames arrive as base64 text and each result is
+        a JSON message carrying a base64 JPEG. With the binary protocol, frames
+        arrive as raw JPEG bytes and each result is a binary packet (see
+        io.realtime_protocol), preceded by a JSON schema message. Control
+        commands are JSON text messages with both protocols.
+        
+        Frames are received by a separate task that keeps only the newest one,
+        so frames arriving faster than they are processed are dropped rather
+        than queued. Each result reports the number of dropped frames and the
+        latency from receiving the frame to sending its result.
+        
+        Sessions are admitted by the session manager, which may reject them or
+        run them with degraded options when the server is busy, and which
+        accounts for their frame rate, CPU time and memory.
+        
+        Without rendering, results carry no annotated frame, which saves the
+        drawing and JPEG encoding for clients that draw the overlay themselves.
+        With keypoint deltas, JSON results only carry the keypoints that moved
+        since they were last sent, and the names of those no longer detected.
+        
+        With adaptive quality, a quality controller lowers the inference input
+        size, the detection frequency and finally the rendering when frames
+        take longer than the target frame rate or latency budget allows, and
+        raises them again when there is headroom. The initial quality and
+        every change are sent as {"type": "quality", ...} JSON messages.
+        
         Args:
             websocket: WebSocket connection
             options: Processing options
+            protocol: Message protocol (json or binary)
+            keypoint_format: Encoding of keypoints in binary packets (float32 or int16)
+            render: Whether to send the annotated frame with each result
+            keypoint_deltas: Whether JSON results only carry changed keypoints
+            delta_threshold: Movement in pixels from which a keypoint is resent
+            adaptive_quality: Whether to adapt quality to the budgets below
+            target_fps: Frame rate to sustain with adaptive quality
+            latency_budget_ms: Latency to stay under with adaptive quality
         """
-        # Initialize video processor
-        processor = VideoProcessor(options)
-        context = FrameContext()
+        # Admit the session, possibly with degraded options
+        try:
+            session = self.sessions.open(options, protocol, render)
+        except SessionRejected as e:
+            await websocket.send_json({"error": f"Server busy: {str(e)}"})
+            await websocket.close(code=1013)
+            return
+        options = session.options
         
+        # Initialize video processor, without waiting for a pose model slot
+        try:
+            processor = await asyncio.to_thread(VideoProcessor, options, None, 0)
+        except DetectorPoolExhausted as e:
+            self.sessions.reject(session)
+            await websocket.send_json({"error": f"Server busy: {str(e)}"})
+            await websocket.close(code=1013)
+            return
+        except Exception as e:
+            self.sessions.close(session)
+            await websocket.send_json({"error": f"Error loading pose detector: {str(e)}"})
+            return
+        context = processor.create_context()
+        session.motion_gate = context.motion_gate
+        
+        packer = None
+        if protocol == "binary":
+            packer = ResultPacker(processor.keypoint_index_names, processor.angle_plan.angle_names, keypoint_format)
+            await websocket.send_json({**packer.schema(), "session": session.info()})
+        
+        controller = None
+        if adaptive_quality:
+            controller = QualityController(target_fps, latency_budget_ms, options.detection_frequency, render)
+            session.quality = controller.state()
+            await websocket.send_json(session.quality)
+        
+        sent_keypoints = {} if keypoint_deltas else None
+        latest = LatestFrame()
+        receiver = asyncio.create_task(self._receive_frames(websocket, latest))
         try:
             while True:
-                # Receive frame data
-                data = await websocket.receive_text()
-                
-                # Check if it's a control message
-                if data.startswith('{"command":'):
-                    command = json.loads(data)
-                    if command.get("command") == "stop":
-                        break
-                    continue
+                # Take the newest frame once the previous one is done
+                received = await latest.get()
+                if received is None:
+                    break
+                message, received_at = received
+                started = time.perf_counter()
+                frame_render = controller.render if controller is not None else render
                 
-                # Decode base64 image
+                # Decode and process the frame on the frame executor, so the event loop stays responsive
                 try:
-                    # Handle data URL format or pure base64
-                    if data.startswith('data:image'):
-                        base64_img = data.split(',')[1]
-                    else:
-                        base64_img = data
-                        
-                    img_bytes = base64.b64decode(base64_img)
-                    img_np = np.frombuffer(img_bytes, np.uint8)
-                    frame = cv2.imdecode(img_np, cv2.IMREAD_COLOR)
+                    (frame, static), cpu_time = await frame_executor.run(
+                        self._with_cpu_time, self._read_frame, message, context.motion_gate)
                 except Exception as e:
                     await websocket.send_json({"error": f"Failed to decode image: {str(e)}"})
                     continue
                 
-                # Process frame
-                processed_frame, frame_data, context = processor.process_frame(frame, context)
-                
-                # Convert angles and keypoints for JSON
-                angles_json = frame_data["angles"]
+                if static:
+                    # No motion since the last inferred frame: reuse its poses
+                    (frame_data, buffer), process_time = await frame_executor.run(
+                        self._with_cpu_time, self._process_frame, processor, frame, context, frame_render, True)
+                else:
+                    (frame_data, buffer), process_time = await frame_executor.run(
+                        self._with_cpu_time, self._process_frame, processor, frame, context, frame_render)
+                finished = time.perf_counter()
+                latency_ms = 1000 * (finished - received_at)
                 
-                keypoints_json = {}
-                for i, name in enumerate(processor.keypoint_names):
-                    if i < len(frame_data["keypoints"]) and not np.isnan(frame_data["keypoints"][i, 0]):
-                        keypoints_json[name] = {
-                            "x": float(frame_data["keypoints"][i, 0]),
-                            "y": float(frame_data["keypoints"][i, 1]),
-                            "score": float(frame_data["scores"][i])
-                        }
+                # Send response
+                if packer is not None:
+                    rom = context.rom
+                    await websocket.send_bytes(packer.pack(
+                        context.frame_count,
+                        frame_data["keypoints"] if len(frame_data["keypoints"]) else None,
+                        frame_data["scores"],
+                        frame_data["angles"],
+                        np.stack((rom.smoothed_min, rom.smoothed_max, rom.mean, rom.std)),
+                        buffer.tobytes() if buffer is not None else b"",
+                        dropped_frames=latest.dropped,
+                        latency_ms=latency_ms
+                    ))
+                else:
+                    result = self._json_result(processor, context, frame_data, buffer,
+                                               sent_keypoints, delta_threshold)
+                    result["dropped_frames"] = latest.dropped
+                    result["latency_ms"] = latency_ms
+                    await websocket.send_json(result)
+                session.record_frame(cpu_time + process_time, latency_ms, context.nbytes,
+                                     latest.received, latest.dropped)
                 
-                # Build ROM data
-                rom_data = {}
-                for angle_name in angles_json:
-                    if angle_name in context.running_min and angle_name in context.running_max:
-                        rom_data[angle_name] = {
-                            "min": context.running_min[angle_name],
-                            "max": context.running_max[angle_name],
-                            "range": context.running_max[angle_name] - context.running_min[angle_name]
-                        }
+                # Adapt the quality of the next frames to the time this one took
+                if controller is not None:
+                    change = controller.update(1000 * (finished - started), latency_ms)
+                    if change is not None:
+                        # The detector scales its input itself, keeping tracked boxes in frame coordinates
+                        processor.detector.set_detection_frequency(controller.detection_frequency)
+                        processor.detector.set_input_scale(controller.input_scale)
+                        session.quality = change
+                        await websocket.send_json(change)
+        
+        except Exception as e:
+            await websocket.send_json({"error": f"Error processing stream: {str(e)}"})
+        finally:
+            receiver.cancel()
+            processor.close()
+            self.sessions.close(session)
+    
+    async def _receive_frames(self, websocket: WebSocket, latest: LatestFrame):
+        """
+        Receive messages until the client stops or disconnects
+        
+        Args:
+            websocket: WebSocket connection
+            latest: Slot receiving the frame messages
+        """
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                data = message.get("text")
                 
-                # Encode processed frame
-                _, buffer = cv2.imencode('.jpg', processed_frame)
-                processed_b64 = f"data:image/jpeg;base64,{base64.b64encode(buffer).decode('utf-8')}"
+                # Check if it's a control message
+                if data is not None and data.startswith('{"command":'):
+                    command = json.loads(data)
+                    if command.get("command") == "stop":
+                        break
+                    continue
                 
-                # Send response
-                await websocket.send_json({
-                    "frame_id": context.frame_count,
-                    "processed_frame": processed_b64,
-                    "keypoints": keypoints_json,
-                    "angles": angles_json,
-                    "rom_data": rom_data
-                })
-        
+                latest.put(message)
         except Exception as e:
-            await websocket.send_json({"error": f"Error processing stream: {str(e)}"})
\ No newline at end of file
+            latest.close(e)
+        else:
+            latest.close()
+    
+    @staticmethod
+    def _with_cpu_time(func, *args) -> Tuple[Any, float]:
+        """Run a function and also return the CPU seconds its thread spent on it"""
+        start = time.thread_time()
+        result = func(*args)
+        return result, time.thread_time() - start
+    
+    @staticmethod
+    def _decode_frame(message: Dict[str, Any]) -> np.ndarray:
+        """
+        Decode a frame message holding raw JPEG bytes or a base64 image
+        
+        Args:
+            message: Received WebSocket message
+            
+        Returns:
+            np.ndarray: Decoded frame
+        """
+        data = message.get("text")
+        if data is None:
+            img_bytes = message["bytes"]
+        elif data.startswith('data:image'):
+            # Handle data URL format or pure base64
+            img_bytes = base64.b64decode(data.split(',')[1])
+        else:
+            img_bytes = base64.b64decode(data)
+        frame = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("not a valid image")
+        return frame
+    
+    @staticmethod
+    def _read_frame(message: Dict[str, Any], motion_gate: Optional[MotionGate] = None) -> Tuple[np.ndarray, bool]:
+        """Decode a frame and check whether it changed since the last inferred frame"""
+        frame = StreamingService._decode_frame(message)
+        return frame, motion_gate is not None and motion_gate.is_static(frame)
+    
+    @staticmethod
+    def _process_frame(processor: VideoProcessor, frame: np.ndarray, context: FrameContext,
+                       render: bool = True, static: bool = False) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+        """
+        Process a frame and encode the annotated result
+        
+        Args:
+            processor: Session's video processor
+            frame: Decoded frame
+            context: Session's frame context
+            render: Whether to draw and encode the annotated frame
+            static: Reuse the poses of the context's motion gate instead of detecting
+            
+        Returns:
+            Tuple[Dict[str, Any], Optional[np.ndarray]]: (result_data, encoded
+                processed frame or None without rendering)
+        """
+        if static:
+            keypoints, scores = context.motion_gate.detections
+        else:
+            keypoints, scores = processor.detector.detect_pose(frame)
+            if context.motion_gate is not None:
+                context.motion_gate.update(keypoints, scores)
+        processed_frame, frame_data, _ = processor.process_detections(frame, keypoints, scores, context, render)
+        if not render:
+            return frame_data, None
+        _, buffer = cv2.imencode('.jpg', processed_frame)
+        return frame_data, buffer
+    
+    @staticmethod
+    def _json_result(processor: VideoProcessor, context: FrameContext,
+                     frame_data: Dict[str, Any], buffer: Optional[np.ndarray],
+                     sent_keypoints: Optional[Dict[str, Dict[str, float]]] = None,
+                     delta_threshold: float = 1.0) -> Dict[str, Any]:
+        """
+        Build the JSON result message of a frame
+        
+        Args:
+            processor: Session's video processor
+            context: Session's frame context
+            frame_data: Result data from process_detections
+            buffer: Encoded processed frame, or None to send no frame
+            sent_keypoints: Keypoints as last sent to the client, updated in
+                place; if given, only keypoint changes are sent
+            delta_threshold: Movement in pixels from which a keypoint is resent
+            
+        Returns:
+            Dict[str, Any]: Result message
+        """
+        # Convert angles and keypoints for JSON
+        angles_json = frame_data["angles"]
+        
+        keypoints_json = {}
+        for i, name in enumerate(processor.keypoint_index_names):
+            if i < len(frame_data["keypoints"]) and not np.isnan(frame_data["keypoints"][i, 0]):
+                keypoints_json[name] = {
+                    "x": float(frame_data["keypoints"][i, 0]),
+                    "y": float(frame_data["keypoints"][i, 1]),
+                    "score": float(frame_data["scores"][i])
+                }
+        
+        # Build ROM data from the session's running statistics, as in ROM reports
+        rom_data = {}
+        rom = context.rom
+        for i, angle_name in enumerate(rom.angle_names):
+            if angle_name in angles_json and rom.smoothed_min[i] == rom.smoothed_min[i]:
+                rom_data[angle_name] = {
+                    "min": float(rom.smoothed_min[i]),
+                    "max": float(rom.smoothed_max[i]),
+                    "range": float(rom.rom[i]),
+                    "mean": json_float(rom.mean[i]),
+                    "std": json_float(rom.std[i])
+                }
+        
+        result = {
+            "frame_id": context.frame_count,
+            "keypoints": keypoints_json,
+            "angles": angles_json,
+            "rom_data": rom_data
+        }
+        
+        # Only send the keypoints that moved or disappeared since they were last sent
+        if sent_keypoints is not None:
+            changed = {}
+            for name, keypoint in keypoints_json.items():
+                last = sent_keypoints.get(name)
+                if (last is None or abs(keypoint["x"] - last["x"]) >= delta_threshold
+                        or abs(keypoint["y"] - last["y"]) >= delta_threshold):
+                    changed[name] = keypoint
+            removed = [name for name in sent_keypoints if name not in keypoints_json]
+            for name in removed:
+                del sent_keypoints[name]
+            sent_keypoints.update(changed)
+            result["keypoints"] = changed
+            result["removed_keypoints"] = removed
+        
+        if buffer is not None:
+            result["processed_frame"] = f"data:image/jpeg;base64,{base64.b64encode(buffer).decode('utf-8')}"
+        return result
@@ -2,41 +2,61 @@
 Video processing service using PhysioTrack
 """
 import os
-import json
+import shutil
 import asyncio
 import logging
+import tempfile
 import traceback
+import multiprocessing
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 import cv2
 import physiotrack
-from typing import Dict, List, Tuple, Any, Optional
+from typing import Callable, Dict, List, Tuple, Any, Optional
 
 from ..models.data import ProcessingOptions, FrameContext
-from ..models.response import KeypointData
+from ..io.video import read_frames, concat_videos, ThreadedFrameReader, ThreadedFrameWriter
+from ..io.keypoint_store import KeypointStore, KeypointStoreWriter
+from ..io.mot import TrackMotWriter
+from .detector_pool import detector_pool
+from .storage_service import write_json
+from .analysis_service import IncrementalROM
+from ..processors.filtering import CausalFilter
+from ..processors.motion_gate import MotionGate
 
 logger = logging.getLogger(__name__)
 
 class VideoProcessor:
     """Processes videos using PhysioTrack detector"""
     
-    def __init__(self, options: ProcessingOptions):
-        """Initialize with processing options"""
+    def __init__(self, options: ProcessingOptions, detector: Optional[physiotrack.PoseDetector] = None,
+                 checkout_timeout: Optional[float] = None):
+        """
+        Initialize with processing options
+        
+        Args:
+            options: Processing options
+            detector: Pose detector to use; by default one is checked out of the
+                shared detector pool and returned by close()
+            checkout_timeout: Seconds to wait for the pool to load the pose models
+                (defaults to the pool's checkout timeout)
+        """
         self.options = options
         
-        # Initialize the pose detector
-        self.detector = physiotrack.PoseDetector(
-            model_type=options.model_type,
-            detection_frequency=options.detection_frequency,
-            tracking_mode=options.tracking_mode,
-            device=options.device,
-            backend=options.backend
-        )
+        # Get a warm pose detector from the pool
+        self._pooled_detector = detector is None
+        self.detector = detector or detector_pool.checkout(**options.detector_options(), timeout=checkout_timeout)
         
         # Get keypoint names and IDs
         self.keypoint_names = self.detector.get_keypoint_names()
         self.keypoint_ids = self.detector.get_keypoint_ids()
         
+        # Keypoint names in keypoint index order, the order of detected keypoint rows
+        self.keypoint_index_names = [f"keypoint_{i}" for i in range(max(self.keypoint_ids, default=-1) + 1)]
+        for name, keypoint_id in zip(self.keypoint_names, self.keypoint_ids):
+            self.keypoint_index_names[keypoint_id] = name
+        
         # Set up angle names
         self.joint_angles = options.joint_angles or [
             'right knee', 'left knee', 'right hip', 'left hip', 
@@ -46,8 +66,54 @@ class VideoProcessor:
             'right thigh', 'left thigh', 'trunk'
         ]
         self.angle_names = self.joint_angles + self.segment_angles
+        self.angle_names += [name for name in options.custom_angles if name not in self.angle_names]
+        
+        # Compile the angle plan once for this skeleton and angle set
+        self.angle_plan = self.detector.get_angle_plan(self.angle_names, options.custom_angles)
+    
+    def close(self):
+        """Return the pose detector to the pool"""
+        if self._pooled_detector and self.detector is not None:
+            detector_pool.checkin(self.detector)
+            self.detector = None
+    
+    def create_context(self, fps: Optional[float] = None) -> FrameContext:
+        """
+        Create a frame context with one history column and running ROM statistics per angle
+        
+        Args:
+            fps: Frame rate of the processed frames (default: options.filter_fps)
+            
+        Returns:
+            FrameContext: New frame context
+        """
+        fps = fps or self.options.filter_fps
+        angle_filter = None
+        if self.options.filter_type != "none":
+            angle_filter = CausalFilter(self.options.filter_type, fps=fps,
+                                        order=self.options.filter_order, cutoff=self.options.filter_cutoff)
+        motion_gate = None
+        if self.options.motion_gating:
+            motion_gate = MotionGate(self.options.motion_threshold, max_skipped=self.options.motion_max_skipped)
+        return FrameContext(self.options.history_length, self.angle_plan.angle_names,
+                            rom=IncrementalROM.for_time_window(self.angle_plan.angle_names,
+                                                               self.options.rom_time_window,
+                                                               1 / fps),
+                            angle_filter=angle_filter, motion_gate=motion_gate)
+    
+    def create_track_manager(self) -> physiotrack.TrackManager:
+        """Create a track manager configured from the processing options"""
+        return physiotrack.TrackManager(
+            keypoint_threshold=self.options.keypoint_threshold,
+            average_likelihood_threshold=self.options.average_likelihood_threshold,
+            keypoint_number_threshold=self.options.keypoint_number_threshold,
+            max_distance=self.options.tracking_max_distance,
+            max_relative_distance=self.options.tracking_max_relative_distance,
+            max_lost=self.options.tracking_max_lost_frames,
+            max_lost_tracks=self.options.tracking_max_lost_tracks
+        )
     
-    async def process_video(self, video_path: str, output_dir: str) -> Dict[str, Any]:
+    def process_video(self, video_path: str, output_dir: str) -> Dict[str, Any]:
         """
         Process a video file and save results
         
@@ -60,11 +126,10 @@ class VideoProcessor:
         """
         # Create status file
         status_file = Path(output_dir) / "status.json"
-        with open(status_file, "w") as f:
-            json.dump({
-                "status": "processing",
-                "message": "Starting video processing"
-            }, f)
+        write_json(str(status_file), {
+            "status": "processing",
+            "message": "Starting video processing"
+        })
         
         try:
             # Open video
@@ -82,70 +147,70 @@ class VideoProcessor:
             assessment_id = Path(output_dir).name
             output_video_path = Path(output_dir) / f"{assessment_id}.mp4"
             
-            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out_vid = cv2.VideoWriter(str(output_video_path), fourcc, fps, (width, height))
-            
-            # Process frames
-            all_keypoints = []
-            all_scores = []
-            all_angles = []
-            frame_times = []
-            context = FrameContext()
-            
-            # Process each frame
-            frame_idx = 0
-            while cap.isOpened():
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # Calculate timestamp
-                timestamp = frame_idx / fps
-                frame_times.append(timestamp)
-                
-                # Process frame
-                processed_frame, frame_data, context = self.process_frame(frame, context)
-                
-                # Save processed frame
-                if self.options.save_processed_video:
-                    out_vid.write(processed_frame)
-                
-                # Store data
-                all_keypoints.append(frame_data['keypoints'])
-                all_scores.append(frame_data['scores'])
-                all_angles.append(frame_data['angles'])
+            # Keypoints and scores are streamed to a columnar store
+            store_path = Path(output_dir) / f"{assessment_id}_keypoints"
+            
+            # Angles are streamed to one MOT file per tracked person
+            mot_writer = TrackMotWriter(output_dir, assessment_id, self.angle_plan.resolved_names, fps,
+                                        columns=self.angle_plan.resolved)
+            
+            segments = self.plan_segments(frame_count)
+            if len(segments) > 1:
+                # Process time segments in parallel and stitch them
+                cap.release()
+                stream = self._process_segments(video_path, segments, output_video_path,
+                                                fps, (width, height), status_file,
+                                                store_path if self.options.save_keypoints else None)
+                for track_ids, track_angles in zip(stream['track_ids'], stream['track_angles']):
+                    mot_writer.write_frame(track_ids, track_angles)
+            else:
+                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+                out_vid = cv2.VideoWriter(str(output_video_path), fourcc, fps, (width, height))
                 
-                # Update progress
-                if frame_idx % 10 == 0:
-                    with open(status_file, "w") as f:
-                        json.dump({
+                def on_frame(frame_idx: int):
+                    # Update progress
+                    if frame_idx % 10 == 0:
+                        write_json(str(status_file), {
                             "status": "processing",
                             "message": f"Processing frame {frame_idx}/{frame_count}",
-                            "progress": frame_idx / frame_count
-                        }, f)
+                            "progress": frame_idx / max(frame_count, 1)
+                        })
                 
-                frame_idx += 1
+                store = self.create_keypoint_store(str(store_path), fps) if self.options.save_keypoints else None
+                try:
+                    stream = self.process_stream(cap, out_vid, on_frame=on_frame, store=store,
+                                                 mot_writer=mot_writer)
+                finally:
+                    # Clean up
+                    cap.release()
+                    out_vid.release()
+                    if store is not None:
+                        store.close()
             
-            # Clean up
-            cap.release()
-            out_vid.release()
-            
-            # Save angle data
-            angles_file = Path(output_dir) / f"{assessment_id}_angles_person00.mot"
-            self._save_angles_to_mot(all_angles, frame_times, angles_file)
+            # Finish the angle files, one per tracked person; the ROM
+            # analysis is run on the primary track's file
+            primary = physiotrack.primary_track(mot_writer.frame_counts) or 0
+            angles_files = mot_writer.close()
             
             # Update status
-            with open(status_file, "w") as f:
-                json.dump({
-                    "status": "complete",
-                    "message": "Video processing complete"
-                }, f)
+            write_json(str(status_file), {
+                "status": "complete",
+                "message": "Video processing complete",
+                "primary_track": primary
+            })
             
             return {
                 "status": "complete",
                 "message": "Video processing complete",
                 "video_path": str(output_video_path),
-                "angles_file": str(angles_file)
+                "primary_track": primary,
+                "angles_file": str(mot_writer.path_for(primary)),
+                "angles_files": [str(f) for f in angles_files],
+                "keypoints_store": str(store_path) if self.options.save_keypoints else None,
+                "running_min": stream['running_min'],
+                "running_max": stream['running_max'],
+                "motion_gate": stream['motion_gate'],
+                "segments": len(segments)
             }
             
         except Exception as e:
@@ -153,83 +218,382 @@ class VideoProcessor:
             logger.error(traceback.format_exc())
             
             # Update status with error
-            with open(status_file, "w") as f:
-                json.dump({
-                    "status": "error",
-                    "message": f"Error processing video: {str(e)}"
-                }, f)
+            write_json(str(status_file), {
+                "status": "error",
+                "message": f"Error processing video: {str(e)}"
+            })
             
             return {
                 "status": "error",
                 "message": f"Error processing video: {str(e)}"
             }
     
-    def process_frame(self, frame: np.ndarray, context: Optional[FrameContext] = None) -> Tuple[np.ndarray, Dict, FrameContext]:
+    def process_stream(self, cap: cv2.VideoCapture, out_vid: Optional[cv2.VideoWriter] = None,
+                       max_frames: Optional[int] = None, warmup: int = 0,
+                       on_frame: Optional[Callable[[int], None]] = None,
+                       store: Optional[KeypointStoreWriter] = None,
+                       mot_writer: Optional[TrackMotWriter] = None) -> Dict[str, Any]:
+        """
+        Process the frames of an opened video capture
+        
+        Args:
+            cap: Opened video capture, positioned at the first frame to process
+            out_vid: Writer for the processed video
+            max_frames: Maximum number of frames to keep (default: until the end)
+            warmup: Frames to process before the kept frames, to warm up tracking;
+                they are neither saved nor returned
+            on_frame: Called with the index of every kept frame once processed
+            store: Keypoint store receiving the tracked persons of every kept frame
+            mot_writer: MOT files receiving the angles of every kept frame; the
+                track IDs and angles are then not collected in memory
+            
+        Returns:
+            Dict: Number of kept frames, track IDs and angles of every kept frame
+                (empty when streamed to mot_writer), positions of the tracks in
+                the last warm-up frame ('boundary') and in the last frame ('last'),
+                the running ROM range and the motion gate's inference counts
+        """
+        # Filter and time the angles at the video's own frame rate
+        context = self.create_context(cap.get(cv2.CAP_PROP_FPS))
+        gate = context.motion_gate
+        all_track_ids = []
+        all_track_angles = []
+        boundary = last = None
+        
+        # Decode, infer and render/encode in separate threads when pipelined
+        total_frames = None if max_frames is None else warmup + max_frames
+        save = out_vid is not None and self.options.save_processed_video
+        if self.options.pipelined:
+            frames = ThreadedFrameReader(cap, self.options.pipeline_queue_size, total_frames)
+            writer = ThreadedFrameWriter(out_vid, self.render_frame, self.options.pipeline_queue_size) if save else None
+        else:
+            frames = read_frames(cap, total_frames)
+            writer = None
+        
+        frame_idx = 0
+        
+        def keep(frame: np.ndarray, frame_data: Dict):
+            """Save and store a processed frame, in frame order"""
+            nonlocal frame_idx, boundary, last
+            if frame_idx < warmup:
+                if frame_idx == warmup - 1:
+                    boundary = self._track_positions(frame_data)
+                frame_idx += 1
+                return
+            
+            # Save processed frame
+            if save:
+                if writer is not None:
+                    writer.write(frame, frame_data)
+                else:
+                    out_vid.write(self.render_frame(frame, frame_data))
+            
+            # Store data
+            last = frame_data
+            if store is not None:
+                store.append(frame_idx - warmup, frame_data['track_ids'],
+                             frame_data['track_keypoints'], frame_data['track_scores'])
+            if mot_writer is not None:
+                mot_writer.write_frame(frame_data['track_ids'], frame_data['track_angles'])
+            else:
+                all_track_ids.append(frame_data['track_ids'])
+                all_track_angles.append(frame_data['track_angles'])
+            
+            if on_frame is not None:
+                on_frame(frame_idx - warmup)
+            frame_idx += 1
+        
+        # Process each frame, rendering only what gets saved
+        skipped = []
+        try:
+            for frame in frames:
+                if gate is None:
+                    _, frame_data, context = self.process_frame(frame, context, render=False)
+                    keep(frame, frame_data)
+                elif gate.is_static(frame):
+                    # Hold static frames until the next inferred frame to interpolate their poses
+                    skipped.append(frame)
+                else:
+                    keypoints, scores = self.detector.detect_pose(frame)
+                    for skipped_frame, detections in zip(skipped, gate.interpolate(keypoints, scores, len(skipped))):
+                        _, frame_data, context = self.process_detections(skipped_frame, *detections, context, render=False)
+                        keep(skipped_frame, frame_data)
+                    skipped = []
+                    gate.update(keypoints, scores)
+                    _, frame_data, context = self.process_detections(frame, keypoints, scores, context, render=False)
+                    keep(frame, frame_data)
+            
+            # Static frames at the end keep the last inferred poses
+            for skipped_frame in skipped:
+                _, frame_data, context = self.process_detections(skipped_frame, *gate.detections, context, render=False)
+                keep(skipped_frame, frame_data)
+        finally:
+            if writer is not None:
+                writer.close()
+            if self.options.pipelined:
+                frames.close()
+        
+        # Count trailing frames without any person
+        n_frames = max(frame_idx - warmup, 0)
+        if store is not None:
+            store.n_frames = max(store.n_frames, n_frames)
+        
+        return {
+            'n_frames': n_frames,
+            'track_ids': all_track_ids,
+            'track_angles': all_track_angles,
+            'boundary': boundary,
+            'last': self._track_positions(last) if last is not None else None,
+            'running_min': context.running_min,
+            'running_max': context.running_max,
+            'motion_gate': gate.stats() if gate is not None else None
+        }
+    
+    def plan_segments(self, frame_count: int) -> List[Tuple[int, Optional[int]]]:
+        """
+        Split a video into time segments for parallel processing
+        
+        Segments start on detection frames, so that each segment sees the same
+        person detections as a sequential run.
+        
+        Args:
+            frame_count: Number of frames in the video
+            
+        Returns:
+            List[Tuple[int, Optional[int]]]: (first frame, number of frames) of each
+                segment; the last segment runs until the end of the video
+        """
+        n_segments = min(self.options.segment_workers,
+                         frame_count // max(self.options.segment_min_frames, 1))
+        if n_segments <= 1:
+            return [(0, None)]
+        
+        step = max(self.options.detection_frequency, 1)
+        length = int(np.ceil(frame_count / n_segments / step)) * step
+        starts = list(range(0, frame_count, length))
+        return [(start, length) for start in starts[:-1]] + [(starts[-1], None)]
+    
+    def _process_segments(self, video_path: str, segments: List[Tuple[int, Optional[int]]],
+                          output_video_path: Path, fps: float, size: Tuple[int, int],
+                          status_file: Path, store_path: Optional[Path] = None) -> Dict[str, Any]:
+        """
+        Process video segments in worker processes and stitch the results
+        
+        Args:
+            video_path: Path to the video file
+            segments: Segments from plan_segments()
+            output_video_path: Path of the processed video
+            fps: Frame rate of the video
+            size: Frame size (width, height)
+            status_file: Status file to report progress to
+            store_path: Keypoint store to write, if any
+            
+        Returns:
+            Dict: Stitched results, as returned by process_stream()
+        """
+        warmup = max(self.options.detection_frequency, 1)
+        segment_dir = Path(tempfile.mkdtemp(prefix=".segments", dir=output_video_path.parent))
+        segment_videos = [str(segment_dir / f"segment{i:02d}.mp4") for i in range(len(segments))]
+        segment_stores = [str(segment_dir / f"keypoints{i:02d}") if store_path is not None else None
+                          for i in range(len(segments))]
+        try:
+            results = [None] * len(segments)
+            with ProcessPoolExecutor(max_workers=len(segments),
+                                     mp_context=multiprocessing.get_context("spawn")) as executor:
+                futures = {
+                    executor.submit(process_video_segment, self.options.dict(), video_path, start,
+                                    n_frames, warmup if start > 0 else 0, segment_videos[i], segment_stores[i]): i
+                    for i, (start, n_frames) in enumerate(segments)
+                }
+                for n_done, future in enumerate(as_completed(futures), start=1):
+                    results[futures[future]] = future.result()
+                    write_json(str(status_file), {
+                        "status": "processing",
+                        "message": f"Processed segment {n_done}/{len(segments)}",
+                        "progress": n_done / len(segments)
+                    })
+            
+            concat_videos(segment_videos if self.options.save_processed_video else [],
+                          str(output_video_path), fps, size)
+            
+            stream = self.stitch_segments(results)
+            
+            # Join the segment stores with global frame and track IDs
+            if store_path is not None:
+                with self.create_keypoint_store(str(store_path), fps) as store:
+                    for (start, _), segment_store, id_map in zip(segments, segment_stores, stream['id_maps']):
+                        self._copy_keypoint_store(KeypointStore(segment_store), store, start, id_map)
+                    store.n_frames = len(stream['track_ids'])
+        finally:
+            shutil.rmtree(segment_dir, ignore_errors=True)
+        
+        return stream
+    
+    def stitch_segments(self, segments: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Join the results of consecutive segments
+        
+        Tracks are matched across each boundary by optimal assignment between
+        the last frame of a segment and the same frame processed as warm-up by
+        the next segment; unmatched tracks get new IDs in order of appearance.
+        
+        Args:
+            segments: Results of process_stream() for each segment, in order
+            
+        Returns:
+            Dict: Results of the whole video with global track IDs, and the
+                local to global track ID map of each segment ('id_maps')
+        """
+        all_track_ids, all_track_angles, id_maps = [], [], []
+        running_min, running_max = {}, {}
+        next_id = 0
+        previous = None
+        
+        for segment in segments:
+            # Continue tracks matched at the boundary
+            id_map = {}
+            if previous is not None and segment['boundary'] is not None:
+                prev_ids, prev_positions = previous
+                ids, positions = segment['boundary']
+                if len(prev_ids) and len(ids):
+                    rows, cols, _ = physiotrack.associate_people(prev_positions, positions,
+                                                                 self.options.tracking_max_distance,
+                                                                 self.options.tracking_max_relative_distance)
+                    for row, col in zip(rows, cols):
+                        id_map[ids[col]] = prev_ids[row]
+            
+            # Number the remaining tracks in order of appearance
+            for local_id in sorted(set().union(*map(set, segment['track_ids']))):
+                if local_id not in id_map:
+                    id_map[local_id] = next_id
+                    next_id += 1
+            
+            id_maps.append(id_map)
+            for ids, angles in zip(segment['track_ids'], segment['track_angles']):
+                all_track_ids.append([id_map[local_id] for local_id in ids])
+                all_track_angles.append(angles)
+            
+            for angle_name, angle_value in segment['running_min'].items():
+                running_min[angle_name] = min(running_min.get(angle_name, angle_value), angle_value)
+            for angle_name, angle_value in segment['running_max'].items():
+                running_max[angle_name] = max(running_max.get(angle_name, angle_value), angle_value)
+            
+            if segment['last'] is not None:
+                ids, positions = segment['last']
+                previous = ([id_map[local_id] for local_id in ids], positions)
+        
+        motion_gate = None
+        gate_stats = [segment['motion_gate'] for segment in segments if segment.get('motion_gate')]
+        if gate_stats:
+            frames = sum(stats['frames'] for stats in gate_stats)
+            inferred = sum(stats['inferred'] for stats in gate_stats)
+            motion_gate = {"frames": frames, "inferred": inferred, "skipped": frames - inferred,
+                           "saved": (frames - inferred) / frames if frames else 0.0}
+        
+        return {
+            'track_ids': all_track_ids,
+            'track_angles': all_track_angles,
+            'boundary': segments[0]['boundary'] if segments else None,
+            'last': previous,
+            'running_min': running_min,
+            'running_max': running_max,
+            'motion_gate': motion_gate,
+            'id_maps': id_maps
+        }
+    
+    def create_keypoint_store(self, path: str, fps: float) -> KeypointStoreWriter:
+        """Create a keypoint store for this processor's skeleton"""
+        return KeypointStoreWriter(path, self.keypoint_names, fps, metadata={
+            "model_type": self.options.model_type,
+            "keypoint_ids": [int(i) for i in self.keypoint_ids]
+        })
+    
+    def _copy_keypoint_store(self, source: KeypointStore, target: KeypointStoreWriter,
+                             frame_offset: int, id_map: Dict[int, int], chunk_size: int = 65536):
+        """Append a segment store to the video store, in chunks"""
+        lookup = np.zeros(max(id_map, default=-1) + 1, dtype=np.int32)
+        for local_id, global_id in id_map.items():
+            lookup[local_id] = global_id
+        for start in range(0, len(source), chunk_size):
+            end = min(start + chunk_size, len(source))
+            target.extend(source.frame_ids[start:end] + frame_offset,
+                          lookup[source.track_ids[start:end]],
+                          source.keypoints[start:end],
+                          source.scores[start:end])
+    
+    def _track_positions(self, frame_data: Dict) -> Tuple[List[int], np.ndarray]:
+        """Track IDs and keypoint positions of a frame, hiding low-confidence keypoints"""
+        keypoints = frame_data['track_keypoints']
+        confident = frame_data['track_scores'] >= self.options.keypoint_threshold
+        return list(frame_data['track_ids']), np.where(confident[..., np.newaxis], keypoints[..., :2], np.nan)
+    
+    def process_frame(self, frame: np.ndarray, context: Optional[FrameContext] = None,
+                      render: bool = True) -> Tuple[np.ndarray, Dict, FrameContext]:
         """
         Process a single frame
         
         Args:
             frame: Input video frame
             context: Optional context from previous frames
+            render: Whether to draw the results (otherwise the input frame is returned)
+            
+        Returns:
+            Tuple[np.ndarray, Dict, FrameContext]: (processed_frame, result_data, updated_context)
+        """
+        # Detect pose, or carry the last poses forward on frames without motion
+        gate = context.motion_gate if context is not None else None
+        if gate is not None and gate.is_static(frame):
+            keypoints, scores = gate.detections
+        else:
+            keypoints, scores = self.detector.detect_pose(frame)
+            if gate is not None:
+                gate.update(keypoints, scores)
+        
+        return self.process_detections(frame, keypoints, scores, context, render)
+    
+    def process_detections(self, frame: np.ndarray, keypoints: np.ndarray, scores: np.ndarray,
+                           context: Optional[FrameContext] = None,
+                           render: bool = True) -> Tuple[np.ndarray, Dict, FrameContext]:
+        """
+        Process the pose detections of a single frame
+        
+        Args:
+            frame: Input video frame
+            keypoints: Detected keypoints [P, K, 2]
+            scores: Keypoint confidence scores [P, K]
+            context: Optional context from previous frames
+            render: Whether to draw the results (otherwise the input frame is returned)
             
         Returns:
             Tuple[np.ndarray, Dict, FrameContext]: (processed_frame, result_data, updated_context)
         """
         # Initialize context if not provided
         if context is None:
-            context = FrameContext()
-        
-        # Detect pose
-        keypoints, scores = self.detector.detect_pose(frame)
-        
-        # Track persons across frames
-        if context.prev_keypoints is not None and len(keypoints) > 0:
-            keypoints, scores = physiotrack.sort_people_physiotrack(
-                context.prev_keypoints, keypoints, scores)
-        
-        # Store for next frame
-        context.prev_keypoints = keypoints
-        
-        # For simplicity, we'll process only the first person
-        if len(keypoints) > 0:
-            person_keypoints = keypoints[0]
-            person_scores = scores[0]
-            
-            # Calculate angles
-            person_angles = physiotrack.calculate_angles(
-                person_keypoints, 
-                person_scores, 
-                self.angle_names,
-                self.keypoint_names,
-                self.keypoint_ids,
-                self.options.keypoint_threshold
-            )
-            
-            # Create simplified keypoints dict for output
-            keypoints_dict = {}
-            for i, name in enumerate(self.keypoint_names):
-                if i < len(person_keypoints) and not np.isnan(person_keypoints[i, 0]):
-                    keypoints_dict[name] = KeypointData(
-                        x=float(person_keypoints[i, 0]),
-                        y=float(person_keypoints[i, 1]),
-                        score=float(person_scores[i])
-                    )
-            
-            # Store for context
-            context.angles_history.append(person_angles)
-            context.keypoints_history.append(keypoints_dict)
-            
-            # Update running min/max for ROM calculation
-            for angle_name, angle_value in person_angles.items():
-                if angle_name not in context.running_min:
-                    context.running_min[angle_name] = angle_value
-                    context.running_max[angle_name] = angle_value
-                else:
-                    context.running_min[angle_name] = min(context.running_min[angle_name], angle_value)
-                    context.running_max[angle_name] = max(context.running_max[angle_name], angle_value)
+            context = self.create_context()
+        
+        # Track persons across frames, dropping weak detections
+        if context.track_manager is None:
+            context.track_manager = self.create_track_manager()
+        track_ids, keypoints, scores = context.track_manager.update(keypoints, scores)
+        
+        # Calculate angles for every tracked person in one pass
+        track_angles = self.angle_plan.compute(keypoints, scores, self.options.keypoint_threshold)
+        
+        # The primary track (seen in the most frames) is reported in the per-frame output
+        primary = track_ids.index(context.track_manager.primary_id) if len(track_ids) > 0 else None
+        
+        # Smooth the reported person's angles over time when filtering is enabled
+        angles = track_angles[primary] if primary is not None else np.full(len(self.angle_plan.angle_names), np.nan)
+        if context.angle_filter is not None:
+            angles = context.angle_filter.update(angles)
+        
+        if primary is not None:
+            person_keypoints = keypoints[primary]
+            person_scores = scores[primary]
+            person_angles = self.angle_plan.to_dict(angles, n_keypoints=keypoints.shape[1])
             
-            # Draw visualization
-            processed_frame = self._visualize_frame(frame, person_keypoints, person_scores, person_angles)
+            # Store for context and update running min/max for ROM calculation
+            context.push(person_keypoints, person_scores, angles)
             
             result_data = {
                 'keypoints': person_keypoints,
@@ -238,18 +602,48 @@ class VideoProcessor:
             }
         else:
             # No person detected
-            processed_frame = frame.copy()
             result_data = {
                 'keypoints': np.array([]),
                 'scores': np.array([]),
                 'angles': {}
             }
+        result_data.update({
+            'primary': primary,
+            'track_ids': track_ids,
+            'track_keypoints': keypoints,
+            'track_scores': scores,
+            'track_angles': track_angles
+        })
         
         # Update context
         context.frame_count += 1
         
+        processed_frame = self.render_frame(frame, result_data) if render else frame
         return processed_frame, result_data, context
     
+    def render_frame(self, frame: np.ndarray, frame_data: Dict) -> np.ndarray:
+        """
+        Draw every tracked person of a processed frame
+        
+        Args:
+            frame: Original frame
+            frame_data: Result data from process_frame
+            
+        Returns:
+            np.ndarray: Visualized frame
+        """
+        if len(frame_data['track_ids']) == 0:
+            return frame.copy()
+        
+        keypoints = frame_data['track_keypoints']
+        processed_frame = frame
+        for i in range(len(frame_data['track_ids'])):
+            angles = frame_data['angles'] if i == frame_data.get('primary') else self.angle_plan.to_dict(
+                frame_data['track_angles'][i], n_keypoints=keypoints.shape[1])
+            processed_frame = self._visualize_frame(processed_frame, keypoints[i],
+                                                    frame_data['track_scores'][i], angles)
+        return processed_frame
+    
     def _visualize_frame(self, frame: np.ndarray, keypoints: np.ndarray, scores: np.ndarray, angles: Dict[str, float]) -> np.ndarray:
         """
         Visualize detection and angles on frame
@@ -275,45 +669,44 @@ class VideoProcessor:
         vis_frame = draw_angles_on_frame(vis_frame, keypoints, angles, self.keypoint_names, self.keypoint_ids)
         
         return vis_frame
+
+def process_video_segment(options: Dict[str, Any], video_path: str, start: int,
+                          n_frames: Optional[int], warmup: int, output_video: str,
+                          store_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Process one time segment of a video (runs in a worker process)
     
-    def _save_angles_to_mot(self, all_angles: List[Dict[str, float]], frame_times: List[float], output_file: Path):
-        """
-        Save angles to MOT file
+    Args:
+        options: Video processing options
+        video_path: Path to the video file
+        start: First frame of the segment
+        n_frames: Number of frames in the segment (None: until the end)
+        warmup: Frames before the segment to process first, to warm up tracking
+        output_video: Path of the processed video of the segment
+        store_path: Keypoint store of the segment, with frame IDs relative to its start
         
-        Args:
-            all_angles: List of angle dictionaries
-            frame_times: List of frame timestamps
-            output_file: Path to save the MOT file
-        """
-        import pandas as pd
-        
-        # Collect all angle names
-        all_angle_names = set()
-        for angles in all_angles:
-            all_angle_names.update(angles.keys())
-        
-        # Create DataFrame
-        data = {"time": frame_times}
-        
-        for angle_name in all_angle_names:
-            data[angle_name] = [angles.get(angle_name, float('nan')) for angles in all_angles]
-        
-        df = pd.DataFrame(data)
-        
-        # Write MOT header
-        header = [
-            'Coordinates',
-            'version=1',
-            f'nRows={len(df)}',
-            f'nColumns={len(all_angle_names) + 1}',
-            'inDegrees=yes',
-            '',
-            'Units are S.I. units (second, meters, Newtons, ...)',
-            "If the header above contains a line with 'inDegrees', this indicates whether rotational values are in degrees (yes) or radians (no).",
-            '',
-            'endheader',
-        ]
-        
-        with open(output_file, 'w') as f:
-            f.write('\n'.join(header) + '\n')
-            df.to_csv(f, sep='\t', index=False)
\ No newline at end of file
+    Returns:
+        Dict: Results of VideoProcessor.process_stream()
+    """
+    processor = VideoProcessor(ProcessingOptions(**options))
+    cap = cv2.VideoCapture(video_path)
+    out_vid = None
+    store = None
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video: {video_path}")
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start - warmup)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        if processor.options.save_processed_video:
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            out_vid = cv2.VideoWriter(output_video, cv2.VideoWriter_fourcc(*'mp4v'), fps, size)
+        if store_path is not None:
+            store = processor.create_keypoint_store(store_path, fps)
+        return processor.process_stream(cap, out_vid, max_frames=n_frames, warmup=warmup, store=store)
+    finally:
+        cap.release()
+        if out_vid is not None:
+            out_vid.release()
+        if store is not None:
+            store.close()
+        processor.close()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Benchmark inference input scaling and ROI cropping
+
+Runs pose inference on the frames of a video at full resolution and with
+the input downscaled to several short sides, each with and without
+cropping to the region around the persons of the previous frame. Reports
+inference time per frame, and the keypoint and angle error of the first
+person against the full resolution run.
+
+Usage:
+    python scripts/benchmark_input_scaling.py path/to/video.mp4 [--short-sides 720 480 360]
+"""
+import os
+import sys
+import time
+import argparse
+
+# Add the project roots to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(project_root))
+
+import cv2
+import numpy as np
+
+from app.models.data import ProcessingOptions
+from app.services.video_service import VideoProcessor
+
+def run_config(options: ProcessingOptions, frames: list) -> tuple:
+    """
+    Detect poses in every frame and compute the first person's angles
+
+    Returns:
+        tuple: (seconds per frame, keypoints [F, K, 2], scores [F, K], angles [F, A])
+    """
+    processor = VideoProcessor(options)
+    try:
+        n_keypoints = len(processor.keypoint_ids) or len(processor.keypoint_names)
+        keypoints = np.full((len(frames), n_keypoints, 2), np.nan)
+        scores = np.zeros((len(frames), n_keypoints))
+        elapsed = 0.0
+        for i, frame in enumerate(frames):
+            start = time.perf_counter()
+            frame_keypoints, frame_scores = processor.detector.detect_pose(frame)
+            elapsed += time.perf_counter() - start
+            if len(frame_keypoints):
+                keypoints[i] = np.asarray(frame_keypoints)[0, :n_keypoints, :2]
+                scores[i] = np.asarray(frame_scores)[0, :n_keypoints]
+        angles = processor.angle_plan.compute(keypoints, scores, options.keypoint_threshold)
+    finally:
+        processor.close()
+    return elapsed / len(frames), keypoints, scores, angles
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="Input video")
+    parser.add_argument("--short-sides", type=int, nargs="+", default=[720, 480, 360], help="Input short sides to run")
+    parser.add_argument("--roi-margin", type=float, default=0.25, help="Margin around the persons in ROI cropping")
+    parser.add_argument("--frames", type=int, default=300, help="Maximum number of frames")
+    parser.add_argument("--model", default="body_with_feet", help="Pose model type")
+    parser.add_argument("--detection-frequency", type=int, default=4, help="Detection frequency (frames)")
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.video)
+    frames = []
+    while len(frames) < args.frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        sys.exit(f"No frames read from {args.video}")
+
+    options = ProcessingOptions(
+        model_type=args.model,
+        detection_frequency=args.detection_frequency,
+        joint_angles=['right knee', 'left knee', 'right hip', 'left hip',
+                      'right shoulder', 'left shoulder', 'right elbow', 'left elbow'],
+        segment_angles=['right thigh', 'left thigh', 'trunk']
+    )
+    height, width = frames[0].shape[:2]
+    short_sides = [None] + [side for side in args.short_sides if side < min(height, width)]
+
+    print(f"{len(frames)} frames of {width}x{height}")
+    print(f"{'short side':>10} {'ROI':>4} {'ms/frame':>9} {'speedup':>8} {'kp err px':>10} "
+          f"{'angle err deg':>14} {'detected':>9}")
+    reference = None
+    for side in short_sides:
+        for roi_cropping in (False, True):
+            config = options.copy(update={"input_short_side": side, "roi_cropping": roi_cropping,
+                                          "roi_margin": args.roi_margin})
+            seconds, keypoints, scores, angles = run_config(config, frames)
+            if reference is None:
+                reference = (seconds, keypoints, scores, angles)
+            ref_seconds, ref_keypoints, ref_scores, ref_angles = reference
+
+            valid = (scores >= options.keypoint_threshold) & (ref_scores >= options.keypoint_threshold)
+            kp_error = np.linalg.norm(keypoints - ref_keypoints, axis=-1)[valid]
+            angle_error = np.abs((angles - ref_angles + 180) % 360 - 180)
+            angle_error = angle_error[np.isfinite(angle_error)]
+            detected = np.mean((scores >= options.keypoint_threshold).any(axis=-1))
+            print(f"{side or min(height, width):>10} {'on' if roi_cropping else 'off':>4} {1000 * seconds:>9.2f} "
+                  f"{ref_seconds / seconds:>7.2f}x "
+                  f"{kp_error.mean() if len(kp_error) else float('nan'):>10.2f} "
+                  f"{angle_error.mean() if len(angle_error) else float('nan'):>14.2f} "
+                  f"{100 * detected:>8.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Benchmark MOT file writing and reading against the pandas path
+
+Writes and reads synthetic angle files of 1k to 1M rows with app.io.mot
+and with pandas (DataFrame.to_csv, then a header scan and read_csv), and
+reports the time of each.
+
+Usage:
+    python scripts/benchmark_mot_io.py [--rows 1000 10000 100000 1000000] [--angles 11]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Add the project roots to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(project_root))
+
+import numpy as np
+import pandas as pd
+
+from app.io.mot import MotWriter, read_mot
+
+HEADER = [
+    'Coordinates', 'version=1', 'nRows={}', 'nColumns={}', 'inDegrees=yes', '',
+    'Units are S.I. units (second, meters, Newtons, ...)',
+    "If the header above contains a line with 'inDegrees', this indicates whether rotational values are in degrees (yes) or radians (no).",
+    '', 'endheader',
+]
+
+def write_pandas(path: str, angle_names: list, times: np.ndarray, angles: np.ndarray):
+    """Write a MOT file the way the service used to"""
+    df = pd.DataFrame(angles, columns=angle_names)
+    df.insert(0, "time", times)
+    header = '\n'.join(HEADER).format(len(df), len(angle_names) + 1)
+    with open(path, 'w') as f:
+        f.write(header + '\n')
+        df.to_csv(f, sep='\t', index=False)
+
+def read_pandas(path: str) -> pd.DataFrame:
+    """Read a MOT file the way the service used to"""
+    with open(path, 'r') as f:
+        for i, line in enumerate(f):
+            if line.startswith('time'):
+                header_rows = i
+                break
+    return pd.read_csv(path, sep='\t', skiprows=header_rows)
+
+def write_native(path: str, angle_names: list, times: np.ndarray, angles: np.ndarray):
+    """Write a MOT file row by row, as during video processing"""
+    with MotWriter(path, angle_names) as writer:
+        for t, row in zip(times, angles):
+            writer.write_row(t, row)
+
+def timed(func, *args) -> float:
+    """Run a function and return the elapsed seconds"""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000, 1000000], help="Row counts")
+    parser.add_argument("--angles", type=int, default=11, help="Number of angle columns")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    angle_names = [f"angle {i}" for i in range(args.angles)]
+
+    print(f"{'rows':>9} {'pd write':>9} {'mot write':>9} {'speedup':>8} {'pd read':>9} {'mot read':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pandas_file = os.path.join(tmp_dir, "pandas.mot")
+        native_file = os.path.join(tmp_dir, "native.mot")
+        for n_rows in args.rows:
+            times = np.arange(n_rows) / 30.0
+            angles = rng.uniform(-180, 180, (n_rows, args.angles))
+            angles[rng.random(angles.shape) < 0.05] = np.nan
+
+            pd_write = timed(write_pandas, pandas_file, angle_names, times, angles)
+            mot_write = timed(write_native, native_file, angle_names, times, angles)
+            pd_read = timed(read_pandas, pandas_file)
+            mot_read = timed(read_mot, native_file)
+
+            # Both readers must agree on both files
+            data = read_mot(pandas_file).data
+            assert np.allclose(data, read_pandas(native_file).to_numpy(), atol=1e-6, equal_nan=True)
+
+            print(f"{n_rows:>9} {pd_write:>9.3f} {mot_write:>9.3f} {pd_write / mot_write:>7.1f}x "
+                  f"{pd_read:>9.3f} {mot_read:>9.3f} {pd_read / mot_read:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+Benchmark motion-gated pose inference
+
+Processes each video without motion gating and with it at several
+thresholds, both offline (poses interpolated between inferred frames) and
+as a realtime session would (last poses carried forward). For each video
+and threshold, reports the share of inference calls saved, the processing
+time per frame and the mean and p95 angle error of the first tracked person
+against the run without gating.
+
+Usage:
+    python scripts/benchmark_motion_gating.py path/to/video.mp4 [more videos...] [--thresholds 0.002 0.005 0.01]
+"""
+import os
+import sys
+import time
+import argparse
+
+# Add the project roots to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(project_root))
+
+import cv2
+import numpy as np
+
+from app.models.data import ProcessingOptions
+from app.services.video_service import VideoProcessor
+
+def run_offline(options: ProcessingOptions, video: str, max_frames: int) -> tuple:
+    """
+    Process a video as an offline assessment does
+
+    Returns:
+        tuple: (seconds per frame, angles of the first person [F, A], motion gate counts)
+    """
+    processor = VideoProcessor(options.copy(update={"pipelined": False}))
+    cap = cv2.VideoCapture(video)
+    try:
+        start = time.perf_counter()
+        stream = processor.process_stream(cap, max_frames=max_frames)
+        elapsed = time.perf_counter() - start
+        n_angles = len(processor.angle_plan.angle_names)
+    finally:
+        cap.release()
+        processor.close()
+    angles = np.array([track_angles[0] if len(track_angles) else np.full(n_angles, np.nan)
+                       for track_angles in stream['track_angles']])
+    return elapsed / max(len(angles), 1), angles, stream['motion_gate']
+
+def run_realtime(options: ProcessingOptions, frames: list) -> tuple:
+    """
+    Process frames one at a time as a realtime session does
+
+    Returns:
+        tuple: (seconds per frame, angles of the first person [F, A], motion gate counts)
+    """
+    processor = VideoProcessor(options)
+    try:
+        context = processor.create_context()
+        n_angles = len(processor.angle_plan.angle_names)
+        angles = []
+        start = time.perf_counter()
+        for frame in frames:
+            _, frame_data, context = processor.process_frame(frame, context, render=False)
+            track_angles = frame_data['track_angles']
+            angles.append(track_angles[0] if len(track_angles) else np.full(n_angles, np.nan))
+        elapsed = time.perf_counter() - start
+    finally:
+        processor.close()
+    gate = context.motion_gate
+    return elapsed / len(frames), np.array(angles), gate.stats() if gate is not None else None
+
+def angle_error(angles: np.ndarray, reference: np.ndarray) -> np.ndarray:
+    """Absolute angle differences in degrees, wrapped to [0, 180]"""
+    n = min(len(angles), len(reference))
+    error = np.abs((angles[:n] - reference[:n] + 180) % 360 - 180)
+    return error[np.isfinite(error)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="+", help="Input videos")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.002, 0.005, 0.01],
+                        help="Fractions of changed pixels below which a frame has no motion")
+    parser.add_argument("--max-skipped", type=int, default=15, help="Maximum number of consecutive frames skipped")
+    parser.add_argument("--frames", type=int, default=300, help="Maximum number of frames per video")
+    parser.add_argument("--model", default="body_with_feet", help="Pose model type")
+    args = parser.parse_args()
+
+    options = ProcessingOptions(
+        model_type=args.model,
+        joint_angles=['right knee', 'left knee', 'right hip', 'left hip',
+                      'right shoulder', 'left shoulder', 'right elbow', 'left elbow'],
+        segment_angles=['right thigh', 'left thigh', 'trunk']
+    )
+
+    print(f"{'video':>20} {'mode':>9} {'threshold':>10} {'saved':>7} {'ms/frame':>9} "
+          f"{'angle err deg':>14} {'p95 deg':>8}")
+    for video in args.videos:
+        cap = cv2.VideoCapture(video)
+        frames = []
+        while len(frames) < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+        cap.release()
+        if not frames:
+            print(f"No frames read from {video}")
+            continue
+
+        name = os.path.basename(video)[-20:]
+        for mode in ("offline", "realtime"):
+            for threshold in [None] + args.thresholds:
+                config = options
+                if threshold is not None:
+                    config = options.copy(update={"motion_gating": True, "motion_threshold": threshold,
+                                                  "motion_max_skipped": args.max_skipped})
+                if mode == "offline":
+                    seconds, angles, gate = run_offline(config, video, len(frames))
+                else:
+                    seconds, angles, gate = run_realtime(config, frames)
+                if threshold is None:
+                    reference = angles
+                error = angle_error(angles, reference)
+                print(f"{name:>20} {mode:>9} {'off' if threshold is None else f'{threshold:g}':>10} "
+                      f"{100 * (gate['saved'] if gate else 0.0):>6.1f}% {1000 * seconds:>9.2f} "
+                      f"{error.mean() if len(error) else float('nan'):>14.2f} "
+                      f"{np.percentile(error, 95) if len(error) else float('nan'):>8.2f}")
+
+if __name__ == "__main__":
+    main()
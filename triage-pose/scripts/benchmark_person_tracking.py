@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Microbenchmark for frame-to-frame person association
+
+Reports the per-frame cost of physiotrack.sort_people_physiotrack for 1-30
+people, with scipy's linear_sum_assignment and with the built-in solver.
+
+Usage:
+    python scripts/benchmark_person_tracking.py [--frames 500]
+"""
+import os
+import sys
+import time
+import argparse
+import builtins
+
+# Add the project roots to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(project_root))
+
+import numpy as np
+from physiotrack.utils import sort_people_physiotrack
+
+def make_sequence(n_people: int, n_frames: int, n_keypoints: int = 26, seed: int = 0):
+    """Generate random walking skeletons with shuffled detection order"""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(0, 1920, (n_people, 1, 2))
+    offsets = rng.normal(0, 40, (n_people, n_keypoints, 2))
+    frames = []
+    for _ in range(n_frames):
+        positions = positions + rng.normal(0, 5, positions.shape)
+        keypoints = positions + offsets + rng.normal(0, 2, offsets.shape)
+        # Randomly drop keypoints as low-confidence detections would
+        keypoints[rng.random(keypoints.shape[:2]) < 0.1] = np.nan
+        frames.append(keypoints[rng.permutation(n_people)])
+    return frames
+
+def time_tracking(frames, max_distance=None) -> float:
+    """Average seconds per frame to associate the whole sequence"""
+    prev = frames[0]
+    scores = np.ones(frames[0].shape[:2])
+    start = time.perf_counter()
+    for keypoints in frames[1:]:
+        prev, _, _ = sort_people_physiotrack(prev, keypoints, scores, max_distance=max_distance)
+    return (time.perf_counter() - start) / (len(frames) - 1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=500, help="Frames per measurement")
+    args = parser.parse_args()
+
+    real_import = builtins.__import__
+
+    def import_without_scipy(name, *a, **k):
+        if name.startswith("scipy"):
+            raise ImportError(name)
+        return real_import(name, *a, **k)
+
+    # Warm up imports and caches
+    time_tracking(make_sequence(2, 3))
+
+    print(f"{'people':>6} {'scipy (us/frame)':>18} {'built-in (us/frame)':>20} {'gated (us/frame)':>17}")
+    for n_people in (1, 2, 5, 10, 20, 30):
+        frames = make_sequence(n_people, args.frames)
+        with_scipy = time_tracking(frames)
+        gated = time_tracking(frames, max_distance=100.0)
+        builtins.__import__ = import_without_scipy
+        try:
+            built_in = time_tracking(frames)
+        finally:
+            builtins.__import__ = real_import
+        print(f"{n_people:>6} {with_scipy * 1e6:>18.1f} {built_in * 1e6:>20.1f} {gated * 1e6:>17.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Benchmark realtime result modes
+
+Runs the per-frame server work of a realtime session (frame decoding,
+tracking and angles, optional rendering and JPEG encoding, result
+serialization) on the frames of a video, for each result mode: JSON and
+binary, with and without the annotated frame, and JSON keypoint deltas.
+Pose detection runs once up front and is excluded, as it is the same in
+every mode. Reports server CPU time and bytes sent per frame.
+
+Usage:
+    python scripts/benchmark_realtime_modes.py path/to/video.mp4 [--frames 300]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+
+# Add the project roots to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(project_root))
+
+import cv2
+import numpy as np
+
+from app.models.data import ProcessingOptions
+from app.services.video_service import VideoProcessor
+from app.services.streaming_service import StreamingService
+from app.io.realtime_protocol import ResultPacker
+
+MODES = [
+    # name, protocol, render, keypoint format, keypoint deltas
+    ("json", "json", True, "float32", False),
+    ("json keypoints", "json", False, "float32", False),
+    ("json deltas", "json", False, "float32", True),
+    ("binary", "binary", True, "float32", False),
+    ("binary keypoints", "binary", False, "float32", False),
+    ("binary int16", "binary", False, "int16", False),
+]
+
+def run_mode(processor: VideoProcessor, messages: list, detections: list, protocol: str,
+             render: bool, keypoint_format: str, keypoint_deltas: bool) -> tuple:
+    """
+    Process every frame message as a realtime session would
+
+    Returns:
+        tuple: (CPU seconds per frame, bytes sent per frame)
+    """
+    context = processor.create_context()
+    packer = ResultPacker(processor.keypoint_names, processor.angle_plan.angle_names, keypoint_format)
+    sent_keypoints = {} if keypoint_deltas else None
+    sent = 0
+
+    start = time.process_time()
+    for message, (keypoints, scores) in zip(messages, detections):
+        frame = StreamingService._decode_frame(message)
+        frame_data, buffer = StreamingService._process_frame(processor, frame, context, render, keypoints, scores)
+        if protocol == "binary":
+            rom = context.rom
+            sent += len(packer.pack(
+                context.frame_count,
+                frame_data["keypoints"] if len(frame_data["keypoints"]) else None,
+                frame_data["scores"],
+                frame_data["angles"],
+                np.stack((rom.min, rom.max, rom.mean, rom.std)),
+                buffer.tobytes() if buffer is not None else b""
+            ))
+        else:
+            result = StreamingService._json_result(processor, context, frame_data, buffer, sent_keypoints)
+            sent += len(json.dumps(result).encode())
+    elapsed = time.process_time() - start
+    return elapsed / len(messages), sent / len(messages)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="Input video")
+    parser.add_argument("--frames", type=int, default=300, help="Maximum number of frames")
+    parser.add_argument("--model", default="body_with_feet", help="Pose model type")
+    args = parser.parse_args()
+
+    options = ProcessingOptions(
+        model_type=args.model,
+        joint_angles=['right knee', 'left knee', 'right hip', 'left hip',
+                      'right shoulder', 'left shoulder', 'right elbow', 'left elbow'],
+        segment_angles=['right thigh', 'left thigh', 'trunk']
+    )
+    processor = VideoProcessor(options)
+
+    # Encode frames as a client would and detect poses once
+    cap = cv2.VideoCapture(args.video)
+    jpegs, detections = [], []
+    while len(jpegs) < args.frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        jpegs.append(cv2.imencode('.jpg', frame)[1].tobytes())
+        detections.append(processor.detector.detect_pose(frame))
+    cap.release()
+    if not jpegs:
+        sys.exit(f"No frames read from {args.video}")
+
+    print(f"{len(jpegs)} frames")
+    print(f"{'mode':>18} {'CPU ms/frame':>13} {'bytes/frame':>12}")
+    try:
+        for name, protocol, render, keypoint_format, keypoint_deltas in MODES:
+            if protocol == "binary":
+                messages = [{"bytes": jpeg} for jpeg in jpegs]
+            else:
+                messages = [{"text": base64.b64encode(jpeg).decode()} for jpeg in jpegs]
+            cpu, size = run_mode(processor, messages, detections, protocol, render, keypoint_format, keypoint_deltas)
+            print(f"{name:>18} {1000 * cpu:>13.2f} {size:>12.0f}")
+    finally:
+        processor.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""
+Benchmark concurrent realtime sessions
+
+Runs 1 to 32 concurrent realtime sessions in one event loop, as in one
+Uvicorn worker. Each session is fed the frames of a video as raw JPEG bytes
+at the given frame rate through an in-memory WebSocket. For each session
+count, reports the p50/p99 latency from receiving a frame to sending its
+result, the share of frames dropped, the result throughput and the p99 lag
+of the event loop (how late a 10 ms timer fires).
+
+Usage:
+    python scripts/benchmark_realtime_sessions.py path/to/video.mp4 [--sessions 1 2 4 8 16 32]
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+# Add the project roots to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(project_root))
+
+import cv2
+import numpy as np
+
+from app.models.data import ProcessingOptions
+from app.services.streaming_service import StreamingService
+from app.services.frame_executor import frame_executor
+from app.services.session_manager import SessionManager
+from app.io.realtime_protocol import unpack_result
+
+class InMemoryWebSocket:
+    """Minimal WebSocket feeding queued messages to process_stream"""
+
+    def __init__(self):
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.results = []
+
+    async def receive(self) -> dict:
+        return await self.messages.get()
+
+    async def send_bytes(self, data: bytes):
+        self.results.append(unpack_result(data))
+
+    async def send_json(self, data: dict):
+        if "error" in data:
+            print(f"Session error: {data['error']}")
+
+async def run_client(websocket: InMemoryWebSocket, jpegs: list, fps: float, duration: float):
+    """Send frames at a fixed rate, then stop the session"""
+    start = time.perf_counter()
+    i = 0
+    while time.perf_counter() - start < duration:
+        websocket.messages.put_nowait({"type": "websocket.receive", "bytes": jpegs[i % len(jpegs)]})
+        i += 1
+        await asyncio.sleep(max(start + i / fps - time.perf_counter(), 0))
+    websocket.messages.put_nowait({"type": "websocket.receive", "text": '{"command": "stop"}'})
+    return i
+
+async def probe_loop_lag(lags: list, stop: asyncio.Event, interval: float = 0.01):
+    """Measure how late a periodic timer fires"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+async def run_sessions(n_sessions: int, options: ProcessingOptions, jpegs: list, fps: float, duration: float) -> dict:
+    """Run concurrent sessions and collect their results"""
+    # Admit every session as requested, so that all runs measure the same work
+    service = StreamingService(SessionManager(max_sessions=n_sessions, downgrade_sessions=n_sessions))
+    websockets = [InMemoryWebSocket() for _ in range(n_sessions)]
+    lags, stop = [], asyncio.Event()
+    probe = asyncio.create_task(probe_loop_lag(lags, stop))
+
+    started = time.perf_counter()
+    outcome = await asyncio.gather(
+        *[service.process_stream(ws, options, protocol="binary") for ws in websockets],
+        *[run_client(ws, jpegs, fps, duration) for ws in websockets]
+    )
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+
+    sent = sum(outcome[n_sessions:])
+    latencies = np.array([r["latency_ms"] for ws in websockets for r in ws.results])
+    processed = len(latencies)
+    return {
+        "p50": np.percentile(latencies, 50) if processed else float("nan"),
+        "p99": np.percentile(latencies, 99) if processed else float("nan"),
+        "dropped": 1 - processed / sent if sent else 0.0,
+        "throughput": processed / elapsed,
+        "lag_p99": 1000 * np.percentile(lags, 99) if lags else float("nan")
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="Input video")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32], help="Session counts to run")
+    parser.add_argument("--fps", type=float, default=15.0, help="Frame rate of each client")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of streaming per run")
+    parser.add_argument("--workers", type=int, default=frame_executor.max_workers, help="Frame executor threads")
+    parser.add_argument("--model", default="body_with_feet", help="Pose model type")
+    parser.add_argument("--frames", type=int, default=150, help="Frames of the video to loop over")
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.video)
+    jpegs = []
+    while len(jpegs) < args.frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        jpegs.append(cv2.imencode('.jpg', frame)[1].tobytes())
+    cap.release()
+    if not jpegs:
+        sys.exit(f"No frames read from {args.video}")
+
+    frame_executor.max_workers = args.workers
+    options = ProcessingOptions(
+        model_type=args.model,
+        joint_angles=['right knee', 'left knee', 'right hip', 'left hip',
+                      'right shoulder', 'left shoulder', 'right elbow', 'left elbow'],
+        segment_angles=['right thigh', 'left thigh', 'trunk']
+    )
+
+    print(f"{args.workers} frame executor threads, {args.fps:g} fps per session, {args.duration:g}s per run")
+    print(f"{'sessions':>8} {'p50 ms':>8} {'p99 ms':>8} {'dropped':>8} {'results/s':>10} {'loop lag p99 ms':>16}")
+    try:
+        for n_sessions in args.sessions:
+            r = asyncio.run(run_sessions(n_sessions, options, jpegs, args.fps, args.duration))
+            print(f"{n_sessions:>8} {r['p50']:>8.1f} {r['p99']:>8.1f} {100 * r['dropped']:>7.1f}% "
+                  f"{r['throughput']:>10.1f} {r['lag_p99']:>16.1f}")
+    finally:
+        frame_executor.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+"""
+Benchmark segment-parallel offline video processing
+
+Runs VideoProcessor.process_video on the same input with 1, 2, 4 and 8
+segment workers, and reports frames per second, speedup over one worker and
+the largest angle difference from the sequential MOT files.
+
+Usage:
+    python scripts/benchmark_segment_scaling.py path/to/video.mp4 [--workers 1 2 4 8]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Add the project roots to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(project_root))
+
+import cv2
+import numpy as np
+
+from app.models.data import ProcessingOptions
+from app.services.video_service import VideoProcessor
+from app.io.mot import read_mot
+
+def max_angle_difference(reference: list, result: list) -> float:
+    """Largest absolute angle difference between two sets of MOT files"""
+    if len(reference) != len(result):
+        return float('inf')
+    worst = 0.0
+    for ref_file, res_file in zip(reference, result):
+        ref, res = read_mot(ref_file).data, read_mot(res_file).data
+        if ref.shape != res.shape or not np.array_equal(np.isnan(ref), np.isnan(res)):
+            return float('inf')
+        worst = max(worst, float(np.nanmax(np.abs(ref - res), initial=0.0)))
+    return worst
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="Input video")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8], help="Worker counts to run")
+    parser.add_argument("--model", default="body_with_feet", help="Pose model type")
+    parser.add_argument("--min-segment-frames", type=int, default=150, help="Minimum frames per segment")
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.video)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        rows = []
+        reference = None
+        for workers in sorted(set([1] + args.workers)):
+            options = ProcessingOptions(model_type=args.model, segment_workers=workers,
+                                        segment_min_frames=args.min_segment_frames)
+            processor = VideoProcessor(options)
+            output_dir = os.path.join(tmp_dir, f"workers{workers}")
+            os.makedirs(output_dir)
+            try:
+                start = time.perf_counter()
+                result = processor.process_video(args.video, output_dir)
+                elapsed = time.perf_counter() - start
+            finally:
+                processor.close()
+            if result["status"] != "complete":
+                raise RuntimeError(result["message"])
+
+            if reference is None:
+                reference = (elapsed, result["angles_files"])
+            diff = max_angle_difference(reference[1], result["angles_files"])
+            rows.append((workers, result["segments"], elapsed, reference[0] / elapsed, diff))
+
+    print(f"{'workers':>7} {'segments':>8} {'seconds':>9} {'fps':>8} {'speedup':>8} {'max diff':>9}")
+    for workers, segments, elapsed, speedup, diff in rows:
+        print(f"{workers:>7} {segments:>8} {elapsed:>9.2f} {n_frames / elapsed:>8.1f} {speedup:>7.2f}x {diff:>9.3g}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Benchmark serial vs pipelined offline video processing
+
+Runs VideoProcessor.process_video on the same input with the serial loop
+and with the decode -> infer -> render/encode pipeline, and reports frames
+per second for each mode.
+
+Usage:
+    python scripts/benchmark_video_pipeline.py path/to/video.mp4 [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+# Add the project roots to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(project_root))
+
+import cv2
+
+from app.models.data import ProcessingOptions
+from app.services.video_service import VideoProcessor
+
+def run_once(processor: VideoProcessor, video_path: str) -> float:
+    """Process the video once and return the elapsed seconds"""
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        result = processor.process_video(video_path, output_dir)
+        elapsed = time.perf_counter() - start
+    if result["status"] != "complete":
+        raise RuntimeError(result["message"])
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video", help="Input video")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per mode (best is reported)")
+    parser.add_argument("--model", default="body_with_feet", help="Pose model type")
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.video)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    results = {}
+    for pipelined in (False, True):
+        processor = VideoProcessor(ProcessingOptions(model_type=args.model, pipelined=pipelined))
+        try:
+            run_once(processor, args.video)  # warm up
+            results[pipelined] = min(run_once(processor, args.video) for _ in range(args.repeat))
+        finally:
+            processor.close()
+
+    print(f"{'mode':>10} {'seconds':>9} {'fps':>8}")
+    for pipelined, elapsed in results.items():
+        print(f"{'pipelined' if pipelined else 'serial':>10} {elapsed:>9.2f} {n_frames / elapsed:>8.1f}")
+    print(f"speedup: {results[False] / results[True]:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Shared test configuration
+"""
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add the project roots to the Python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+sys.path.insert(0, os.path.dirname(project_root))
+
+N_KEYPOINTS = 26
+
+def pose_to_bbox(keypoints: np.ndarray, expansion: float = 1.25) -> np.ndarray:
+    """Box around a pose, expanded as RTMLib does"""
+    x_min, y_min = keypoints.min(axis=0)
+    x_max, y_max = keypoints.max(axis=0)
+    center = np.array([x_min + x_max, y_min + y_max]) / 2
+    return np.concatenate([center - (center - [x_min, y_min]) * expansion,
+                           center + ([x_max, y_max] - center) * expansion])
+
+class ScriptedTracker:
+    """Stand-in for RTMLib's PoseTracker without models
+
+    Like PoseTracker without tracking, it detects persons (bright squares)
+    every `det_frequency` frames and, in between, runs the "pose model" in
+    the boxes of the previous frame's poses, in the pixel space of the image
+    it is given. Keypoints are the corners of the square found in each box.
+    """
+
+    def __init__(self, solution=None, det_frequency: int = 1, **kwargs):
+        self.det_frequency = det_frequency
+        self.reset()
+
+    def reset(self):
+        self.frame_cnt = 0
+        self.next_id = 0
+        self.bboxes_last_frame = []
+        self.track_ids_last_frame = []
+
+    def __call__(self, image: np.ndarray):
+        mask = image[..., 0] > 128
+        if self.frame_cnt % self.det_frequency == 0:
+            ys, xs = np.nonzero(mask)
+            bboxes = [np.array([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1], dtype=float)] if len(xs) else []
+        else:
+            bboxes = self.bboxes_last_frame
+
+        keypoints = []
+        for box in bboxes:
+            x0, y0 = np.maximum(np.floor(box[:2]).astype(int), 0)
+            x1, y1 = np.ceil(box[2:]).astype(int)
+            ys, xs = np.nonzero(mask[y0:y1, x0:x1])
+            if not len(xs):
+                continue
+            corners = np.array([[xs.min(), ys.min()], [xs.max() + 1, ys.max() + 1]], dtype=float) + [x0, y0]
+            keypoints.append(np.resize(corners, (N_KEYPOINTS, 2)))
+
+        self.bboxes_last_frame = [pose_to_bbox(k) for k in keypoints]
+        self.frame_cnt += 1
+        keypoints = np.array(keypoints).reshape(-1, N_KEYPOINTS, 2)
+        return keypoints, np.ones(keypoints.shape[:2])
+
+@pytest.fixture
+def detector(monkeypatch):
+    """PoseDetector running the scripted tracker instead of RTMLib models"""
+    pytest.importorskip("rtmlib")
+    from physiotrack import detector as detector_module
+    monkeypatch.setattr(detector_module, "PoseTracker", ScriptedTracker)
+    return detector_module.PoseDetector(model_type="body_with_feet", detection_frequency=4,
+                                        device="cpu", backend="onnxruntime")
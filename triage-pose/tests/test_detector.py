@@ -0,0 +1,47 @@
+"""
+Tests for the input transform of PoseDetector.detect_pose
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("rtmlib")
+
+def make_frame(x: int, y: int = 150, size: int = 80) -> np.ndarray:
+    """Dark frame with a bright square whose top-left corner is (x, y)"""
+    frame = np.zeros((480, 640, 3), np.uint8)
+    frame[y:y + size, x:x + size] = 255
+    return frame
+
+def assert_square(keypoints: np.ndarray, x: int, y: int = 150, size: int = 80, tolerance: float = 2.0):
+    assert len(keypoints) == 1
+    np.testing.assert_allclose(keypoints[0, :2], [[x, y], [x + size, y + size]], atol=tolerance)
+
+def test_input_scale_change_between_detections(detector):
+    """Boxes followed between detections stay valid when the input scale changes"""
+    for i in range(10):
+        if i == 2:
+            detector.set_input_scale(0.5)
+        if i == 6:
+            detector.set_input_scale(0.75)
+        x = 200 + 3 * i
+        keypoints, _ = detector.detect_pose(make_frame(x))
+        assert_square(keypoints, x)
+
+def test_reset_tracking_restores_input_scale(detector):
+    """The input scale is per-stream state, reset for the next stream"""
+    detector.set_input_scale(0.5)
+    detector.detect_pose(make_frame(200))
+    detector.reset_tracking()
+    assert detector.input_scale == 1.0
+
+    keypoints, _ = detector.detect_pose(make_frame(203))
+    assert_square(keypoints, 203)
+
+def test_roi_cropping_with_input_short_side(detector):
+    """Keypoints come back in frame coordinates with cropping and downscaling"""
+    detector.set_input_options(input_short_side=240, roi_margin=0.25)
+    for i in range(6):
+        x = 200 + 3 * i
+        keypoints, _ = detector.detect_pose(make_frame(x))
+        assert_square(keypoints, x)
+        assert detector.roi is not None
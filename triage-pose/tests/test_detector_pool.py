@@ -0,0 +1,62 @@
+"""
+Tests for the sharing of loaded pose models between sessions
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("rtmlib")
+from physiotrack import detector as detector_module
+from app.services.detector_pool import DetectorPool, DetectorPoolExhausted
+from conftest import ScriptedTracker
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(detector_module, "PoseTracker", ScriptedTracker)
+    return DetectorPool(max_size=1, checkout_timeout=0)
+
+def square_frame(x: int) -> np.ndarray:
+    """Dark frame with a bright 80px square at (x, 150)"""
+    frame = np.zeros((480, 640, 3), np.uint8)
+    frame[150:230, x:x + 80] = 255
+    return frame
+
+def test_sessions_share_models(pool):
+    """Concurrent sessions of one configuration load its models once"""
+    detectors = [pool.checkout(backend="onnxruntime", device="cpu") for _ in range(6)]
+    stats = pool.stats()
+    assert stats["size"] == 1
+    assert stats["in_use"] == 6
+    assert len({id(detector.tracker) for detector in detectors}) == 6
+
+    for detector in detectors:
+        pool.checkin(detector)
+    assert pool.stats()["in_use"] == 0
+    assert pool.stats()["size"] == 1
+
+def test_sessions_keep_their_own_tracking_state(pool):
+    """Streams sharing models follow their own persons and detection frequency"""
+    first = pool.checkout(backend="onnxruntime", device="cpu", detection_frequency=4)
+    second = pool.checkout(backend="onnxruntime", device="cpu", detection_frequency=1, input_short_side=240)
+    assert first.tracker.det_frequency == 4
+    assert second.tracker.det_frequency == 1
+
+    for i in range(6):
+        for detector, x in ((first, 100 + 2 * i), (second, 400 - 2 * i)):
+            keypoints, _ = detector.detect_pose(square_frame(x))
+            assert len(keypoints) == 1
+            np.testing.assert_allclose(keypoints[0, :2], [[x, 150], [x + 80, 230]], atol=2.0)
+    assert first.input_short_side is None
+    assert second.input_short_side == 240
+
+def test_full_pool_rejects_other_configurations(pool):
+    """Another configuration waits for a slot, which frees once its models are unused"""
+    detector = pool.checkout(backend="onnxruntime", device="cpu")
+    assert not pool.can_checkout("body", backend="onnxruntime", device="cpu")
+    with pytest.raises(DetectorPoolExhausted):
+        pool.checkout("body", backend="onnxruntime", device="cpu")
+
+    pool.checkin(detector)
+    assert pool.can_checkout("body", backend="onnxruntime", device="cpu")
+    other = pool.checkout("body", backend="onnxruntime", device="cpu")
+    assert pool.stats()["sessions"] == {"body/onnxruntime/cpu": 1}
+    pool.checkin(other)
@@ -0,0 +1,31 @@
+"""
+Tests for the interpolation of poses skipped by the motion gate
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("rtmlib")
+from app.processors.motion_gate import MotionGate
+
+def poses(*xs: float) -> np.ndarray:
+    """One pose per x, with all keypoints at (x, 0) [P, 4, 2]"""
+    return np.array([[[x, 0.0]] * 4 for x in xs])
+
+def test_interpolate_matches_persons_optimally():
+    """Persons are matched by minimum total distance, not closest pair first"""
+    gate = MotionGate()
+    gate.update(poses(0, 3), np.ones((2, 4)))
+    # Closest pair first would match the person at 3 with the one at 2 and the one at 0 with the one at 6
+    frames = gate.interpolate(poses(2, 6), np.ones((2, 4)), 1)
+    keypoints, _ = frames[0]
+    np.testing.assert_allclose(keypoints[:, 0, 0], [1.0, 4.5])
+
+def test_interpolate_carries_unmatched_persons_forward():
+    """Persons without a match on the next inferred frame stay in place"""
+    gate = MotionGate()
+    gate.update(poses(0, 100), np.ones((2, 4)))
+    frames = gate.interpolate(poses(4), np.full((1, 4), 0.5), 3)
+    assert len(frames) == 3
+    for i, (keypoints, scores) in enumerate(frames, 1):
+        np.testing.assert_allclose(keypoints[:, 0, 0], [i, 100])
+        np.testing.assert_allclose(scores[:, 0], [1 - i / 8, 1])
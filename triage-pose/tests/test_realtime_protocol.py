@@ -0,0 +1,47 @@
+"""
+Tests for the keypoints sent to realtime clients
+"""
+import numpy as np
+import pytest
+
+from app.models.data import ProcessingOptions
+from app.io.realtime_protocol import ResultPacker, unpack_result
+
+@pytest.fixture
+def processor(detector):
+    from app.services.video_service import VideoProcessor
+    return VideoProcessor(ProcessingOptions(), detector=detector)
+
+def indexed_keypoints(n_keypoints: int) -> np.ndarray:
+    """Keypoints whose coordinates are (index, 10 * index)"""
+    index = np.arange(n_keypoints, dtype=float)
+    return np.stack((index, 10 * index), axis=1)
+
+def test_keypoint_index_names(processor):
+    """Keypoint names are listed in the order of the detected keypoint rows"""
+    # The skeleton lists keypoints in tree order, not in index order
+    assert processor.keypoint_ids != sorted(processor.keypoint_ids)
+    for name, keypoint_id in zip(processor.keypoint_names, processor.keypoint_ids):
+        assert processor.keypoint_index_names[keypoint_id] == name
+
+@pytest.mark.parametrize("keypoint_dtype", ["float32", "int16"])
+def test_binary_named_keypoints_round_trip(processor, keypoint_dtype):
+    """Keypoints decoded by schema name are the detected keypoints of that name"""
+    keypoints = indexed_keypoints(len(processor.keypoint_index_names))
+    packer = ResultPacker(processor.keypoint_index_names, processor.angle_plan.angle_names, keypoint_dtype)
+    result = unpack_result(packer.pack(1, keypoints, np.ones(len(keypoints)), {}))
+
+    by_name = dict(zip(packer.schema()["keypoint_names"], result["keypoints"]))
+    for name, keypoint_id in zip(processor.keypoint_names, processor.keypoint_ids):
+        np.testing.assert_allclose(by_name[name], keypoints[keypoint_id])
+
+def test_json_named_keypoints_round_trip(processor):
+    """Keypoints of JSON results are the detected keypoints of that name"""
+    from app.services.streaming_service import StreamingService
+
+    keypoints = indexed_keypoints(len(processor.keypoint_index_names))
+    frame_data = {"angles": {}, "keypoints": keypoints, "scores": np.ones(len(keypoints))}
+    result = StreamingService._json_result(processor, processor.create_context(), frame_data, None)
+
+    for name, keypoint_id in zip(processor.keypoint_names, processor.keypoint_ids):
+        assert (result["keypoints"][name]["x"], result["keypoints"][name]["y"]) == tuple(keypoints[keypoint_id])
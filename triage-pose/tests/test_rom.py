@@ -0,0 +1,67 @@
+"""
+Tests for the ROM statistics reported offline and in realtime
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("rtmlib")
+from app.models.data import ProcessingOptions, ROMAnalysisOptions
+from app.services.analysis_service import ROMAnalyzer
+
+FPS = 30.0
+
+def angle_series(n_frames: int = 90) -> np.ndarray:
+    """Noisy knee and trunk angles with gaps [T, 2]"""
+    rng = np.random.default_rng(0)
+    t = np.arange(n_frames) / FPS
+    knee = 90 + 40 * np.sin(2 * np.pi * t) + rng.normal(0, 3, n_frames)
+    trunk = 170 - 25 * np.sin(np.pi * t) + rng.normal(0, 2, n_frames)
+    angles = np.stack((knee, trunk), axis=1)
+    angles[10:13, 0] = np.nan
+    angles[40, 1] = np.nan
+    return angles
+
+def test_streaming_rom_matches_offline(detector):
+    """The realtime rom_data reports the same ROM as the offline ROM data"""
+    from app.services.video_service import VideoProcessor
+    from app.services.streaming_service import StreamingService
+
+    angle_names = ["right knee", "trunk"]
+    angles = angle_series()
+    times = np.arange(len(angles)) / FPS
+
+    analyzer = ROMAnalyzer(ROMAnalysisOptions(filter_type="none", interpolate=False))
+    offline = analyzer.generate_rom_data(analyzer.angles_to_frame(angles, angle_names, times), "test")
+
+    processor = VideoProcessor(ProcessingOptions(joint_angles=["right knee"], segment_angles=["trunk"],
+                                                 filter_fps=FPS), detector=detector)
+    context = processor.create_context()
+    assert context.rom.angle_names == angle_names
+    n_keypoints = len(processor.keypoint_ids)
+    for frame_angles, time_key in zip(angles, offline):
+        context.push(np.zeros((n_keypoints, 2)), np.ones(n_keypoints), frame_angles)
+        frame_data = {"angles": dict(zip(angle_names, frame_angles)),
+                      "keypoints": np.zeros((0, 2)), "scores": np.zeros(0)}
+        rom_data = StreamingService._json_result(processor, context, frame_data, None)["rom_data"]
+
+        expected = offline[time_key]["angles_rom"]
+        for name in angle_names:
+            if expected[name][0] is None:
+                assert name not in rom_data
+                continue
+            assert rom_data[name]["min"] == pytest.approx(expected[name][0])
+            assert rom_data[name]["max"] == pytest.approx(expected[name][1])
+            assert rom_data[name]["range"] == pytest.approx(expected[name][1] - expected[name][0])
+        assert rom_data["trunk"]["range"] == pytest.approx(offline[time_key]["rom_range"])
+
+    # The trunk ROM is measured on 180 - angle
+    assert rom_data["trunk"]["max"] < 90
+
+def test_context_follows_video_frame_rate(detector):
+    """Offline contexts smooth ROM over the time window at the video's frame rate"""
+    from app.services.video_service import VideoProcessor
+
+    processor = VideoProcessor(ProcessingOptions(filter_type="butterworth", filter_fps=FPS), detector=detector)
+    window = ProcessingOptions().rom_time_window
+    assert processor.create_context().rom.window_size == pytest.approx(window * FPS, abs=1)
+    assert processor.create_context(2 * FPS).rom.window_size == pytest.approx(window * 2 * FPS, abs=1)
@@ -0,0 +1,50 @@
+"""
+Tests for the admission of realtime sessions
+"""
+import pytest
+
+pytest.importorskip("rtmlib")
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from physiotrack import detector as detector_module
+from app.config import settings
+from app.models.data import ProcessingOptions
+from app.services.detector_pool import DetectorPool
+from app.services.session_manager import SessionManager, SessionRejected
+from conftest import ScriptedTracker
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(detector_module, "PoseTracker", ScriptedTracker)
+    return DetectorPool(max_size=1, checkout_timeout=0)
+
+def test_sessions_without_model_slot_are_rejected(pool):
+    """Sessions are only admitted when the pool can serve their pose model"""
+    manager = SessionManager(max_sessions=4, downgrade_sessions=4, pool=pool)
+    options = ProcessingOptions(backend="onnxruntime", device="cpu")
+    detector = pool.checkout(**options.detector_options())
+    manager.open(options)
+
+    with pytest.raises(SessionRejected):
+        manager.open(options.copy(update={"model_type": "body"}))
+    assert manager.stats()["rejected"] == 1
+
+    pool.checkin(detector)
+    manager.open(options.copy(update={"model_type": "body"}))
+    assert manager.stats()["active_sessions"] == 2
+
+@pytest.fixture
+def client():
+    from app.routers import realtime
+    app = FastAPI()
+    app.include_router(realtime.router)
+    return TestClient(app)
+
+def test_internal_endpoints_require_api_key(client, monkeypatch):
+    """Remote callers only see the realtime metrics with the API key"""
+    monkeypatch.setattr(settings, "api_key", "secret")
+    for path in ("/stats", "/sessions"):
+        assert client.get(path).status_code == 403
+        assert client.get(path, headers={"X-API-Key": "wrong"}).status_code == 403
+        assert client.get(path, headers={"X-API-Key": "secret"}).status_code == 200
@@ -0,0 +1,27 @@
+"""
+Tests for the storage of assessment results
+"""
+from app.config import settings
+from app.models.data import ROMAnalysisOptions
+from app.services.storage_service import downsampling_level, load_analysis_options, save_analysis_options
+
+def test_downsampling_levels_are_bounded(monkeypatch):
+    """Any number of requested points maps to one of a few levels, never above the request"""
+    monkeypatch.setattr(settings, "results_max_points_levels", [500, 100, 1000])
+    levels = {downsampling_level(max_points) for max_points in range(100, 20000)}
+    assert levels == {100, 500, 1000}
+    assert downsampling_level(999) == 500
+    assert downsampling_level(1000) == 1000
+    assert downsampling_level(3) == 100
+    assert downsampling_level(None) is None
+
+def test_downsampling_disabled_without_levels(monkeypatch):
+    monkeypatch.setattr(settings, "results_max_points_levels", [])
+    assert downsampling_level(300) is None
+
+def test_analysis_options_round_trip(tmp_path):
+    """Results can be recomputed with the analysis options a job was submitted with"""
+    assert load_analysis_options(str(tmp_path), "a") == {}
+    options = ROMAnalysisOptions(test_name="lb-flexion", height=1.85, filter_type="gaussian")
+    save_analysis_options(str(tmp_path), "a", options.dict())
+    assert ROMAnalysisOptions(**load_analysis_options(str(tmp_path), "a")) == options
@@ -0,0 +1,56 @@
+"""
+Tests for the tracking of persons across frames
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("rtmlib")
+from physiotrack.tracking import TrackManager, primary_track
+from conftest import N_KEYPOINTS
+
+def person(x: float, y: float = 100.0, size: float = 100.0) -> np.ndarray:
+    """Keypoints spread over a square of `size` pixels at (x, y) [K, 2]"""
+    offsets = np.linspace(0, size, N_KEYPOINTS)
+    return np.stack((x + offsets, y + offsets[::-1]), axis=1)
+
+def update(manager: TrackManager, *persons: np.ndarray):
+    """Track the persons of one frame"""
+    keypoints = np.array(persons).reshape(len(persons), N_KEYPOINTS, 2)
+    return manager.update(keypoints, np.ones(keypoints.shape[:2]))
+
+def test_primary_track_is_most_seen():
+    """The primary track is seen in the most frames, the lowest ID on ties"""
+    assert primary_track({}) is None
+    assert primary_track({0: 3, 1: 5, 2: 5}) == 1
+
+    manager = TrackManager()
+    update(manager, person(400))
+    for _ in range(3):
+        track_ids, _, _ = update(manager, person(400), person(100))
+    assert track_ids == [0, 1] and manager.primary_id == 0
+
+    # While person 0 is out of view, the other person is reported...
+    for _ in range(3):
+        track_ids, _, _ = update(manager, person(100))
+    assert track_ids == [1] and manager.primary_id == 1
+
+    # ...and stays reported, having been seen in more frames
+    track_ids, _, _ = update(manager, person(400), person(100))
+    assert track_ids == [0, 1] and manager.primary_id == 1
+
+def test_new_person_does_not_take_lost_track():
+    """A person entering while another is out of view gets a new ID"""
+    manager = TrackManager()
+    for x in (100, 105, 110):
+        track_ids, _, _ = update(manager, person(x))
+    assert track_ids == [0]
+
+    # Person 0 leaves, and a new person enters on the other side
+    update(manager)
+    track_ids, _, _ = update(manager, person(450))
+    assert track_ids == [1]
+
+    # Person 0 comes back near where they were lost
+    track_ids, keypoints, _ = update(manager, person(455), person(120))
+    assert track_ids == [0, 1]
+    np.testing.assert_allclose(keypoints[0], person(120))